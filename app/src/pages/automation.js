@@ -4,92 +4,72 @@ const path = require('path');
 const settingsPath = path.join(__dirname, '../../settings.json');
 
 function initializeAutomationPage() {
-    // Event listener for Generate Invoices button
+    // Each button submits a background job to the backend and waits for it to finish
     document.getElementById('generate-invoices-btn').addEventListener('click', () => {
-        fetchSettings().then(settings => {
-            fetch('http://127.0.0.1:5000/generate-invoices', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(settings),
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success') {
-                    alert(data.message);
-                } else {
-                    alert('Error generating invoices: ' + data.message);
-                }
-            })
-            .catch(error => console.error('Error generating invoices:', error));
-        });
+        runJob('generate-invoices', 'generating invoices');
     });
 
-    // Event listener for Generate Reports button
     document.getElementById('generate-reports-btn').addEventListener('click', () => {
-        fetchSettings().then(settings => {
-            fetch('http://127.0.0.1:5000/generate-reports', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(settings),
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success') {
-                    alert(data.message);
-                } else {
-                    alert('Error generating reports: ' + data.message);
-                }
-            })
-            .catch(error => console.error('Error generating reports:', error));
-        });
+        runJob('generate-reports', 'generating reports');
     });
 
-    // Event listener for Send Invoices to Clients button
     document.getElementById('send-invoices-btn').addEventListener('click', () => {
-        fetchSettings().then(settings => {
-            fetch('http://127.0.0.1:5000/send-invoices', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(settings),
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success') {
-                    alert(data.message);
-                } else {
-                    alert('Error sending invoices to clients: ' + data.message);
-                }
-            })
-            .catch(error => console.error('Error sending invoices to clients:', error));
-        });
+        runJob('send-invoices', 'sending invoices to clients');
     });
 
-    // Event listener for Send Report to Managers button
     document.getElementById('send-report-btn').addEventListener('click', () => {
-        fetchSettings().then(settings => {
-            fetch('http://127.0.0.1:5000/send-report', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(settings),
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success') {
-                    alert(data.message);
-                } else {
-                    alert('Error sending report to managers: ' + data.message);
-                }
-            })
-            .catch(error => console.error('Error sending report to managers:', error));
-        });
+        runJob('send-report', 'sending report to managers');
+    });
+}
+
+// Submit a background job and follow its progress until it finishes
+function runJob(task, description) {
+    fetchSettings().then(settings => {
+        fetch(`http://127.0.0.1:5000/jobs/${task}`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(settings),
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.error) {
+                alert(`Error ${description}: ` + data.error);
+                return;
+            }
+            followJob(data.jobId, description);
+        })
+        .catch(error => console.error(`Error ${description}:`, error));
+    });
+}
+
+// Follow the progress stream of a job until it finishes
+function followJob(jobId, description) {
+    const source = new EventSource(`http://127.0.0.1:5000/jobs/${jobId}/events`);
+
+    source.addEventListener('progress', event => {
+        const progress = JSON.parse(event.data);
+        const rate = progress.rate ? `${progress.rate.toFixed(1)}/s` : '-';
+        const eta = progress.eta != null ? `${Math.round(progress.eta)}s left` : '';
+        console.log(`${description}: ${progress.kind} ${progress.done}/${progress.total} (${rate}) ${eta}`);
+    });
+
+    source.addEventListener('status', event => {
+        const job = JSON.parse(event.data);
+        if (job.status === 'queued' || job.status === 'running') {
+            return;
+        }
+        source.close();
+
+        if (job.status === 'succeeded') {
+            alert(job.result.message);
+        } else if (job.status === 'cancelled') {
+            alert(`Cancelled ${description}.`);
+        } else {
+            const result = job.result || {};
+            alert(`Error ${description}: ` + (result.message || result.error || job.error));
+        }
     });
 }
 
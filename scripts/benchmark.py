@@ -0,0 +1,293 @@
+"""
+Benchmark the invoice and report pipeline against synthetic workbooks.
+
+Generates Clients, Products, Orders and Invoices workbooks at the requested scales, times
+every stage of the pipeline (fetch, validate, invoice context build, HTML render, PDF
+conversion, report generation and email sending against a local SMTP sink) and writes the
+results as JSON, so that runs of different versions can be compared.
+
+Usage:
+    python scripts/benchmark.py --orders 1000 10000 100000 --output data/output/benchmarks/latest.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from openpyxl import Workbook
+
+# Get the root directory and make the pipeline modules importable, as when running the app
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(root_dir, 'src'))
+
+import document_generator
+import metrics
+from data_fetcher import fetch_data_from_excel
+from data_validator import validate_data
+from document_generator import build_invoice_contexts, generate_report, get_renderer, html_to_pdf, load_template, render_html
+from email_sender import deliver_emails
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+# Path to the benchmark results
+benchmark_output_path = os.path.join(root_dir, 'data', 'output', 'benchmarks')
+
+def generate_workbook(file_path, orders, clients=None, products=50, seed=0):
+    """
+    Write a synthetic workbook with the Clients, Products, Orders and Invoices sheets.
+
+    Rows are written in write-only mode, so even a million orders are streamed to disk
+    instead of being held in memory. The same seed always produces the same workbook.
+
+    Parameters:
+    - file_path (str): Path where the workbook is saved.
+    - orders (int): Number of orders (and invoices).
+    - clients (int, optional): Number of clients. Defaults to one client per 100 orders (at least 10).
+    - products (int, optional): Number of products. Defaults to 50.
+    - seed (int, optional): Seed of the random generator. Defaults to 0.
+    """
+    rng = random.Random(seed)
+    clients = clients or max(10, orders // 100)
+    start_date = datetime(2024, 1, 1)
+
+    workbook = Workbook(write_only=True)
+
+    sheet = workbook.create_sheet("Clients")
+    sheet.append(["Client ID", "Client Name", "Contact Person", "Email", "Address"])
+    for client_id in range(1, clients + 1):
+        sheet.append([client_id, f"Client {client_id} Co", f"Contact {client_id}",
+                      f"client{client_id}@example.com", f"{client_id} Main St"])
+
+    sheet = workbook.create_sheet("Products")
+    sheet.append(["Product ID", "Product Name", "Unit Price ($)", "Stock Quantity", "Description"])
+    prices = {}
+    for index in range(1, products + 1):
+        product_id = f"P{index:03d}"
+        prices[product_id] = rng.randint(10, 500)
+        sheet.append([product_id, f"Product {index}", prices[product_id], rng.randint(0, 1000), f"Description of product {index}"])
+
+    orders_sheet = workbook.create_sheet("Orders")
+    orders_sheet.append(["Order ID", "Client ID", "Order Date", "Product ID", "Quantity", "Total Amount ($)", "Delivery Date", "Status"])
+    invoices_sheet = workbook.create_sheet("Invoices")
+    invoices_sheet.append(["Invoice ID", "Order ID", "Invoice Date", "Due Date", "Amount Due ($)", "Paid Status"])
+    product_ids = list(prices)
+    for order_id in range(1, orders + 1):
+        order_date = start_date + timedelta(days=rng.randrange(365))
+        items = rng.sample(product_ids, rng.randint(1, min(3, len(product_ids))))
+        quantity = rng.randint(1, 20)
+        total = quantity * sum(prices[product_id] for product_id in items)
+        orders_sheet.append([order_id, rng.randint(1, clients), order_date, ", ".join(items), quantity, total,
+                             order_date + timedelta(days=rng.randint(1, 30)), rng.choice(["Delivered", "Pending", "Shipped"])])
+        invoices_sheet.append([order_id, order_id, order_date, order_date + timedelta(days=30), total,
+                               rng.choice(["Paid", "Unpaid"])])
+
+    workbook.save(file_path)
+
+class SinkHandler:
+    """Local SMTP stand-in that accepts and discards every message."""
+
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 Message accepted for delivery"
+
+def free_port():
+    """Find a free local TCP port for the SMTP sink."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def time_stage(results, name, func, items=None):
+    """
+    Run a stage, recording its wall time and throughput.
+
+    Parameters:
+    - results (dict): Stage results, updated with the new stage.
+    - name (str): Name of the stage.
+    - func (callable): The stage, called without arguments.
+    - items (int, optional): Number of items processed by the stage.
+
+    Returns:
+    - object: The value returned by the stage.
+    """
+    start = time.perf_counter()
+    value = func()
+    seconds = time.perf_counter() - start
+    results[name] = {
+        "seconds": seconds,
+        "items": items,
+        "itemsPerSecond": items / seconds if items and seconds > 0 else None
+    }
+    return value
+
+def run_benchmark(workbook_path, work_dir, render_sample=1000, pdf_sample=10, email_sample=200,
+                  renderer=None, smtp_connections=4):
+    """
+    Time every stage of the pipeline against one workbook.
+
+    Rendering, PDF conversion and sending are timed on samples of the orders, as they scale
+    linearly and would otherwise dominate the run. Stages that cannot run here (e.g. no PDF
+    renderer or no aiosmtpd) are reported as skipped.
+
+    Parameters:
+    - workbook_path (str): Path to the workbook.
+    - work_dir (str): Directory where the generated documents are written.
+    - render_sample (int, optional): Number of invoices rendered to HTML. Defaults to 1000.
+    - pdf_sample (int, optional): Number of invoices converted to PDF. Defaults to 10.
+    - email_sample (int, optional): Number of emails sent to the SMTP sink. Defaults to 200.
+    - renderer (str, optional): Name of the PDF renderer backend. Defaults to default_renderer.
+    - smtp_connections (int, optional): Number of concurrent SMTP connections. Defaults to 4.
+
+    Returns:
+    - dict: The "stages" timings, the "skipped" stages with the reason and the instrumentation "metrics".
+    """
+    stages = {}
+    skipped = {}
+    before = metrics.registry.snapshot()
+
+    # Keep the generated documents out of the real output folders
+    document_generator.output_invoices_path = os.path.join(work_dir, 'invoices')
+    document_generator.output_reports_path = os.path.join(work_dir, 'reports')
+    os.makedirs(document_generator.output_invoices_path, exist_ok=True)
+    os.makedirs(document_generator.output_reports_path, exist_ok=True)
+
+    data = time_stage(stages, "fetch", lambda: fetch_data_from_excel(workbook_path, use_cache=False))
+    orders = len(data["Orders"])
+    stages["fetch"].update(items=orders, itemsPerSecond=orders / stages["fetch"]["seconds"])
+
+    validated = time_stage(stages, "validate", lambda: validate_data(data), orders)
+
+    jobs = time_stage(stages, "invoice_contexts", lambda: build_invoice_contexts(
+        validated["Orders"]["clean_data"], validated["Clients"]["clean_data"], validated["Products"]["clean_data"]), orders)
+
+    template = load_template('invoice_template.html')
+    sample = jobs[:render_sample]
+    html_contents = time_stage(stages, "render_html", lambda: [render_html(template, context) for _, _, context, _ in sample], len(sample))
+
+    invoice_paths = []
+    try:
+        get_renderer(renderer)
+    except Exception as e:
+        skipped["html_to_pdf"] = skipped["report"] = str(e)
+    else:
+        def convert():
+            for (order_id, client_email, context, output_path), html_content in zip(sample[:pdf_sample], html_contents):
+                html_to_pdf(html_content, output_path, renderer)
+                invoice_paths.append(output_path)
+        time_stage(stages, "html_to_pdf", convert, min(pdf_sample, len(sample)))
+
+    # The report also ends in a PDF conversion, which generate_report reports by returning None
+    if "report" not in skipped:
+        report_stage = {}
+        if time_stage(report_stage, "report", lambda: generate_report(validated, renderer), orders) is None:
+            skipped["report"] = "The report could not be generated"
+        else:
+            stages.update(report_stage)
+
+    if Controller is None:
+        skipped["send_email"] = "aiosmtpd is not installed"
+    else:
+        # Attach a generated invoice if there is one, or a stand-in of a typical invoice size
+        if not invoice_paths:
+            invoice_paths.append(os.path.join(work_dir, 'invoice_sample.pdf'))
+            with open(invoice_paths[0], 'wb') as f:
+                f.write(b"%PDF-1.4\n" + os.urandom(30 * 1024))
+        emails = [(client_email, "Your Invoice", "Please find attached your invoice.", [invoice_paths[index % len(invoice_paths)]])
+                  for index, (order_id, client_email, context, output_path) in enumerate(jobs[:email_sample])]
+
+        handler = SinkHandler()
+        port = free_port()
+        controller = Controller(handler, hostname="127.0.0.1", port=port)
+        controller.start()
+        try:
+            time_stage(stages, "send_email", lambda: deliver_emails(
+                emails, "127.0.0.1", port, "benchmark@example.com", None,
+                connections=smtp_connections, use_tls=False), len(emails))
+        finally:
+            controller.stop()
+
+    return {"stages": stages, "skipped": skipped, "metrics": metrics.run_summary(before)}
+
+def git_revision():
+    """
+    Get the current git revision of the repository.
+
+    Returns:
+    - str: The revision, or None if it cannot be determined.
+    """
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=root_dir,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, nargs="+", default=[1000], help="Numbers of orders to benchmark (default: 1000).")
+    parser.add_argument("--clients", type=int, default=None, help="Number of clients (default: one per 100 orders).")
+    parser.add_argument("--products", type=int, default=50, help="Number of products (default: 50).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data (default: 0).")
+    parser.add_argument("--render-sample", type=int, default=1000, help="Invoices rendered to HTML (default: 1000).")
+    parser.add_argument("--pdf-sample", type=int, default=10, help="Invoices converted to PDF (default: 10).")
+    parser.add_argument("--email-sample", type=int, default=200, help="Emails sent to the SMTP sink (default: 200).")
+    parser.add_argument("--renderer", default=None, help="PDF renderer backend (default: pdfkit).")
+    parser.add_argument("--smtp-connections", type=int, default=4, help="Concurrent SMTP connections (default: 4).")
+    parser.add_argument("--workbook-dir", default=None,
+                        help="Directory where the synthetic workbooks are kept and reused across runs (default: a temporary directory).")
+    parser.add_argument("--output", default=None, help="Path of the JSON results (default: data/output/benchmarks/benchmark_<timestamp>.json).")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="benchmark_")
+    workbook_dir = args.workbook_dir or work_dir
+    os.makedirs(workbook_dir, exist_ok=True)
+
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "startedAt": datetime.now().isoformat(timespec="seconds"),
+        "runs": []
+    }
+
+    try:
+        for orders in args.orders:
+            workbook_path = os.path.join(workbook_dir, f"synthetic_{orders}_{args.seed}.xlsx")
+            generation_seconds = None
+            if not os.path.exists(workbook_path):
+                start = time.perf_counter()
+                generate_workbook(workbook_path, orders, args.clients, args.products, args.seed)
+                generation_seconds = time.perf_counter() - start
+
+            print(f"Benchmarking {orders} orders...")
+            run = run_benchmark(workbook_path, os.path.join(work_dir, str(orders)), args.render_sample, args.pdf_sample,
+                                args.email_sample, args.renderer, args.smtp_connections)
+            run.update(orders=orders, generationSeconds=generation_seconds)
+            results["runs"].append(run)
+
+            for name, stage in run["stages"].items():
+                print(f"  {name:<17} {stage['seconds']:10.3f} s  {stage['items'] or '':>9} items")
+            for name, reason in run["skipped"].items():
+                print(f"  {name:<17} skipped: {reason}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output_path = args.output or os.path.join(benchmark_output_path, f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"Results written to {output_path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+import hashlib
+import os
+import threading
+import pandas as pd
+
+# Get the root directory
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Path to the persisted aggregate stores
+aggregate_cache_path = os.path.join(root_dir, 'data', 'cache', 'aggregates')
+
+# Aggregate stores kept in memory, keyed by absolute workbook path
+_stores = {}
+
+def resolve_period(period: str = None, start=None, end=None) -> dict:
+    """
+    Resolve a report period.
+
+    Parameters:
+    - period (str, optional): A month ("2024-08" or "August 2024"), a quarter ("2024-Q3")
+      or a year ("2024"). Defaults to None (all orders).
+    - start (str or datetime, optional): First day of a custom range. Takes precedence over period.
+    - end (str or datetime, optional): Last day of a custom range, inclusive.
+
+    Returns:
+    - dict: Dictionary with the following keys:
+        - "label" (str): Name of the period shown in the report, e.g. "August 2024".
+        - "slug" (str): Name of the period used in file names, e.g. "August_2024".
+        - "start" (pd.Timestamp): First day of the period, or None if unbounded.
+        - "end" (pd.Timestamp): Day after the period, or None if unbounded.
+    """
+    if start is not None or end is not None:
+        start = pd.Timestamp(start).normalize() if start is not None else None
+        last_day = pd.Timestamp(end).normalize() if end is not None else None
+        label = f"{start:%Y-%m-%d} to {last_day:%Y-%m-%d}" if start is not None and last_day is not None else \
+            f"From {start:%Y-%m-%d}" if start is not None else f"Until {last_day:%Y-%m-%d}"
+        end = last_day + pd.Timedelta(days=1) if last_day is not None else None
+    elif period:
+        parsed = pd.Period(period)
+        if parsed.freqstr.startswith("M"):
+            label = parsed.strftime("%B %Y")
+        elif parsed.freqstr.startswith("Q"):
+            label = f"Q{parsed.quarter} {parsed.year}"
+        elif parsed.freqstr.startswith("Y") or parsed.freqstr.startswith("A"):
+            label = str(parsed.year)
+        else:
+            raise ValueError(f"Unsupported report period '{period}'. Use a month, a quarter or a year.")
+        start = parsed.start_time.normalize()
+        end = (parsed + 1).start_time.normalize()
+    else:
+        label, start, end = "All Orders", None, None
+
+    return {"label": label, "slug": label.replace(" ", "_"), "start": start, "end": end}
+
+def period_mask(dates: pd.Series, start=None, end=None) -> pd.Series:
+    """
+    Select the dates that fall within a period.
+
+    Parameters:
+    - dates (pd.Series or pd.Index): Dates to check.
+    - start (pd.Timestamp, optional): First day of the period. Defaults to None (unbounded).
+    - end (pd.Timestamp, optional): Day after the period. Defaults to None (unbounded).
+
+    Returns:
+    - pd.Series or np.ndarray: Boolean mask of the dates within the period.
+    """
+    dates = pd.to_datetime(dates)
+    mask = dates == dates  # All true, except for missing dates
+    if start is not None:
+        mask &= dates >= start
+    if end is not None:
+        mask &= dates < end
+    return mask
+
+class AggregateStore:
+    """
+    Daily aggregates of the orders and invoices, updated incrementally.
+
+    Orders and invoices are reduced to facts keyed by their ID, and their amounts are summed
+    per day and client (invoices are attributed to the client of their order). Every update
+    is the full set of the sheet's rows: the store only applies the rows that are new, changed
+    or gone since the last update, so successive reports are answered from the daily sums
+    instead of rescanning the order history.
+    """
+
+    def __init__(self, path: str = None):
+        """
+        Parameters:
+        - path (str, optional): File where the store is persisted across restarts. Defaults to None (in memory only).
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.order_facts = pd.DataFrame({"date": pd.Series(dtype="datetime64[ns]"), "client_id": pd.Series(dtype=object),
+                                         "amount": pd.Series(dtype=float)})
+        self.invoice_facts = pd.DataFrame({"date": pd.Series(dtype="datetime64[ns]"), "client_id": pd.Series(dtype=object),
+                                           "outstanding": pd.Series(dtype=float)})
+        self.sales = pd.DataFrame({"amount": pd.Series(dtype=float), "orders": pd.Series(dtype=float)},
+                                  index=pd.MultiIndex.from_arrays([[], []], names=["date", "client_id"]))
+        self.outstanding = pd.DataFrame({"outstanding": pd.Series(dtype=float)},
+                                        index=pd.MultiIndex.from_arrays([[], []], names=["date", "client_id"]))
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def update(self, orders_df: pd.DataFrame = None, invoices_df: pd.DataFrame = None) -> int:
+        """
+        Apply the new, changed and removed orders and invoices to the aggregates.
+
+        Parameters:
+        - orders_df (pd.DataFrame, optional): All the validated orders. Stored orders missing
+          from it, e.g. deleted or now rejected rows, are removed from the aggregates.
+        - invoices_df (pd.DataFrame, optional): All the validated invoices, likewise.
+
+        Returns:
+        - int: Number of orders and invoices that were new, changed or removed.
+        """
+        changed = 0
+        with self.lock:
+            if orders_df is not None:
+                facts = pd.DataFrame({
+                    "date": pd.to_datetime(orders_df["Order Date"]).dt.normalize().values,
+                    "client_id": orders_df["Client ID"].values,
+                    "amount": pd.to_numeric(orders_df["Total Amount ($)"], errors="coerce").fillna(0).astype(float).values
+                }, index=orders_df["Order ID"].values)
+                self.order_facts, removed, added, dropped = _apply_facts(self.order_facts, facts)
+                self.sales = _add_sums(self.sales, removed, added, ["date", "client_id"])
+                changed += len(added) + dropped
+
+            if invoices_df is not None:
+                amounts = pd.to_numeric(invoices_df["Amount Due ($)"], errors="coerce").fillna(0).astype(float)
+                facts = pd.DataFrame({
+                    "date": pd.to_datetime(invoices_df["Invoice Date"]).dt.normalize().values,
+                    "client_id": invoices_df["Order ID"].map(self.order_facts["client_id"]).values,
+                    "outstanding": amounts.where(invoices_df["Paid Status"] == "Unpaid", 0.0).values
+                }, index=invoices_df["Invoice ID"].values)
+                self.invoice_facts, removed, added, dropped = _apply_facts(self.invoice_facts, facts)
+                self.outstanding = _add_sums(self.outstanding, removed, added, ["date", "client_id"])
+                changed += len(added) + dropped
+
+            if changed and self.path:
+                self.save()
+        return changed
+
+    def summary(self, start=None, end=None, top: int = 5, client_ids=None) -> dict:
+        """
+        Summarize the sales and outstanding invoices of a period from the daily aggregates.
+
+        Parameters:
+        - start (pd.Timestamp, optional): First day of the period. Defaults to None (unbounded).
+        - end (pd.Timestamp, optional): Day after the period. Defaults to None (unbounded).
+        - top (int, optional): Number of top clients. Defaults to 5.
+        - client_ids (list, optional): Only summarize these clients, e.g. the clients of a region. Defaults to None (all clients).
+
+        Returns:
+        - dict: Dictionary with the following keys:
+            - "total_sales" (float): Total amount of the orders of the period.
+            - "order_count" (int): Number of orders of the period.
+            - "outstanding_invoices" (float): Amount due on the unpaid invoices of the period.
+            - "top_clients" (list): (client ID, total purchase) tuples of the top clients, largest first.
+        """
+        with self.lock:
+            sales = self.sales[period_mask(self.sales.index.get_level_values("date"), start, end)]
+            outstanding = self.outstanding[period_mask(self.outstanding.index.get_level_values("date"), start, end)]
+
+        if client_ids is not None:
+            sales = sales[sales.index.get_level_values("client_id").isin(client_ids)]
+            outstanding = outstanding[outstanding.index.get_level_values("client_id").isin(client_ids)]
+
+        client_totals = sales.groupby(level="client_id")["amount"].sum()
+        return {
+            "total_sales": client_totals.sum(),
+            "order_count": int(sales["orders"].sum()),
+            "outstanding_invoices": outstanding["outstanding"].sum(),
+            "top_clients": list(client_totals.nlargest(top).items())
+        }
+
+    def save(self):
+        """
+        Persist the store to its file. Must be called with the lock held.
+        """
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            pd.to_pickle({
+                "order_facts": self.order_facts,
+                "invoice_facts": self.invoice_facts,
+                "sales": self.sales,
+                "outstanding": self.outstanding
+            }, self.path)
+        except Exception as e:
+            print(f"Could not persist aggregates: {e}")
+
+    def load(self):
+        """
+        Load the store from its file, starting empty if it cannot be read.
+        """
+        try:
+            state = pd.read_pickle(self.path)
+            self.order_facts = state["order_facts"]
+            self.invoice_facts = state["invoice_facts"]
+            self.sales = state["sales"]
+            self.outstanding = state["outstanding"]
+        except Exception as e:
+            print(f"Could not load persisted aggregates: {e}")
+
+def _apply_facts(facts: pd.DataFrame, new_facts: pd.DataFrame):
+    """
+    Replace the stored facts with a full set of facts, by key.
+
+    Returns:
+    - tuple: The updated facts, the previous version of the changed and dropped facts, the new
+      or changed facts, and the number of dropped facts (stored keys missing from new_facts).
+    """
+    new_facts = new_facts[~new_facts.index.duplicated(keep="last")]
+    common = new_facts.index.intersection(facts.index)
+    previous = facts.loc[common]
+    current = new_facts.loc[common]
+    unchanged = ((previous == current) | (previous.isna() & current.isna())).all(axis=1)
+    changed_keys = common[~unchanged.values]
+    dropped_keys = facts.index.difference(new_facts.index)
+    added = new_facts.loc[changed_keys.append(new_facts.index.difference(facts.index))]
+    removed = facts.loc[changed_keys.append(dropped_keys)]
+    if added.empty and removed.empty:
+        return facts, removed, added, 0
+    return pd.concat([facts.drop(removed.index), added]), removed, added, len(dropped_keys)
+
+def _add_sums(sums: pd.DataFrame, removed: pd.DataFrame, added: pd.DataFrame, keys: list) -> pd.DataFrame:
+    """
+    Update summed aggregates with the contribution of removed and added facts.
+
+    Returns:
+    - pd.DataFrame: The updated sums, without the groups left empty.
+    """
+    if added.empty and removed.empty:
+        return sums
+
+    def contribution(facts):
+        facts = facts.assign(orders=1.0) if "orders" in sums.columns else facts
+        return facts.groupby(keys, dropna=False)[list(sums.columns)].sum()
+
+    sums = sums.add(contribution(added), fill_value=0).sub(contribution(removed), fill_value=0)
+    return sums[(sums != 0).any(axis=1)].sort_index()
+
+def get_aggregate_store(file_path: str, cache_dir: str = aggregate_cache_path) -> AggregateStore:
+    """
+    Get the aggregate store of a workbook, loading its persisted aggregates on first use.
+
+    Parameters:
+    - file_path (str): Path to the Excel file the aggregates are computed from.
+    - cache_dir (str, optional): Directory where the stores are persisted. Defaults to aggregate_cache_path.
+
+    Returns:
+    - AggregateStore: The store of the workbook.
+    """
+    path = os.path.abspath(file_path)
+    if path not in _stores:
+        name = hashlib.sha256(path.encode()).hexdigest()[:16]
+        _stores[path] = AggregateStore(os.path.join(cache_dir, f"{name}.pkl") if cache_dir else None)
+    return _stores[path]
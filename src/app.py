@@ -1,16 +1,41 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import pandas as pd
+import json
 import os
-from data_fetcher import fetch_data_from_excel
-from data_validator import validate_data
-from document_generator import generate_invoice, generate_report
+from aggregates import get_aggregate_store, resolve_period
+from data_fetcher import fetch_data_from_excel, ingestion_cache_path, preview_excel, stream_data_from_excel
+from data_validator import validate_chunks, validate_data
+from delta import get_delta_tracker, reference_fingerprint
+from document_generator import (generate_invoice, generate_invoice_batches, generate_report, generate_report_batch, invoice_cache_path,
+                                report_variants, warm_up_templates)
+from invoice_bundler import default_bundle_max_bytes
+from invoice_cache import InvoiceCache, new_cache_stats
+from invoice_index import InvoiceIndex, invoice_index_path
 from email_sender import send_invoices_to_clients, send_reports_to_managers
+from outbox import Outbox, outbox_path
+from jobs import JobManager
+from metrics import registry as metrics_registry, summarized
+from scheduler import PipelineScheduler, enabled as scheduler_enabled
 
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+# Cache of generated invoice PDFs, shared across requests
+invoice_cache = InvoiceCache(invoice_cache_path)
+
+# Index of the generated invoices and of their delivery status, read by /send-invoices
+invoice_index = InvoiceIndex(invoice_index_path)
+
+# Delivery state of the emails, so an interrupted send is resumed without duplicates
+outbox = Outbox(outbox_path)
+
+# Background jobs, run a couple at a time so one huge batch does not block other requests
+job_manager = JobManager(max_workers=2)
+
+# Compile the templates before the first request
+warm_up_templates()
+
 
 @app.route('/upload-excel', methods=['POST'])
 def upload_excel():
@@ -21,78 +46,273 @@ def upload_excel():
         return jsonify({"error": "File not found"}), 400
 
     try:
-        df = pd.read_excel(file_path, sheet_name=0)  # Read the first sheet
+        # Parse only the first rows of the first sheet
+        preview = preview_excel(file_path, nrows=int(data.get('nrows', 5)))
         head_data = {
-            "columns": df.columns.tolist(),
-            "rows": df.head().values.tolist()  # Convert the head of the DataFrame to a list of lists
+            "columns": preview["columns"],
+            "rows": preview["rows"]
         }
-        return jsonify({"head": head_data}), 200
+        return jsonify({"head": head_data, "sheets": preview["sheets"]}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@summarized('fetch-data')
+def run_fetch_data(settings, progress_callback=None, cancel_event=None):
+    """
+    Fetch and validate the workbook given in the settings, refreshing its ingestion cache and
+    report aggregates ahead of the generation.
+
+    Parameters:
+    - settings (dict): Settings sent by the UI.
+    - progress_callback (callable, optional): Unused, for the job interface.
+    - cancel_event (threading.Event, optional): Unused, for the job interface.
+
+    Returns:
+    - tuple: The response payload and HTTP status code.
+    """
+    try:
+        if not settings or not settings.get('filePath') or not os.path.exists(settings['filePath']):
+            return {"error": "Excel file not found"}, 400
+
+        data = fetch_data_from_excel(settings['filePath'], cache_dir=ingestion_cache_path)
+        if not data:
+            return {"error": "Failed to fetch data from Excel"}, 500
+
+        validation_results = validate_data(data)
+        orders, invoices = validation_results.get("Orders"), validation_results.get("Invoices")
+        get_aggregate_store(settings['filePath']).update(orders["clean_data"] if orders else None,
+                                                         invoices["clean_data"] if invoices else None)
+        rows = {sheet_name: {"valid": len(results["clean_data"]) if results["clean_data"] is not None else 0,
+                             "invalid": len(results["invalid_rows"])}
+                for sheet_name, results in validation_results.items()}
+        return {"status": "success", "message": "Data fetched successfully.", "rows": rows}, 200
+    except Exception as e:
+        return {"error": str(e)}, 500
+
 @app.route('/generate-invoices', methods=['POST'])
 def generate_invoices():
+    payload, status_code = run_generate_invoices(request.get_json())
+    return jsonify(payload), status_code
+
+@summarized('generate-invoices')
+def run_generate_invoices(settings, progress_callback=None, cancel_event=None):
+    """
+    Fetch, validate and generate the invoices of the workbook given in the settings.
+
+    With "deltaOnly", only the orders that are new or changed since the last run of the
+    workbook are validated and generated, which in turn leaves only their invoices to send.
+
+    Parameters:
+    - settings (dict): Settings sent by the UI.
+    - progress_callback (callable, optional): Receives the invoice progress events.
+    - cancel_event (threading.Event, optional): Stops the generation when set.
+
+    Returns:
+    - tuple: The response payload and HTTP status code.
+    """
     try:
-        # Assume settings file contains necessary paths
-        settings = request.get_json()
-        
         # Check if filePath is in settings
-        if 'filePath' not in settings or not settings['filePath']:
-            return jsonify({"error": "File path is missing"}), 400
+        if not settings or 'filePath' not in settings or not settings['filePath']:
+            return {"error": "File path is missing"}, 400
 
         # Check if the file exists
         if not os.path.exists(settings['filePath']):
-            return jsonify({"error": "Excel file not found"}), 400
+            return {"error": "Excel file not found"}, 400
+
+        # Stream the orders in chunks instead of loading the whole sheet if requested
+        chunk_size = settings.get('streamChunkSize')
 
         # Fetch and validate data
-        data = fetch_data_from_excel(settings['filePath'])
+        required_sheets = ["Clients", "Products"] if chunk_size else None
+        data = fetch_data_from_excel(settings['filePath'], required_sheets, cache_dir=ingestion_cache_path)
         if not data:
-            return jsonify({"error": "Failed to fetch data from Excel"}), 500
+            return {"error": "Failed to fetch data from Excel"}, 500
+
+        # Only process the orders that are new or changed since the last run if requested
+        delta = get_delta_tracker(settings['filePath']) if settings.get('deltaOnly') else None
+        lookback_days = settings.get('deltaLookbackDays')
+        selections = []  # Orders selected by the delta and their fingerprints
+        if delta is not None:
+            reference = reference_fingerprint(data.get("Clients"), data.get("Products"))
+
+            def select_orders(orders_df):
+                orders_df, fingerprints = delta.select(orders_df, reference, lookback_days)
+                selections.append((orders_df, fingerprints))
+                return orders_df
+
+            if not chunk_size and "Orders" in data:
+                data = dict(data, Orders=select_orders(data["Orders"]))
+                if data["Orders"].empty:
+                    return {"status": "success", "message": "No new or changed orders.",
+                            "delta": {"selectedOrders": 0, "highWaterMark": delta.high_water_mark}}, 200
 
         validation_results = validate_data(data)
 
-        # Generate invoices
-        client_invoice_map = generate_invoice(validation_results)
+        # Generate invoices, optionally across several worker processes
+        workers = int(settings.get('invoiceWorkers', 1))
+        errors = {}
+
+        # Skip the conversion of unchanged invoices unless the cache is disabled; the limit and
+        # counters are kept per run, as the cache is shared by concurrent jobs
+        cache = invoice_cache if settings.get('invoiceCache', True) else None
+        cache_max_bytes = int(settings.get('invoiceCacheMaxBytes', invoice_cache.max_bytes))
+        cache_stats = new_cache_stats()
+        invoiced = set()  # Orders that got an invoice
+        rejected = set()  # Orders that cannot be invoiced until their row changes
+        invalid_rows = {sheet_name: len(results["invalid_rows"]) for sheet_name, results in validation_results.items()}
+
+        if chunk_size:
+            order_chunks = stream_data_from_excel(settings['filePath'], ["Orders"], int(chunk_size))
+            if delta is not None:
+                order_chunks = ((sheet_name, select_orders(chunk)) for sheet_name, chunk in order_chunks)
+            order_batches = (results for sheet_name, results in validate_chunks(order_chunks))
+            client_invoice_map = generate_invoice_batches(
+                validation_results,
+                order_batches,
+                workers=workers,
+                errors=errors,
+                renderer=settings.get('pdfRenderer'),
+                cache=cache,
+                progress_callback=progress_callback,
+                cancel_event=cancel_event,
+                index=invoice_index,
+                cache_max_bytes=cache_max_bytes,
+                cache_stats=cache_stats,
+                invalid_rows=invalid_rows,
+                invoiced=invoiced,
+                rejected=rejected
+            )
+        else:
+            client_invoice_map = generate_invoice(
+                validation_results,
+                workers=workers,
+                errors=errors,
+                renderer=settings.get('pdfRenderer'),
+                cache=cache,
+                progress_callback=progress_callback,
+                cancel_event=cancel_event,
+                index=invoice_index,
+                cache_max_bytes=cache_max_bytes,
+                cache_stats=cache_stats,
+                invoiced=invoiced,
+                rejected=rejected
+            )
+        failed_orders = {str(order_id): message for order_id, message in errors.items()}
+        summary = {"failedOrders": failed_orders, "invalidRows": invalid_rows, "cache": cache_stats if cache else None}
+
+        # Record the orders that got an invoice or were rejected, which are only selected again once
+        # their row changes, leaving the orders that failed to render for the next run
+        if delta is not None:
+            settled_ids = {str(order_id) for order_id in invoiced | rejected}
+            if settled_ids and (cancel_event is None or not cancel_event.is_set()):
+                for orders_df, fingerprints in selections:
+                    exclude = [order_id for order_id in fingerprints.index if order_id not in settled_ids]
+                    delta.commit(orders_df, fingerprints, reference, exclude=exclude, lookback_days=lookback_days)
+            selected_orders = sum(len(orders_df) for orders_df, fingerprints in selections)
+            summary["delta"] = {"selectedOrders": selected_orders, "highWaterMark": delta.high_water_mark}
+            if not selected_orders:
+                return {"status": "success", "message": "No new or changed orders.", **summary}, 200
+            rejected_ids = {str(order_id) for order_id in rejected}
+            if not client_invoice_map and all(order_id in rejected_ids for orders_df, fingerprints in selections
+                                              for order_id in fingerprints.index):
+                return {"status": "success", "message": "No valid new or changed orders.", **summary}, 200
+
         if client_invoice_map:
-            return jsonify({"status": "success", "message": "Invoices generated successfully."}), 200
+            return {"status": "success", "message": "Invoices generated successfully.", **summary}, 200
         else:
-            return jsonify({"status": "error", "message": "Failed to generate invoices."}), 400
+            return {"status": "error", "message": "Failed to generate invoices.", **summary}, 400
     except Exception as e:
         print("Error generating invoices:", str(e))  # Debug line
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
 
 @app.route('/generate-reports', methods=['POST'])
 def generate_reports():
+    payload, status_code = run_generate_reports(request.get_json())
+    return jsonify(payload), status_code
+
+@summarized('generate-reports')
+def run_generate_reports(settings, progress_callback=None, cancel_event=None):
+    """
+    Fetch, validate and generate the report of the workbook given in the settings.
+
+    With "reportPeriods" (a list of periods) or "reportSegmentBy" (a column of the Clients
+    sheet), one report is generated per period and segment from a single load of the data,
+    and the manifest of the reports is returned.
+
+    Parameters:
+    - settings (dict): Settings sent by the UI.
+    - progress_callback (callable, optional): Receives the report progress events.
+    - cancel_event (threading.Event, optional): Stops the rendering when set.
+
+    Returns:
+    - tuple: The response payload and HTTP status code.
+    """
     try:
-        settings = request.get_json()
-        data = fetch_data_from_excel(settings['filePath'])
+        data = fetch_data_from_excel(settings['filePath'], cache_dir=ingestion_cache_path)
         validation_results = validate_data(data)
         
-        generate_report(validation_results)
-        return jsonify({"status": "success", "message": "Reports generated successfully."}), 200
+        # Report period: a month, quarter or year, or a custom range of days
+        try:
+            period = resolve_period(settings.get('reportPeriod'), settings.get('reportStart'), settings.get('reportEnd'))
+            periods = [resolve_period(name) for name in settings.get('reportPeriods') or []] or [period]
+        except ValueError as e:
+            return {"error": f"Invalid report period: {e}"}, 400
+
+        workers = int(settings.get('reportWorkers', 1))
+        aggregates = get_aggregate_store(settings['filePath'])
+
+        # Batch mode: every period and segment from the same data
+        if settings.get('reportPeriods') or settings.get('reportSegmentBy'):
+            try:
+                variants = report_variants(validation_results, periods, settings.get('reportSegmentBy'))
+            except ValueError as e:
+                return {"error": str(e)}, 400
+            manifest = generate_report_batch(validation_results, variants, renderer=settings.get('pdfRenderer'), workers=workers,
+                                             progress_callback=progress_callback, cancel_event=cancel_event, aggregates=aggregates)
+            if manifest is None:
+                return {"error": "No valid data to generate the reports."}, 400
+            return {"status": "success", "message": "Reports generated successfully.",
+                    "manifest": manifest["path"], "reports": manifest["reports"]}, 200
+
+        # Large reports are rendered in chunks of orders and merged
+        chunk_size = int(settings.get('reportChunkSize', 5000))
+        report_path = generate_report(validation_results, renderer=settings.get('pdfRenderer'), chunk_size=chunk_size,
+                                      workers=workers, progress_callback=progress_callback, cancel_event=cancel_event,
+                                      period=period, aggregates=aggregates)
+        if report_path is None:
+            return {"status": "error", "message": "Failed to generate the report."}, 500
+        return {"status": "success", "message": "Reports generated successfully.", "report": report_path}, 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
 
 @app.route('/send-invoices', methods=['POST'])
 def send_invoices():
-    try:
-        # Load settings from the request body
-        settings = request.get_json()
+    # Load settings from the request body
+    payload, status_code = run_send_invoices(request.get_json())
+    return jsonify(payload), status_code
 
-        # Ensure required settings are present
-        if not settings:
-            return jsonify({"error": "No settings provided"}), 400
+@summarized('send-invoices')
+def run_send_invoices(settings, progress_callback=None, cancel_event=None):
+    """
+    Send the generated invoices to the clients.
 
-        # Define the paths based on settings
-        invoices_folder = settings['invoicesFolder']
-        invoice_paths = find_all_invoices(invoices_folder)
+    Parameters:
+    - settings (dict): Settings sent by the UI.
+    - progress_callback (callable, optional): Receives the email progress events.
+    - cancel_event (threading.Event, optional): Stops the sending when set.
 
-        # Check if invoice paths exist
-        if not invoice_paths:
-            return jsonify({"error": "No invoice files found in the invoices folder"}), 400
+    Returns:
+    - tuple: The response payload and HTTP status code.
+    """
+    try:
+        # Ensure required settings are present
+        if not settings:
+            return {"error": "No settings provided"}, 400
 
-        # Create a mapping of client emails to their respective invoice paths
-        client_invoice_map = create_client_invoice_map(invoice_paths)
+        # Map the clients to their generated invoices that have not been sent yet
+        client_invoice_map = invoice_index.client_invoice_map()
+        if not client_invoice_map:
+            return {"error": "No pending invoices to send. Generate the invoices first."}, 400
 
         # Email server configuration
         smtp_server = settings.get('emailServer')
@@ -102,39 +322,38 @@ def send_invoices():
 
         # Validate required email settings
         if not smtp_server or not sender_email or not sender_password:
-            return jsonify({"error": "Missing email configuration settings."}), 400
+            return {"error": "Missing email configuration settings."}, 400
 
-        # Send invoices to clients
-        send_invoices_to_clients(
+        # Send invoices to clients over a pool of reused SMTP connections, optionally one
+        # email or one statement per client instead of one email per invoice
+        delivery = send_invoices_to_clients(
             client_invoice_map=client_invoice_map,
             smtp_server=smtp_server,
             port=port,
             sender_email=sender_email,
-            sender_password=sender_password
+            sender_password=sender_password,
+            connections=int(settings.get('smtpConnections', 4)),
+            rate_limit=float(settings['smtpRateLimit']) if settings.get('smtpRateLimit') else None,
+            progress_callback=progress_callback,
+            cancel_event=cancel_event,
+            consolidate=settings.get('invoiceConsolidation'),
+            outbox=outbox,
+            max_attempts=int(settings.get('emailMaxAttempts', 4)),
+            max_bytes=int(settings.get('bundleMaxBytes', default_bundle_max_bytes)),
+            invoice_identities=invoice_index.identities()
         )
 
-        return jsonify({"status": "success", "message": "Invoices sent successfully."}), 200
-
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-def create_client_invoice_map(invoice_paths):
-    """
-    Create a mapping of client emails to their respective invoice paths.
+        # Record the delivery, so sent invoices are not sent again and failed ones are retried
+        invoice_index.mark_sent(delivery["sent_ids"])
+        invoice_index.mark_failed(delivery["failed_ids"])
 
-    Parameters:
-    - invoice_paths (list): List of paths to invoice files.
+        return {"status": "success", "message": "Invoices sent successfully.", "failedRecipients": delivery["failed"],
+                "resumedEmails": delivery.get("resumed", 0)}, 200
 
-    Returns:
-    - dict: A dictionary mapping client emails to their respective invoice paths.
-    """
-    client_invoice_map = {}
-    for path in invoice_paths:
-        # Assuming the client email or ID is part of the filename, you can adjust this as needed
-        client_name = os.path.basename(path).split('_')[1]  # Adjust splitting logic as necessary
-        client_email = f"{client_name.lower()}@example.com"  # Replace this with actual logic to map client names to emails
-        client_invoice_map[client_email] = path
-    return client_invoice_map
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        return {"error": str(e)}, 500
 
 def find_all_invoices(invoices_folder):
     """
@@ -156,18 +375,32 @@ def find_all_invoices(invoices_folder):
 
 @app.route('/send-report', methods=['POST'])
 def send_report():
-    try:
-        # Load settings from the request body
-        settings = request.get_json()
+    # Load settings from the request body
+    payload, status_code = run_send_report(request.get_json())
+    return jsonify(payload), status_code
+
+@summarized('send-report')
+def run_send_report(settings, progress_callback=None, cancel_event=None):
+    """
+    Send the latest report to the managers.
 
+    Parameters:
+    - settings (dict): Settings sent by the UI.
+    - progress_callback (callable, optional): Receives the email progress events.
+    - cancel_event (threading.Event, optional): Stops the sending when set.
+
+    Returns:
+    - tuple: The response payload and HTTP status code.
+    """
+    try:
         # Ensure required settings are present
         if not settings:
-            return jsonify({"error": "No settings provided"}), 400
+            return {"error": "No settings provided"}, 400
 
         # Retrieve manager emails and validate
         manager_emails = settings.get('managerEmails', [])
         if not manager_emails:
-            return jsonify({"error": "No manager emails provided in settings"}), 400
+            return {"error": "No manager emails provided in settings"}, 400
 
         # Define the paths based on settings
         reports_folder = settings['reportsFolder']
@@ -175,7 +408,7 @@ def send_report():
 
         # Check if report path exists
         if not report_path or not os.path.exists(report_path):
-            return jsonify({"error": f"Report file not found at {report_path}"}), 400
+            return {"error": f"Report file not found at {report_path}"}, 400
 
         # Email server configuration
         smtp_server = settings.get('emailServer')
@@ -185,23 +418,32 @@ def send_report():
 
         # Validate required email settings
         if not smtp_server or not sender_email or not sender_password:
-            return jsonify({"error": "Missing email configuration settings."}), 400
+            return {"error": "Missing email configuration settings."}, 400
+
+        # Attach the invoices as bundles only on request, the report is sent alone by default
+        invoice_paths = sorted(find_all_invoices(settings['invoicesFolder'])) if settings.get('attachInvoices') else []
 
         # Send report to managers
-        send_reports_to_managers(
+        delivery = send_reports_to_managers(
             manager_emails=manager_emails,
             report_path=report_path,
             smtp_server=smtp_server,
             port=port,
             sender_email=sender_email,
             sender_password=sender_password,
-            invoice_paths=[]  # No additional invoices to attach for report sending
+            invoice_paths=invoice_paths,
+            connections=int(settings.get('smtpConnections', 4)),
+            rate_limit=float(settings['smtpRateLimit']) if settings.get('smtpRateLimit') else None,
+            progress_callback=progress_callback,
+            cancel_event=cancel_event,
+            bundle_format=settings.get('invoiceBundle', 'zip'),
+            bundle_max_bytes=int(settings.get('bundleMaxBytes', default_bundle_max_bytes))
         )
 
-        return jsonify({"status": "success", "message": "Report sent to managers successfully."}), 200
+        return {"status": "success", "message": "Report sent to managers successfully.", "failedRecipients": delivery["failed"]}, 200
 
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
 
 def find_latest_report(reports_folder):
     """
@@ -223,5 +465,103 @@ def find_latest_report(reports_folder):
         print(f"Error finding latest report: {e}")
         return None
 
+# Long-running tasks that can be submitted as background jobs
+job_tasks = {
+    'fetch-data': run_fetch_data,
+    'generate-invoices': run_generate_invoices,
+    'generate-reports': run_generate_reports,
+    'send-invoices': run_send_invoices,
+    'send-report': run_send_report,
+}
+
+@app.route('/jobs/<task>', methods=['POST'])
+def submit_job(task):
+    if task not in job_tasks:
+        return jsonify({"error": f"Unknown task '{task}'"}), 404
+
+    job = job_manager.submit(task, job_tasks[task], request.get_json())
+    return jsonify({"jobId": job.id, "status": job.status}), 202
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify({"jobs": [job.to_dict() for job in job_manager.list()]}), 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    # Resume after the last event received by a reconnecting EventSource, replaying
+    # everything if the header is missing or malformed
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', -1))
+    except ValueError:
+        last_event_id = -1
+
+    def generate():
+        for event in job.iter_events(after_id=last_event_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            event_id, event_type, data = event
+            yield f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
+
+# Pipelines of the tasks above run on cron-like schedules, in the app process on any platform
+# Started with the server below, as every started scheduler runs the due tasks: when the app
+# is served by several processes, start the scheduler in only one of them
+scheduler = PipelineScheduler(job_manager, job_tasks)
+
+@app.route('/schedules', methods=['GET'])
+def list_schedules():
+    return jsonify({"schedules": scheduler.list_scheduled_tasks()}), 200
+
+@app.route('/schedules', methods=['POST'])
+def create_schedule():
+    data = request.get_json() or {}
+    if not data.get('name') or not data.get('schedule'):
+        return jsonify({"error": "A schedule needs a name and a schedule"}), 400
+
+    try:
+        scheduled_task = scheduler.create_scheduled_task(
+            data['name'],
+            data.get('pipeline') or ['generate-invoices', 'send-invoices'],
+            data['schedule'],
+            settings={'deltaOnly': True, **(data.get('settings') or {})},  # Scheduled runs only process changed orders
+            catch_up=data.get('catchUp', True)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(scheduled_task), 201
+
+@app.route('/schedules/<name>', methods=['DELETE'])
+def delete_schedule(name):
+    if not scheduler.delete_scheduled_task(name):
+        return jsonify({"error": "Schedule not found"}), 404
+    return jsonify({"status": "success", "message": f"Schedule '{name}' deleted."}), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Counters and stage latencies in the Prometheus text format
+    return Response(metrics_registry.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
+    if scheduler_enabled:
+        scheduler.start()
     app.run(port=5000)  # Run Flask server on port 5000
@@ -1,31 +1,314 @@
+import hashlib
+import json
+import os
 import pandas as pd
+from openpyxl import load_workbook
 
-def fetch_data_from_excel(file_path: str, required_sheets: list = None) -> dict:
+try:
+    from metrics import inc, timed
+except ImportError:  # Imported as part of the src package
+    from .metrics import inc, timed
+
+# Get the root directory
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Path to parsed workbooks persisted in columnar format
+ingestion_cache_path = os.path.join(root_dir, 'data', 'cache', 'workbooks')
+
+# Parsed workbooks kept in memory, keyed by absolute file path
+_workbook_cache = {}
+
+@timed("fetch")
+def fetch_data_from_excel(file_path: str, required_sheets: list = None, use_cache: bool = True, cache_dir: str = None) -> dict:
     """
     Reads data from an Excel file and returns a dictionary of DataFrames.
 
+    Parsed sheets are cached per workbook, so repeated calls against an unchanged file
+    skip the Excel parse entirely.
+
     Parameters:
     - file_path (str): Path to the Excel file.
     - required_sheets (list of str, optional): List of sheet names to fetch. Defaults to None (fetches all sheets).
+    - use_cache (bool, optional): Whether to reuse previously parsed sheets. Defaults to True.
+    - cache_dir (str, optional): Directory where parsed sheets are also persisted as Parquet files,
+      so they survive restarts. Defaults to None (in-memory cache only).
 
     Returns:
     - dict: Dictionary where each key is a sheet name and the value is a corresponding DataFrame.
     """
     try:
-        # Load the Excel file
-        excel_data = pd.ExcelFile(file_path)
-        
-        # Determine which sheets to fetch
-        if required_sheets:
-            sheets_to_fetch = [sheet for sheet in required_sheets if sheet in excel_data.sheet_names]
-        else:
-            sheets_to_fetch = excel_data.sheet_names  # Fetch all sheets if none specified
+        if not use_cache:
+            # Load the Excel file
+            with pd.ExcelFile(file_path) as excel_data:
+                sheets_to_fetch = select_sheets(excel_data.sheet_names, required_sheets)
+
+                # Read the data from each sheet and store in a dictionary
+                return {sheet: excel_data.parse(sheet) for sheet in sheets_to_fetch}
 
-        # Read the data from each sheet and store in a dictionary
-        data = {sheet: excel_data.parse(sheet) for sheet in sheets_to_fetch}
+        entry = get_workbook_entry(file_path)
+        persist_dir = os.path.join(cache_dir, entry["hash"]) if cache_dir else None
 
-        return data
+        # The workbook is only opened if something has to be parsed from it
+        excel_data = None
+        try:
+            if entry["sheet_names"] is None:
+                entry["sheet_names"] = load_persisted_sheet_names(persist_dir)
+            if entry["sheet_names"] is None:
+                excel_data = pd.ExcelFile(file_path)
+                entry["sheet_names"] = excel_data.sheet_names
+
+            sheets_to_fetch = select_sheets(entry["sheet_names"], required_sheets)
+
+            # Parse only the sheets that are neither in memory nor persisted
+            for sheet in sheets_to_fetch:
+                if sheet in entry["sheets"]:
+                    inc("workbook_sheets_total", source="memory")
+                    continue
+                df = load_persisted_sheet(persist_dir, entry["sheet_names"], sheet)
+                if df is None:
+                    if excel_data is None:
+                        excel_data = pd.ExcelFile(file_path)
+                    df = excel_data.parse(sheet)
+                    persist_sheet(persist_dir, entry["sheet_names"], sheet, df)
+                    inc("workbook_sheets_total", source="excel")
+                else:
+                    inc("workbook_sheets_total", source="parquet")
+                entry["sheets"][sheet] = df
+        finally:
+            if excel_data is not None:
+                excel_data.close()
+
+        # Hand out copies, as downstream validation converts columns in place
+        return {sheet: entry["sheets"][sheet].copy() for sheet in sheets_to_fetch}
 
     except Exception as e:
         print(f"An error occurred while fetching data: {e}")
         return {}
+
+def preview_excel(file_path: str, nrows: int = 5) -> dict:
+    """
+    Preview the first rows of an Excel file without loading it.
+
+    Only the first nrows rows of the first sheet are parsed; the sheet names and row
+    counts come from the workbook metadata.
+
+    Parameters:
+    - file_path (str): Path to the Excel file.
+    - nrows (int, optional): Number of rows to preview. Defaults to 5.
+
+    Returns:
+    - dict: Dictionary with the following keys:
+        - "columns" (list): Header of the first sheet.
+        - "rows" (list): Up to nrows rows of the first sheet, as lists of values.
+        - "sheets" (list): One {"name", "rows"} dict per sheet, where "rows" is the number
+          of data rows declared by the sheet (None if the workbook does not declare it).
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheets = [
+            {"name": worksheet.title, "rows": max(worksheet.max_row - 1, 0) if worksheet.max_row else None}
+            for worksheet in workbook.worksheets
+        ]
+
+        first_sheet = workbook.worksheets[0]
+        header = next(first_sheet.iter_rows(values_only=True, max_row=1), ())
+        head = next(iter_sheet_chunks(first_sheet, nrows), None)
+        return {
+            "columns": list(header),
+            "rows": head.astype(object).where(head.notna(), None).values.tolist() if head is not None else [],
+            "sheets": sheets
+        }
+    finally:
+        workbook.close()
+
+def stream_data_from_excel(file_path: str, required_sheets: list = None, chunk_size: int = 10000):
+    """
+    Stream the rows of an Excel file as chunks of DataFrames, sheet after sheet.
+
+    The workbook is read with openpyxl in read-only mode, so memory stays bounded by the
+    chunk size instead of growing with the size of the file. The first row of each sheet
+    is used as the header and completely empty rows are skipped.
+
+    Parameters:
+    - file_path (str): Path to the Excel file.
+    - required_sheets (list of str, optional): List of sheet names to stream. Defaults to None (streams all sheets).
+    - chunk_size (int, optional): Maximum number of rows per chunk. Defaults to 10000.
+
+    Yields:
+    - tuple: (sheet name, DataFrame holding up to chunk_size rows of that sheet).
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet in select_sheets(workbook.sheetnames, required_sheets):
+            for chunk in iter_sheet_chunks(workbook[sheet], chunk_size):
+                yield sheet, chunk
+    finally:
+        workbook.close()
+
+def iter_sheet_chunks(worksheet, chunk_size: int = 10000):
+    """
+    Iterate over a read-only worksheet in chunks of rows.
+
+    Parameters:
+    - worksheet (ReadOnlyWorksheet): Worksheet opened in read-only mode.
+    - chunk_size (int, optional): Maximum number of rows per chunk. Defaults to 10000.
+
+    Yields:
+    - pd.DataFrame: Up to chunk_size rows, with the sheet header as columns.
+    """
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = list(header)
+    width = len(columns)
+
+    buffer = []
+    for row in rows:
+        if all(value is None for value in row):
+            continue
+        # Read-only rows are not padded to the sheet width
+        buffer.append(tuple(row[:width]) + (None,) * (width - len(row)))
+        if len(buffer) >= chunk_size:
+            yield pd.DataFrame(buffer, columns=columns)
+            buffer = []
+    if buffer:
+        yield pd.DataFrame(buffer, columns=columns)
+
+def select_sheets(sheet_names: list, required_sheets: list = None) -> list:
+    """
+    Determine which sheets to fetch.
+
+    Parameters:
+    - sheet_names (list of str): Sheet names of the workbook.
+    - required_sheets (list of str, optional): List of sheet names to fetch. Defaults to None (all sheets).
+
+    Returns:
+    - list: The sheet names to fetch, in order.
+    """
+    if required_sheets:
+        return [sheet for sheet in required_sheets if sheet in sheet_names]
+    return list(sheet_names)  # Fetch all sheets if none specified
+
+def get_workbook_entry(file_path: str) -> dict:
+    """
+    Get the in-memory cache entry of a workbook, resetting it when the file changed.
+
+    The modification time and size are checked first; the content hash is only computed
+    when they changed, so a touched but identical file keeps its parsed sheets.
+
+    Parameters:
+    - file_path (str): Path to the Excel file.
+
+    Returns:
+    - dict: Cache entry with the file "mtime", "size" and content "hash", the workbook
+      "sheet_names" (None until known) and the parsed "sheets".
+    """
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+    entry = _workbook_cache.get(path)
+
+    if entry and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+        return entry
+
+    content_hash = file_hash(path)
+    if entry and entry["hash"] == content_hash:
+        entry["mtime"], entry["size"] = stat.st_mtime_ns, stat.st_size
+        return entry
+
+    entry = {
+        "mtime": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "hash": content_hash,
+        "sheet_names": None,
+        "sheets": {}
+    }
+    _workbook_cache[path] = entry
+    return entry
+
+def clear_ingestion_cache():
+    """
+    Drop every parsed workbook kept in memory.
+    """
+    _workbook_cache.clear()
+
+def file_hash(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 hash of a file's content.
+
+    Parameters:
+    - file_path (str): Path to the file.
+    - chunk_size (int, optional): Number of bytes read at a time. Defaults to 1 MiB.
+
+    Returns:
+    - str: Hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_persisted_sheet_names(persist_dir: str):
+    """
+    Load the sheet names of a persisted workbook.
+
+    Parameters:
+    - persist_dir (str): Directory of the persisted workbook, or None.
+
+    Returns:
+    - list: The sheet names, or None if the workbook was not persisted.
+    """
+    if not persist_dir:
+        return None
+    try:
+        with open(os.path.join(persist_dir, 'sheets.json'), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def load_persisted_sheet(persist_dir: str, sheet_names: list, sheet: str):
+    """
+    Load a persisted sheet from its Parquet file.
+
+    Parameters:
+    - persist_dir (str): Directory of the persisted workbook, or None.
+    - sheet_names (list of str): Sheet names of the workbook.
+    - sheet (str): Name of the sheet to load.
+
+    Returns:
+    - pd.DataFrame: The sheet data, or None if it was not persisted.
+    """
+    if not persist_dir:
+        return None
+    sheet_path = os.path.join(persist_dir, f"{sheet_names.index(sheet)}.parquet")
+    if not os.path.exists(sheet_path):
+        return None
+    try:
+        return pd.read_parquet(sheet_path)
+    except Exception as e:
+        print(f"Could not load persisted sheet '{sheet}': {e}")
+        return None
+
+def persist_sheet(persist_dir: str, sheet_names: list, sheet: str, df: pd.DataFrame):
+    """
+    Persist a parsed sheet as a Parquet file.
+
+    Persisting is best effort: it is skipped if no Parquet engine (pyarrow) is installed
+    or the sheet holds mixed-type columns that Parquet cannot store.
+
+    Parameters:
+    - persist_dir (str): Directory of the persisted workbook, or None.
+    - sheet_names (list of str): Sheet names of the workbook.
+    - sheet (str): Name of the sheet.
+    - df (pd.DataFrame): Parsed sheet data.
+    """
+    if not persist_dir:
+        return
+    try:
+        os.makedirs(persist_dir, exist_ok=True)
+        df.to_parquet(os.path.join(persist_dir, f"{sheet_names.index(sheet)}.parquet"))
+        with open(os.path.join(persist_dir, 'sheets.json'), 'w') as f:
+            json.dump(sheet_names, f)
+    except Exception as e:
+        print(f"Could not persist sheet '{sheet}': {e}")
@@ -1,5 +1,37 @@
 import pandas as pd
 
+try:
+    from metrics import timed
+except ImportError:  # Imported as part of the src package
+    from .metrics import timed
+
+# Regular expression used to check email formats
+email_pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
+
+# Declarative validation rules for each sheet:
+# - "required": Fields that must exist; a missing field rejects the whole sheet.
+# - "numeric" / "date": Fields converted row by row; rows that fail the conversion are excluded.
+# - "email": Fields whose format is checked; invalid rows are only reported as warnings.
+# Missing values in required fields are reported as warnings.
+schemas = {
+    "Clients": {
+        "required": ["Client ID", "Client Name", "Contact Person", "Email", "Address"],
+        "email": ["Email"]
+    },
+    "Products": {
+        "required": ["Product ID", "Product Name", "Unit Price ($)", "Stock Quantity", "Description"],
+        "numeric": ["Unit Price ($)"]
+    },
+    "Orders": {
+        "required": ["Order ID", "Client ID", "Order Date", "Product ID", "Quantity", "Total Amount ($)", "Delivery Date", "Status"],
+        "date": ["Order Date"]
+    },
+    "Invoices": {
+        "required": ["Invoice ID", "Order ID", "Invoice Date", "Due Date", "Amount Due ($)", "Paid Status"],
+        "date": ["Invoice Date", "Due Date"]
+    }
+}
+
 def check_required_fields(df: pd.DataFrame, required_fields: list) -> list:
     """
     Check for missing required fields in the DataFrame.
@@ -28,12 +60,22 @@ def validate_email_format(df: pd.DataFrame) -> list:
     - list: List of warning messages for invalid email formats.
     """
     warnings = []
-    if "Email" in df.columns:
-        invalid_emails = df[~df["Email"].str.contains(r'^[\w\.-]+@[\w\.-]+\.\w+$', na=False)]
-        if not invalid_emails.empty:
-            warnings.append("Invalid email formats found.")
+    if "Email" in df.columns and invalid_email_mask(df["Email"]).any():
+        warnings.append("Invalid email formats found.")
     return warnings
 
+def invalid_email_mask(series: pd.Series) -> pd.Series:
+    """
+    Flag the values of a Series that are not valid email addresses.
+
+    Parameters:
+    - series (pd.Series): Email addresses.
+
+    Returns:
+    - pd.Series: Boolean mask, True for invalid or missing email addresses.
+    """
+    return ~series.astype("string").str.contains(email_pattern, na=False)
+
 def validate_numeric_fields(df: pd.DataFrame, field: str) -> list:
     """
     Validate that a specified field in the DataFrame is numeric.
@@ -86,53 +128,107 @@ def check_missing_values(df: pd.DataFrame, required_fields: list) -> list:
             warnings.append(f"Missing values found in {field}.")
     return warnings
 
-def validate_data(data: dict) -> dict:
+def validate_sheet(df: pd.DataFrame, schema: dict) -> dict:
     """
-    Validates the data extracted from Excel sheets to ensure it is clean and ready for processing.
+    Validate a sheet against its schema, evaluating every rule on whole columns.
+
+    Rows breaking a "numeric" or "date" rule are excluded from the clean data, while the
+    valid rows continue; only a missing required field rejects the whole sheet.
 
     Parameters:
-    - data (dict): Dictionary where each key is a sheet name, and the value is a DataFrame containing the data from that sheet.
+    - df (pd.DataFrame): DataFrame to validate.
+    - schema (dict): Validation rules of the sheet, see schemas.
 
     Returns:
-    - dict: Dictionary containing validation results for each sheet (errors, warnings, and clean data).
+    - dict: Validation results of the sheet with the following keys:
+        - "errors" (list): Sheet-level errors; clean data is None if there are any.
+        - "warnings" (list): Warnings, including a summary of the excluded rows.
+        - "clean_data" (pd.DataFrame): Valid rows, with numeric and date fields converted.
+        - "invalid_mask" (pd.Series): Boolean mask of the excluded rows, aligned with df.
+        - "invalid_rows" (pd.DataFrame): Excluded rows with a "reasons" column.
     """
-    validation_results = {}
+    required_fields = schema.get("required", [])
+    errors = check_required_fields(df, required_fields)
+    if errors:
+        return {
+            "errors": errors,
+            "warnings": [],
+            "clean_data": None,
+            "invalid_mask": pd.Series(True, index=df.index),
+            "invalid_rows": df.assign(reasons=errors[0])
+        }
 
-    # Define required fields for each sheet
-    required_fields = {
-        "Clients": ["Client ID", "Client Name", "Contact Person", "Email", "Address"],
-        "Products": ["Product ID", "Product Name", "Unit Price ($)", "Stock Quantity", "Description"],
-        "Orders": ["Order ID", "Client ID", "Order Date", "Product ID", "Quantity", "Total Amount ($)", "Delivery Date", "Status"],
-        "Invoices": ["Invoice ID", "Order ID", "Invoice Date", "Due Date", "Amount Due ($)", "Paid Status"]
+    warnings = []
+    clean = df.copy()
+    failures = []  # (mask, reason) of every row-level rule that excludes rows
+
+    for field in schema.get("numeric", []):
+        converted = pd.to_numeric(clean[field], errors='coerce')
+        failures.append((converted.isna() & clean[field].notna(), f"{field} should be numeric."))
+        clean[field] = converted
+
+    for field in schema.get("date", []):
+        converted = pd.to_datetime(clean[field], errors='coerce')
+        failures.append((converted.isna(), f"Invalid date format in {field}."))
+        clean[field] = converted
+
+    for field in schema.get("email", []):
+        invalid = invalid_email_mask(clean[field])
+        if invalid.any():
+            warnings.append(f"Invalid email formats found in {invalid.sum()} rows.")
+
+    warnings.extend(check_missing_values(df, required_fields))
+
+    invalid_mask = pd.Series(False, index=df.index)
+    for mask, reason in failures:
+        invalid_mask |= mask
+
+    # Collect the reasons of the excluded rows only
+    invalid_rows = df[invalid_mask].copy()
+    invalid_rows["reasons"] = ""
+    for mask, reason in failures:
+        failed = mask[invalid_mask]
+        invalid_rows.loc[failed, "reasons"] += reason + " "
+    invalid_rows["reasons"] = invalid_rows["reasons"].str.strip()
+
+    if not invalid_rows.empty:
+        warnings.append(f"{len(invalid_rows)} invalid rows excluded.")
+
+    return {
+        "errors": errors,
+        "warnings": warnings,
+        "clean_data": clean[~invalid_mask],
+        "invalid_mask": invalid_mask,
+        "invalid_rows": invalid_rows
     }
 
-    # Loop through each sheet and validate data
-    for sheet_name, df in data.items():
-        errors = []
-        warnings = []
-
-        # Perform various validations
-        errors.extend(check_required_fields(df, required_fields.get(sheet_name, [])))
-
-        if sheet_name == "Clients":
-            warnings.extend(validate_email_format(df))
+@timed("validate")
+def validate_data(data: dict) -> dict:
+    """
+    Validates the data extracted from Excel sheets to ensure it is clean and ready for processing.
 
-        if sheet_name == "Products":
-            errors.extend(validate_numeric_fields(df, "Unit Price ($)"))
+    Invalid rows are excluded from the clean data of their sheet instead of discarding the
+    whole sheet, so a few bad rows do not block the processing of the valid ones.
 
-        if sheet_name == "Orders":
-            errors.extend(validate_date_fields(df, ["Order Date"]))
+    Parameters:
+    - data (dict): Dictionary where each key is a sheet name, and the value is a DataFrame containing the data from that sheet.
 
-        if sheet_name == "Invoices":
-            errors.extend(validate_date_fields(df, ["Invoice Date", "Due Date"]))
+    Returns:
+    - dict: Dictionary containing validation results for each sheet (errors, warnings, clean data
+      and invalid rows), see validate_sheet.
+    """
+    return {sheet_name: validate_sheet(df, schemas.get(sheet_name, {})) for sheet_name, df in data.items()}
 
-        warnings.extend(check_missing_values(df, required_fields.get(sheet_name, [])))
+def validate_chunks(chunks):
+    """
+    Validate a stream of sheet chunks, one chunk at a time.
 
-        # Save validation results for the sheet
-        validation_results[sheet_name] = {
-            "errors": errors,
-            "warnings": warnings,
-            "clean_data": df if not errors else None  # Return clean data only if no critical errors
-        }
+    Parameters:
+    - chunks (iterable): (sheet name, DataFrame) tuples, e.g. from stream_data_from_excel.
 
-    return validation_results
+    Yields:
+    - tuple: (sheet name, validation results of the chunk), with the same errors, warnings
+      and clean data entries as validate_data.
+    """
+    for sheet_name, df in chunks:
+        yield sheet_name, validate_data({sheet_name: df})[sheet_name]
@@ -0,0 +1,181 @@
+import hashlib
+import os
+import threading
+import pandas as pd
+
+# Get the root directory
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Path to the persisted delta states
+delta_cache_path = os.path.join(root_dir, 'data', 'cache', 'delta')
+
+# Delta trackers kept in memory, keyed by absolute workbook path
+_trackers = {}
+
+def row_fingerprints(df: pd.DataFrame) -> pd.Series:
+    """
+    Fingerprint every row of a DataFrame from its values.
+
+    Parameters:
+    - df (pd.DataFrame): The rows.
+
+    Returns:
+    - pd.Series: One 64-bit fingerprint per row, in row order.
+    """
+    return pd.util.hash_pandas_object(df, index=False).reset_index(drop=True)
+
+def reference_fingerprint(*dfs) -> str:
+    """
+    Fingerprint whole sheets, e.g. the clients and products every order refers to.
+
+    Parameters:
+    - *dfs (pd.DataFrame): The sheets. None stands for a missing sheet.
+
+    Returns:
+    - str: The fingerprint of all the sheets.
+    """
+    digest = hashlib.sha256()
+    for df in dfs:
+        digest.update(b"none" if df is None else row_fingerprints(df).values.tobytes())
+        digest.update(b"|")
+    return digest.hexdigest()
+
+class DeltaTracker:
+    """
+    High-water mark and row fingerprints of the orders processed by the previous runs of a workbook.
+
+    Selecting the orders of a run only keeps the rows that are new or whose fingerprint
+    changed, so a run over a workbook that mostly holds past orders only validates, generates
+    and sends the few rows that changed. Orders are compared against the fingerprints of the
+    clients and products too, as they change what every invoice shows: when these sheets
+    change, every order is selected again.
+    """
+
+    def __init__(self, path: str = None):
+        """
+        Parameters:
+        - path (str, optional): File where the state is persisted across restarts. Defaults to None (in memory only).
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.fingerprints = pd.DataFrame({"fingerprint": pd.Series(dtype="uint64"),
+                                          "order_date": pd.Series(dtype="datetime64[ns]")})
+        self.high_water_mark = {"orderId": None, "orderDate": None}
+        self.reference = None
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def select(self, orders_df: pd.DataFrame, reference: str = None, lookback_days: int = None):
+        """
+        Select the orders that are new or changed since the last committed run.
+
+        Parameters:
+        - orders_df (pd.DataFrame): Orders read from the workbook, before validation.
+        - reference (str, optional): Fingerprint of the sheets the orders refer to, see reference_fingerprint.
+        - lookback_days (int, optional): Orders dated more than this many days before the
+          high-water mark are considered settled and skipped without comparison. Defaults to
+          None (every order is compared).
+
+        Returns:
+        - tuple: The selected orders and their fingerprints (pd.Series indexed by Order ID).
+        """
+        keys = orders_df["Order ID"].astype(str).values
+        fingerprints = pd.Series(row_fingerprints(orders_df).values, index=keys)
+
+        with self.lock:
+            if reference != self.reference:
+                return orders_df, fingerprints
+
+            stored = self.fingerprints["fingerprint"]
+            known = pd.Index(keys).isin(stored.index)
+            selected = ~known
+            selected[known] = stored.loc[keys[known]].values != fingerprints.values[known]
+
+            if lookback_days is not None and self.high_water_mark["orderDate"]:
+                cutoff = pd.Timestamp(self.high_water_mark["orderDate"]) - pd.Timedelta(days=lookback_days)
+                selected &= ~(pd.to_datetime(orders_df["Order Date"], errors="coerce") < cutoff).values
+
+        return orders_df[selected], fingerprints[selected]
+
+    def commit(self, orders_df: pd.DataFrame, fingerprints: pd.Series, reference: str = None, exclude=(),
+               lookback_days: int = None):
+        """
+        Record the orders of a run as processed and advance the high-water mark.
+
+        Parameters:
+        - orders_df (pd.DataFrame): The orders selected for the run.
+        - fingerprints (pd.Series): Their fingerprints, as returned by select.
+        - reference (str, optional): Fingerprint of the sheets the orders refer to.
+        - exclude (iterable, optional): Order IDs that failed and must be selected again by the next run.
+        - lookback_days (int, optional): Forget the fingerprints of the orders dated more than this
+          many days before the high-water mark. Defaults to None (all fingerprints are kept).
+        """
+        processed = ~fingerprints.index.isin([str(order_id) for order_id in exclude])
+        dates = pd.to_datetime(orders_df["Order Date"], errors="coerce").values
+        facts = pd.DataFrame({"fingerprint": fingerprints.values[processed], "order_date": dates[processed]},
+                             index=fingerprints.index[processed])
+
+        with self.lock:
+            if reference != self.reference:
+                self.fingerprints = self.fingerprints.iloc[0:0]
+                self.reference = reference
+            facts = pd.concat([self.fingerprints, facts])
+            self.fingerprints = facts[~facts.index.duplicated(keep="last")]
+
+            if not self.fingerprints.empty:
+                last_date = self.fingerprints["order_date"].max()
+                order_ids = pd.to_numeric(pd.Series(self.fingerprints.index), errors="coerce")
+                self.high_water_mark = {
+                    "orderId": str(self.fingerprints.index[order_ids.idxmax()]) if order_ids.notna().any() else None,
+                    "orderDate": last_date.isoformat() if pd.notna(last_date) else None,
+                }
+                if lookback_days is not None and pd.notna(last_date):
+                    cutoff = last_date - pd.Timedelta(days=lookback_days)
+                    self.fingerprints = self.fingerprints[~(self.fingerprints["order_date"] < cutoff)]
+
+            if self.path:
+                self.save()
+
+    def save(self):
+        """
+        Persist the state to its file. Must be called with the lock held.
+        """
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            pd.to_pickle({
+                "fingerprints": self.fingerprints,
+                "high_water_mark": self.high_water_mark,
+                "reference": self.reference
+            }, self.path)
+        except Exception as e:
+            print(f"Could not persist the delta state: {e}")
+
+    def load(self):
+        """
+        Load the state from its file, starting empty if it cannot be read.
+        """
+        try:
+            state = pd.read_pickle(self.path)
+            self.fingerprints = state["fingerprints"]
+            self.high_water_mark = state["high_water_mark"]
+            self.reference = state["reference"]
+        except Exception as e:
+            print(f"Could not load the persisted delta state: {e}")
+
+def get_delta_tracker(file_path: str, cache_dir: str = delta_cache_path) -> DeltaTracker:
+    """
+    Get the delta tracker of a workbook, loading its persisted state on first use.
+
+    Parameters:
+    - file_path (str): Path to the Excel file.
+    - cache_dir (str, optional): Directory where the states are persisted. Defaults to delta_cache_path.
+
+    Returns:
+    - DeltaTracker: The tracker of the workbook.
+    """
+    path = os.path.abspath(file_path)
+    if path not in _trackers:
+        name = hashlib.sha256(path.encode()).hexdigest()[:16]
+        _trackers[path] = DeltaTracker(os.path.join(cache_dir, f"{name}.pkl") if cache_dir else None)
+    return _trackers[path]
@@ -1,6 +1,27 @@
+import importlib.util
+import json
 import os
+import tempfile
 import pdfkit
-from jinja2 import Environment, FileSystemLoader, TemplateNotFound
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, TemplateNotFound
+
+try:
+    from invoice_cache import context_hash, new_cache_stats, template_fingerprint
+except ImportError:  # Imported as part of the src package
+    from .invoice_cache import context_hash, new_cache_stats, template_fingerprint
+
+try:
+    from aggregates import AggregateStore, period_mask, resolve_period
+except ImportError:  # Imported as part of the src package
+    from .aggregates import AggregateStore, period_mask, resolve_period
+
+try:
+    from metrics import inc, registry, timed
+except ImportError:  # Imported as part of the src package
+    from .metrics import inc, registry, timed
 
 # Get the root directory
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -9,13 +30,30 @@ root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 template_path = os.path.join(root_dir, 'templates')  # Path to templates
 output_invoices_path = os.path.join(root_dir, 'data', 'output', 'invoices')  # Path to invoices output
 output_reports_path = os.path.join(root_dir, 'data', 'output', 'reports')  # Path to reports output
+invoice_cache_path = os.path.join(root_dir, 'data', 'cache', 'invoices')  # Path to cached invoice PDFs
+template_bytecode_cache_path = os.path.join(root_dir, 'data', 'cache', 'templates')  # Path to compiled templates
 
 # Ensure output directories exist
 os.makedirs(output_invoices_path, exist_ok=True)
 os.makedirs(output_reports_path, exist_ok=True)
+os.makedirs(template_bytecode_cache_path, exist_ok=True)
 
-# Configure Jinja2 environment
-env = Environment(loader=FileSystemLoader(template_path))
+# Whether templates are checked for changes on every load; set TEMPLATE_AUTO_RELOAD=0 in
+# production so loaded templates are reused without touching the filesystem
+template_auto_reload = os.environ.get("TEMPLATE_AUTO_RELOAD", "1") != "0"
+
+# Configure Jinja2 environment; compiled templates are shared on disk across processes
+env = Environment(
+    loader=FileSystemLoader(template_path),
+    bytecode_cache=FileSystemBytecodeCache(template_bytecode_cache_path),
+    auto_reload=template_auto_reload
+)
+
+# Templates that shape an invoice, including the templates it extends
+invoice_templates = ['invoice_template.html', 'base_template.html']
+
+# Templates that shape a report
+report_templates = ['report_template.html', 'report_orders_template.html', 'base_template.html']
 
 def load_template(template_name):
     """
@@ -33,6 +71,27 @@ def load_template(template_name):
         print(f"Error: Template '{template_name}' not found in path '{template_path}'.")
         raise
 
+@timed("warm_up_templates")
+def warm_up_templates(template_names=None):
+    """
+    Compile and load templates ahead of the first document.
+
+    Called at startup and in every worker process, so rendering never pays the compile
+    cost; templates already compiled by another process are loaded from the bytecode cache.
+
+    Parameters:
+    - template_names (list of str, optional): Templates to load. Defaults to every HTML template.
+
+    Returns:
+    - list: The names of the loaded templates.
+    """
+    if template_names is None:
+        template_names = env.list_templates(extensions=['html'])
+    for template_name in template_names:
+        load_template(template_name)
+    return list(template_names)
+
+@timed("render_html")
 def render_html(template, context):
     """
     Render HTML content from a Jinja2 template and a context dictionary.
@@ -50,39 +109,291 @@ def render_html(template, context):
         print(f"Error rendering HTML: {e}")
         raise
 
-def html_to_pdf(html_content, output_path):
+class PdfkitRenderer:
+    """
+    Convert HTML to PDF with wkhtmltopdf through pdfkit.
+
+    wkhtmltopdf has no long-running mode, so every document still starts its own
+    process; only the binary lookup is done once per renderer.
+    """
+
+    options = {
+        'enable-local-file-access': '',  # Allow access to local files
+        'quiet': '',  # Suppress messages, but keep error messages visible
+    }
+
+    def __init__(self):
+        self.configuration = pdfkit.configuration()
+
+    def render(self, html_content, output_path):
+        pdfkit.from_string(html_content, output_path, options=self.options, configuration=self.configuration)
+
+class WeasyPrintRenderer:
+    """
+    Convert HTML to PDF in-process with WeasyPrint.
+
+    The renderer stays warm between documents: fonts are loaded once into a shared
+    font configuration and no process is spawned per document.
+    """
+
+    def __init__(self):
+        try:
+            from weasyprint import HTML
+            from weasyprint.text.fonts import FontConfiguration
+        except ImportError as e:
+            raise ImportError("The 'weasyprint' renderer requires the weasyprint package (pip install weasyprint).") from e
+        self._html = HTML
+        self.font_config = FontConfiguration()
+
+    def render(self, html_content, output_path):
+        self._html(string=html_content, base_url=template_path).write_pdf(output_path, font_config=self.font_config)
+
+# Available PDF renderer backends, by name
+renderers = {
+    'pdfkit': PdfkitRenderer,
+    'weasyprint': WeasyPrintRenderer,
+}
+default_renderer = 'pdfkit'
+
+# Renderer instances, created once per process and reused across documents
+_renderer_instances = {}
+
+def get_renderer(name=None):
+    """
+    Get the renderer instance for the given backend, creating it on first use.
+
+    Parameters:
+    - name (str, optional): Name of the renderer backend. Defaults to default_renderer.
+
+    Returns:
+    - object: Renderer with a render(html_content, output_path) method.
+    """
+    name = name or default_renderer
+    if name not in _renderer_instances:
+        if name not in renderers:
+            raise ValueError(f"Unknown PDF renderer '{name}'. Available renderers: {', '.join(renderers)}")
+        _renderer_instances[name] = renderers[name]()
+    return _renderer_instances[name]
+
+@timed("html_to_pdf")
+def html_to_pdf(html_content, output_path, renderer=None):
     """
     Convert rendered HTML content to a PDF file.
 
     Parameters:
     - html_content (str): HTML content to convert to PDF.
     - output_path (str): Path where the PDF file should be saved.
+    - renderer (str, optional): Name of the renderer backend. Defaults to default_renderer.
     """
     try:
-        # Use additional options to handle local file access and enable debugging
-        options = {
-            'enable-local-file-access': '',  # Allow access to local files
-            'quiet': '',  # Suppress messages, but keep error messages visible
-        }
-        # Convert HTML to PDF using pdfkit with specific options
-        pdfkit.from_string(html_content, output_path, options=options)
+        get_renderer(renderer).render(html_content, output_path)
     except Exception as e:
         print(f"Error generating PDF: {e}")
         raise
 
-def generate_invoice(data):
+@timed("invoice_contexts")
+def build_invoice_contexts(orders_df, clients_df, products_df, errors=None):
+    """
+    Build the invoice context of every order in a single batch of DataFrame operations.
+
+    The order lines are exploded from the comma-separated "Product ID" column, merged
+    against the products and clients, and grouped back per order. This stage does not
+    render anything, so it can be benchmarked or cached on its own.
+
+    Parameters:
+    - orders_df (pd.DataFrame): Orders with a comma-separated "Product ID" column.
+    - clients_df (pd.DataFrame): Clients keyed by "Client ID".
+    - products_df (pd.DataFrame): Products keyed by "Product ID".
+    - errors (dict, optional): If provided, filled with a mapping of order IDs to the
+      reason their context could not be built (unknown client or product).
+
+    Returns:
+    - list: One (order ID, client email, context, output path) tuple per valid order, in row order.
+    """
+    if errors is None:
+        errors = {}
+
+    orders = orders_df.reset_index(drop=True)
+
+    # Keep the first record for duplicated IDs, as the former row scans did
+    clients = clients_df.drop_duplicates("Client ID")[["Client ID", "Client Name", "Contact Person", "Email", "Address"]]
+    products = products_df[["Product ID", "Product Name", "Unit Price ($)"]].copy()
+    products["Product ID"] = products["Product ID"].astype(str).str.strip()
+    products = products.drop_duplicates("Product ID")
+
+    # Explode the comma-separated product lists into one line per product and price them
+    lines = orders[["Product ID", "Quantity"]].copy()
+    lines["Product ID"] = lines["Product ID"].astype(str).str.split(',')
+    lines = lines.explode("Product ID")
+    lines["Product ID"] = lines["Product ID"].str.strip()
+    lines["position"] = lines.index
+    lines = lines.merge(products, on="Product ID", how="left", indicator=True)
+    lines["total_price"] = lines["Quantity"] * lines["Unit Price ($)"]
+
+    # Attach the client details to every order
+    headers = orders.merge(clients, on="Client ID", how="left", indicator=True)
+    headers["client_name_safe"] = headers["Client Name"].astype(str).str.replace(" ", "_").str.replace(",", "")  # Replace spaces and commas with underscores
+
+    # Orders referencing an unknown client or product cannot be invoiced
+    invalid = {}
+    unknown_clients = headers[headers["_merge"] == "left_only"]
+    for position, client_id in zip(unknown_clients.index, unknown_clients["Client ID"]):
+        invalid.setdefault(position, f"Client ID {client_id} not found")
+    unknown_products = lines[lines["_merge"] == "left_only"]
+    for position, product_id in zip(unknown_products["position"], unknown_products["Product ID"]):
+        invalid.setdefault(position, f"Product ID {product_id} not found")
+
+    # Group the priced lines back per order
+    order_items = [[] for _ in range(len(orders))]
+    for position, product_name, unit_price, quantity, total_price in zip(
+        lines["position"], lines["Product Name"], lines["Unit Price ($)"], lines["Quantity"], lines["total_price"]
+    ):
+        order_items[position].append({
+            "product_name": product_name,
+            "unit_price": unit_price,
+            "quantity": quantity,  # Adjust as necessary
+            "total_price": total_price
+        })
+
+    jobs = []
+    for position, order in enumerate(headers.to_dict(orient='records')):
+        if position in invalid:
+            print(f"Error generating invoice for order {order['Order ID']}: {invalid[position]}")
+            errors[order["Order ID"]] = invalid[position]
+            continue
+
+        context = {
+            "invoice_id": order["Order ID"],
+            "invoice_date": order["Order Date"],
+            "due_date": order["Delivery Date"],
+            "client_name": order["Client Name"],
+            "contact_person": order["Contact Person"],
+            "client_email": order["Email"],
+            "client_address": order["Address"],
+            "order_items": order_items[position],
+            "total_amount_due": order["Total Amount ($)"]
+        }
+
+        # Define a safe and unique filename for the invoice
+        output_path = os.path.join(output_invoices_path, f"invoice_{order['client_name_safe']}_{order['Order ID']}.pdf")
+
+        jobs.append((order["Order ID"], order["Email"], context, output_path))
+
+    return jobs
+
+def render_invoice_to_pdf(context, output_path, renderer=None):
+    """
+    Render a single invoice context and convert it to a PDF file.
+
+    This is the unit of work used by both the sequential and the parallel
+    generation modes, so it must stay a module-level function (picklable).
+
+    Parameters:
+    - context (dict): Dictionary containing data to populate the invoice template.
+    - output_path (str): Path where the PDF file should be saved.
+    - renderer (str, optional): Name of the renderer backend. Defaults to default_renderer.
+
+    Returns:
+    - str: The path of the generated PDF file.
+    """
+    template = load_template('invoice_template.html')
+    html_content = render_html(template, context)
+
+    # The output file may be hard-linked to a cache entry, even when this run does not use
+    # the cache: write a new file instead of rewriting the cached one in place
+    if os.path.lexists(output_path):
+        os.remove(output_path)
+    html_to_pdf(html_content, output_path, renderer)
+    return output_path
+
+def _render_invoice_in_worker(context, output_path, renderer=None):
+    """
+    Run render_invoice_to_pdf in a worker process and hand its metrics back to the parent.
+
+    Returns:
+    - tuple: (path of the generated PDF file, snapshot of the metrics recorded for it).
+    """
+    registry.reset()
+    output_path = render_invoice_to_pdf(context, output_path, renderer)
+    return output_path, registry.snapshot()
+
+def generate_invoice(data, workers=1, errors=None, renderer=None, cache=None, progress_callback=None, cancel_event=None,
+                     index=None, cache_max_bytes=None, cache_stats=None, invoiced=None, rejected=None):
     """
     Generate an invoice PDF from the validated data.
 
     Parameters:
     - data (dict): Validated data from the Excel sheets.
+    - workers (int, optional): Number of worker processes used to render and convert
+      invoices. Defaults to 1 (sequential generation in the current process).
+    - errors (dict, optional): If provided, filled with a mapping of order IDs to the
+      error message of every order that failed to generate.
+    - renderer (str, optional): Name of the PDF renderer backend. Defaults to default_renderer.
+      Worker processes keep their renderer alive for every invoice they convert.
+    - cache (InvoiceCache, optional): Cache used to skip the conversion of unchanged invoices.
+      Defaults to None (no caching).
+    - progress_callback (callable, optional): Called with a progress event dict for the batch
+      ({"kind": "invoice", "status": "started", "total": ...}) and then for every order, with
+      a "rendered", "cached" or "failed" status, the "order_id", "path" and "error".
+    - cancel_event (threading.Event, optional): When set, no further invoice is started and
+      the invoices generated so far are returned.
+    - index (InvoiceIndex, optional): Index where every generated invoice is recorded with its
+      client email, path and content hash, for sending. Defaults to None.
+    - cache_max_bytes (int, optional): Size limit of the cache for this run. Defaults to the max_bytes of the cache.
+    - cache_stats (dict, optional): If provided, the cache "hits", "misses" and "evictions" of
+      the run are added to it.
+    - invoiced (set, optional): If provided, filled with the IDs of the orders whose invoice was
+      generated or restored from the cache.
+    - rejected (set, optional): If provided, filled with the IDs of the orders that cannot be
+      invoiced as they stand: rows rejected by the validation and orders referencing an unknown
+      client or product. Unlike rendering failures, they fail again until the row changes.
 
     Returns:
-    - dict: A dictionary mapping client emails to their respective invoice file paths.
+    - dict: A dictionary mapping client emails to the list of their invoice file paths, in order sequence.
+    """
+    if cache_stats is None:
+        cache_stats = new_cache_stats()
+
+    with _invoice_pool(workers) as executor:
+        client_invoice_map = _generate_invoices(data, executor, errors, renderer, cache, progress_callback, cancel_event,
+                                                index, cache_stats, invoiced, rejected)
+
+    _evict_cache(cache, cache_max_bytes, cache_stats)
+    return client_invoice_map
+
+def _invoice_pool(workers):
     """
+    Start the pool of worker processes used to render and convert invoices.
+
+    Returns:
+    - context manager: The ProcessPoolExecutor, or a null context holding None when
+      workers is 1 or less (sequential generation in the current process).
+    """
+    if workers is None or workers <= 1:
+        return nullcontext()
+    return ProcessPoolExecutor(max_workers=workers, initializer=warm_up_templates, initargs=(invoice_templates,))
+
+def _evict_cache(cache, max_bytes, cache_stats):
+    if cache is not None:
+        cache.evict(max_bytes, cache_stats)
+        print(f"Invoice cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['evictions']} evictions")
+
+def _generate_invoices(data, executor, errors, renderer, cache, progress_callback, cancel_event, index, cache_stats,
+                       invoiced=None, rejected=None):
+    """
+    Generate the invoices of the orders in data, see generate_invoice, without evicting the cache.
+
+    Parameters:
+    - executor (ProcessPoolExecutor): Pool the invoices are rendered in, or None to render them
+      in the current process.
+    """
+    invalid_rows = data["Orders"].get("invalid_rows")
+    if rejected is not None and invalid_rows is not None and "Order ID" in invalid_rows:
+        rejected.update(invalid_rows["Order ID"])
+
     try:
         # Load the invoice template
-        template = load_template('invoice_template.html')
+        load_template('invoice_template.html')
     except Exception as e:
         print(f"Error loading template: {e}")
         return None
@@ -93,76 +404,389 @@ def generate_invoice(data):
     products_df = data["Products"]["clean_data"]
     
     # Check if any required data is missing
-    if orders_df is None or clients_df is None:
-        print("No valid orders or clients data to generate invoices.")
+    if orders_df is None or clients_df is None or products_df is None:
+        print("No valid orders, clients or products data to generate invoices.")
         return None
 
-    # Initialize the dictionary to map client emails to their invoices
+    if errors is None:
+        errors = {}
+
+    # Build the (email, context, output path) job for every order in one batch
+    build_errors = {}
+    jobs = build_invoice_contexts(orders_df, clients_df, products_df, build_errors)
+    errors.update(build_errors)
+    if rejected is not None:
+        rejected.update(build_errors)
+
+    def report(status, order_id, path=None, error=None):
+        inc("invoices_total", status=status)
+        if progress_callback is not None:
+            progress_callback({"kind": "invoice", "status": status, "order_id": order_id, "path": path, "error": error})
+
+    if progress_callback is not None:
+        progress_callback({"kind": "invoice", "status": "started", "total": len(jobs) + len(build_errors)})
+        for order_id, message in build_errors.items():
+            report("failed", order_id, error=message)
+
+    # Restore unchanged invoices from the cache and only render the others
+    results = {}  # Maps job positions to the path of their generated PDF
+    cache_keys = {}
+    if cache is not None:
+        fingerprint = template_fingerprint(env, invoice_templates, renderer or default_renderer)
+        for position, (order_id, client_email, context, output_path) in enumerate(jobs):
+            key = cache.key(context, fingerprint)
+            if cache.fetch(key, output_path, cache_stats):
+                results[position] = output_path
+                report("cached", order_id, output_path)
+            else:
+                cache_keys[position] = key
+    pending = [position for position in range(len(jobs)) if position not in results]
+
+    if executor is None:
+        # Render and convert each invoice in the current process
+        for position in pending:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            order_id, client_email, context, output_path = jobs[position]
+            try:
+                results[position] = render_invoice_to_pdf(context, output_path, renderer)
+                report("rendered", order_id, output_path)
+            except Exception as e:
+                print(f"Error generating invoice for order {order_id}: {e}")
+                errors[order_id] = str(e)
+                report("failed", order_id, output_path, str(e))
+    else:
+        # Fan the invoices out to a pool of worker processes, each of which runs
+        # its own PDF conversions independently of the others
+        futures = {
+            executor.submit(_render_invoice_in_worker, jobs[position][2], jobs[position][3], renderer): position
+            for position in pending
+        }
+        for future in as_completed(futures):
+            position = futures[future]
+            order_id, output_path = jobs[position][0], jobs[position][3]
+            try:
+                results[position], worker_metrics = future.result()
+                registry.merge(worker_metrics)
+                report("rendered", order_id, output_path)
+            except Exception as e:
+                print(f"Error generating invoice for order {order_id}: {e}")
+                errors[order_id] = str(e)
+                report("failed", order_id, output_path, str(e))
+
+            if cancel_event is not None and cancel_event.is_set():
+                # Drop the invoices that have not started yet
+                for pending_future in futures:
+                    pending_future.cancel()
+                break
+
+    if cache is not None:
+        for position, key in cache_keys.items():
+            if position in results:
+                cache.store(key, results[position])
+
+    if index is not None:
+        index.record(
+            (order_id, client_email, results[position], context_hash(context))
+            for position, (order_id, client_email, context, output_path) in enumerate(jobs)
+            if position in results
+        )
+
+    if invoiced is not None:
+        invoiced.update(jobs[position][0] for position in results)
+
+    # Group the invoice paths by client email, in order sequence
     client_invoice_map = {}
-
-    # Loop through each order to generate an invoice
-    for index, row in orders_df.iterrows():
-        try:
-            # Lookup client details using the "Client ID"
-            client_details = clients_df[clients_df["Client ID"] == row["Client ID"]].iloc[0]
-            
-            # Create context for rendering
-            context = {
-                "invoice_id": row["Order ID"],
-                "invoice_date": row["Order Date"],
-                "due_date": row["Delivery Date"],
-                "client_name": client_details["Client Name"],
-                "contact_person": client_details["Contact Person"],
-                "client_email": client_details["Email"],
-                "client_address": client_details["Address"],
-                "order_items": [],  # To be filled dynamically
-                "total_amount_due": row["Total Amount ($)"]
-            }
-
-            # Extract order details dynamically
-            order_items = []
-            for product_id in row["Product ID"].split(','):  # Assuming multiple products are separated by commas
-                product = products_df[products_df["Product ID"] == product_id.strip()].iloc[0]
-                order_items.append({
-                    "product_name": product["Product Name"],
-                    "unit_price": product["Unit Price ($)"],
-                    "quantity": row["Quantity"],  # Adjust as necessary
-                    "total_price": row["Quantity"] * product["Unit Price ($)"]
-                })
-
-            context["order_items"] = order_items
-
-            # Define a safe and unique filename for the invoice
-            client_name_safe = client_details["Client Name"].replace(" ", "_").replace(",", "")  # Replace spaces and commas with underscores
-            output_path = os.path.join(output_invoices_path, f"invoice_{client_name_safe}_{row['Order ID']}.pdf")
-            
-            # Render the HTML content
-            html_content = render_html(template, context)
-
-            # Convert to PDF and save
-            html_to_pdf(html_content, output_path)
-
-            # Store the client email and corresponding invoice path
-            client_invoice_map[client_details["Email"]] = output_path
-
-        except Exception as e:
-            print(f"Error generating invoice for order {row['Order ID']}: {e}")
+    for position, (order_id, client_email, context, output_path) in enumerate(jobs):
+        if position in results:
+            client_invoice_map.setdefault(client_email, []).append(results[position])
 
     return client_invoice_map  # Ensure the map is returned
 
-def generate_report(data):
+def generate_invoice_batches(data, order_batches, workers=1, errors=None, renderer=None, cache=None,
+                             progress_callback=None, cancel_event=None, index=None, cache_max_bytes=None,
+                             cache_stats=None, invalid_rows=None, invoiced=None, rejected=None):
+    """
+    Generate invoices from a stream of validated order batches.
+
+    Only one batch of orders is held in memory at a time, so very large order sheets can
+    be processed straight from stream_data_from_excel and validate_chunks. The worker processes
+    are started once for all the batches, and the cache is evicted once at the end of the run.
+
+    Parameters:
+    - data (dict): Validated data from the Excel sheets, holding at least "Clients" and "Products".
+    - order_batches (iterable): Validation results of successive "Orders" chunks.
+    - workers, errors, renderer, cache, progress_callback, cancel_event, index, cache_max_bytes, invoiced, rejected:
+      See generate_invoice.
+    - cache_stats (dict, optional): If provided, the cache counters of all batches are added to it.
+    - invalid_rows (dict, optional): If provided, the invalid rows of all batches are counted
+      under its "Orders" key.
+
+    Returns:
+    - dict: A dictionary mapping client emails to the list of their invoice file paths.
+    """
+    if cache_stats is None:
+        cache_stats = new_cache_stats()
+    client_invoice_map = {}
+
+    with _invoice_pool(workers) as executor:
+        for batch in order_batches:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            if invalid_rows is not None:
+                invalid_rows["Orders"] = invalid_rows.get("Orders", 0) + len(batch["invalid_rows"])
+            batch_map = _generate_invoices(dict(data, Orders=batch), executor, errors, renderer, cache, progress_callback,
+                                           cancel_event, index, cache_stats, invoiced, rejected)
+            for client_email, invoice_paths in (batch_map or {}).items():
+                client_invoice_map.setdefault(client_email, []).extend(invoice_paths)
+
+    _evict_cache(cache, cache_max_bytes, cache_stats)
+    return client_invoice_map
+
+def client_names(clients_df):
+    """
+    Map client IDs to client names, keeping the first record of duplicated IDs.
+
+    Parameters:
+    - clients_df (pd.DataFrame): Clients keyed by "Client ID".
+
+    Returns:
+    - pd.Series: Client names indexed by client ID.
+    """
+    return clients_df.drop_duplicates("Client ID").set_index("Client ID")["Client Name"]
+
+def report_summary(aggregates, period, names, client_ids=None):
+    """
+    Build the summary part of a report context from the aggregates.
+
+    Parameters:
+    - aggregates (AggregateStore): Store holding the aggregates of the orders and invoices.
+    - period (dict): Report period, as returned by resolve_period.
+    - names (pd.Series): Client names indexed by client ID.
+    - client_ids (list, optional): Only summarize these clients. Defaults to None (all clients).
+
+    Returns:
+    - dict: Report context without the orders.
+    """
+    totals = aggregates.summary(period["start"], period["end"], top=5, client_ids=client_ids)  # Top 5 clients by purchase
+    return {
+        "report_period": period["label"],
+        "total_sales": totals["total_sales"],
+        "outstanding_invoices": totals["outstanding_invoices"],
+        "top_clients": [{"name": names.get(client_id), "total_purchase": total} for client_id, total in totals["top_clients"]]
+    }
+
+def report_order_rows(orders_df, clients_df=None):
+    """
+    Build the rows of the detailed orders table of the report.
+
+    Parameters:
+    - orders_df (pd.DataFrame): Orders to list.
+    - clients_df (pd.DataFrame, optional): Clients keyed by "Client ID". Defaults to None
+      (the orders are already joined with their clients).
+
+    Returns:
+    - list: One dict per order with the client name, order ID, order date, amount and status.
+    """
+    # Prepare Detailed Orders Report with Client Names
+    detailed_orders = orders_df.merge(clients_df, on="Client ID", how="left") if clients_df is not None else orders_df
+    detailed_orders = detailed_orders[["Client Name", "Order ID", "Order Date", "Total Amount ($)", "Status"]]
+    detailed_orders = detailed_orders.rename(columns={
+        "Client Name": "client_name",
+        "Order ID": "order_id",
+        "Order Date": "order_date",
+        "Total Amount ($)": "amount",
+        "Status": "status"
+    })
+    return detailed_orders.to_dict(orient='records')
+
+def render_report_chunk(template_name, context, output_path, renderer=None):
+    """
+    Render one chunk of the report and convert it to a PDF file.
+
+    This is the unit of work of the chunked report, so it must stay a module-level
+    function (picklable).
+
+    Parameters:
+    - template_name (str): Template of the chunk.
+    - context (dict): Dictionary containing data to populate the template.
+    - output_path (str): Path where the PDF file should be saved.
+    - renderer (str, optional): Name of the renderer backend. Defaults to default_renderer.
+
+    Returns:
+    - str: The path of the generated PDF file.
+    """
+    html_content = render_html(load_template(template_name), context)
+    html_to_pdf(html_content, output_path, renderer)
+    return output_path
+
+def pdf_merge_available():
+    """
+    Check whether PDF files can be merged, which requires the optional pypdf package.
+
+    Returns:
+    - bool: True if pypdf is installed.
+    """
+    return importlib.util.find_spec("pypdf") is not None
+
+def merge_pdfs(part_paths, output_path):
+    """
+    Concatenate PDF files into a single PDF file.
+
+    Parameters:
+    - part_paths (list of str): PDF files to concatenate, in order.
+    - output_path (str): Path where the merged PDF file should be saved.
+    """
+    try:
+        from pypdf import PdfWriter
+    except ImportError as e:
+        raise ImportError("Merging report chunks requires the pypdf package (pip install pypdf).") from e
+
+    writer = PdfWriter()
+    for part_path in part_paths:
+        writer.append(part_path)
+    with open(output_path, 'wb') as f:
+        writer.write(f)
+    writer.close()
+
+def render_report_documents(jobs, workers=1, renderer=None, on_done=None, cancel_event=None):
+    """
+    Render report documents in the current process or on a pool of worker processes.
+
+    Jobs are pulled from the iterable only when they can be submitted, and at most two
+    jobs per worker are in flight, so the contexts of the documents waiting their turn
+    are never built ahead of time.
+
+    Parameters:
+    - jobs (iterable): (template name, context, output path) tuples.
+    - workers (int, optional): Number of worker processes. Defaults to 1 (current process).
+    - renderer (str, optional): Name of the PDF renderer backend. Defaults to default_renderer.
+    - on_done (callable, optional): Called with the position of every finished job and the
+      exception it raised (None on success).
+    - cancel_event (threading.Event, optional): When set, no further job is started.
+
+    Returns:
+    - bool: False if the rendering was cancelled, True otherwise.
+    """
+    def done(position, error=None):
+        if on_done is not None:
+            on_done(position, error)
+
+    if workers is None or workers <= 1:
+        for position, job in enumerate(jobs):
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+            try:
+                render_report_chunk(*job, renderer)
+            except Exception as e:
+                done(position, e)
+                continue
+            done(position)
+        return True
+
+    def collect(futures):
+        for future in futures:
+            position = in_flight.pop(future)
+            error = future.exception()
+            done(position, error)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=warm_up_templates, initargs=(report_templates,)) as executor:
+        in_flight = {}
+        for position, job in enumerate(jobs):
+            if cancel_event is not None and cancel_event.is_set():
+                for future in in_flight:
+                    future.cancel()
+                return False
+            in_flight[executor.submit(render_report_chunk, *job, renderer)] = position
+
+            # Wait for a document to finish before building the context of another one
+            while len(in_flight) >= workers * 2:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(finished)
+        collect(list(as_completed(in_flight)))
+    return True
+
+def render_report_chunks(summary, orders_df, clients_df, output_path, chunk_size, workers=1, renderer=None,
+                         progress_callback=None, cancel_event=None):
+    """
+    Render the report in chunks of orders and merge them into a single PDF file.
+
+    The first chunk holds the summary and the first orders, the following ones only
+    continue the detailed orders table. The rows of a chunk are only built when it is
+    submitted, and at most two chunks per worker are in flight, so memory stays bounded
+    by the chunk size instead of growing with the number of orders.
+
+    Parameters:
+    - summary (dict): Report context without the orders.
+    - orders_df (pd.DataFrame): Orders to list.
+    - clients_df (pd.DataFrame): Clients keyed by "Client ID".
+    - output_path (str): Path where the report should be saved.
+    - chunk_size (int): Number of orders per chunk.
+    - workers, renderer, progress_callback, cancel_event: See generate_report.
+
+    Returns:
+    - str: The path of the report, or None if it was cancelled.
+    """
+    starts = range(0, max(len(orders_df), 1), chunk_size)
+
+    def chunk_jobs():
+        for index, start in enumerate(starts):
+            rows = report_order_rows(orders_df.iloc[start:start + chunk_size], clients_df)
+            if index == 0:
+                yield 'report_template.html', dict(summary, orders=rows), part_paths[index]
+            else:
+                yield 'report_orders_template.html', {"orders": rows}, part_paths[index]
+
+    def report(index, error):
+        # A missing chunk would leave a hole in the report, so it fails as a whole
+        if error is not None:
+            raise error
+        if progress_callback is not None:
+            progress_callback({"kind": "report", "status": "rendered", "chunk": index, "path": part_paths[index]})
+
+    if progress_callback is not None:
+        progress_callback({"kind": "report", "status": "started", "total": len(starts)})
+
+    with tempfile.TemporaryDirectory(prefix="report_") as parts_dir:
+        part_paths = [os.path.join(parts_dir, f"part_{index:05d}.pdf") for index in range(len(starts))]
+
+        if not render_report_documents(chunk_jobs(), workers, renderer, report, cancel_event):
+            return None
+
+        merge_pdfs(part_paths, output_path)
+    return output_path
+
+@timed("report")
+def generate_report(data, renderer=None, chunk_size=None, workers=1, progress_callback=None, cancel_event=None,
+                    period=None, aggregates=None):
     """
     Generate a report PDF from the validated data.
 
+    The summary comes from the aggregate store, which is brought up to date with the data
+    first; only the orders of the period are listed in the detailed report.
+
     Parameters:
     - data (dict): Validated data from the Excel sheets.
+    - renderer (str, optional): Name of the PDF renderer backend. Defaults to default_renderer.
+    - chunk_size (int, optional): Number of orders per chunk. Reports with more orders are
+      rendered chunk by chunk and merged (requires pypdf). Defaults to None (single document).
+    - workers (int, optional): Number of worker processes rendering the chunks. Defaults to 1.
+    - progress_callback (callable, optional): Called with a progress event dict for the chunks
+      ({"kind": "report", "status": "started", "total": ...}) and then for every rendered "chunk".
+    - cancel_event (threading.Event, optional): When set, no further chunk is started and no report is written.
+    - period (dict, optional): Report period, as returned by resolve_period. Defaults to all orders.
+    - aggregates (AggregateStore, optional): Store holding the aggregates of previous runs on the same
+      workbook. Defaults to None (aggregates are computed from the data for this report only).
+
+    Returns:
+    - str: The path of the generated report, or None if it could not be generated.
     """
     try:
         # Load the report template
         template = load_template('report_template.html')
     except Exception as e:
         print(f"Error loading report template: {e}")
-        return
+        return None
 
     # Access the clean DataFrames for Orders and Invoices
     orders_df = data["Orders"]["clean_data"]
@@ -171,48 +795,166 @@ def generate_report(data):
     
     if orders_df is None or invoices_df is None or clients_df is None:
         print("No valid data to generate the report.")
-        return
+        return None
 
-    # Calculate Total Sales and Outstanding Invoices
-    total_sales = orders_df["Total Amount ($)"].sum()
-    outstanding_invoices = invoices_df[invoices_df["Paid Status"] == "Unpaid"]["Amount Due ($)"].sum()
+    if period is None:
+        period = resolve_period()
+    if aggregates is None:
+        aggregates = AggregateStore()
 
-    # Calculate Total Purchases by Clients
-    client_purchases = orders_df.groupby("Client ID")["Total Amount ($)"].sum().reset_index()
-    client_purchases = client_purchases.merge(clients_df, on="Client ID", how="left")
+    # Calculate Total Sales, Outstanding Invoices and Top Clients from the aggregates
+    aggregates.update(orders_df, invoices_df)
+    summary = report_summary(aggregates, period, client_names(clients_df))
 
-    # Identify Top Clients
-    top_clients = client_purchases.nlargest(5, "Total Amount ($)").to_dict(orient='records')  # Top 5 clients by purchase
+    # Only the orders of the period are detailed
+    orders_df = orders_df[period_mask(orders_df["Order Date"], period["start"], period["end"])]
 
-    # Prepare Detailed Orders Report with Client Names
-    detailed_orders = orders_df.merge(clients_df, on="Client ID", how="left")
-    detailed_orders = detailed_orders[["Client Name", "Order ID", "Order Date", "Total Amount ($)", "Status"]]
-    detailed_orders = detailed_orders.rename(columns={
-        "Client Name": "client_name",
-        "Order ID": "order_id",
-        "Order Date": "order_date",
-        "Total Amount ($)": "amount",
-        "Status": "status"
-    })
-    orders_list = detailed_orders.to_dict(orient='records')
-
-    # Prepare context for the report
-    context = {
-        "report_period": "August 2024",  # Example: hardcoded or dynamically calculated
-        "total_sales": total_sales,
-        "outstanding_invoices": outstanding_invoices,
-        "top_clients": [{"name": client["Client Name"], "total_purchase": client["Total Amount ($)"]} for client in top_clients],
-        "orders": orders_list  # Use the detailed orders with client names
-    }
+    # Define output path
+    output_path = os.path.join(output_reports_path, f"report_{period['slug']}.pdf")
+
+    chunked = bool(chunk_size) and len(orders_df) > chunk_size
+    if chunked and not pdf_merge_available():
+        print("pypdf is not installed, rendering the report as a single document.")
+        chunked = False
 
     try:
-        # Render the HTML content
+        if chunked:
+            return render_report_chunks(summary, orders_df, clients_df, output_path, chunk_size, workers, renderer,
+                                        progress_callback, cancel_event)
+
+        # Render the HTML content, with the detailed orders and their client names
+        context = dict(summary, orders=report_order_rows(orders_df, clients_df))
         html_content = render_html(template, context)
-        
-        # Define output path
-        output_path = os.path.join(output_reports_path, "report_August_2024.pdf")
 
         # Convert to PDF and save
-        html_to_pdf(html_content, output_path)
+        html_to_pdf(html_content, output_path, renderer)
+        return output_path
     except Exception as e:
         print(f"Error generating report: {e}")
+        return None
+
+def report_variants(data, periods, segment_by=None):
+    """
+    List the report variants of a batch: one per period and, optionally, per segment of clients.
+
+    Parameters:
+    - data (dict): Validated data from the Excel sheets.
+    - periods (list of dict): Report periods, as returned by resolve_period.
+    - segment_by (str, optional): Column of the Clients sheet splitting every period into one
+      report per value, e.g. "Region" or "Account Manager". Defaults to None (no segments).
+
+    Returns:
+    - list: One {"period", "segment"} dict per report, where "segment" is None or a
+      {"column", "value"} dict.
+    """
+    if not segment_by:
+        return [{"period": period, "segment": None} for period in periods]
+
+    clients_df = data["Clients"]["clean_data"]
+    if clients_df is None or segment_by not in clients_df.columns:
+        raise ValueError(f"Segment column '{segment_by}' not found in the Clients sheet.")
+
+    values = clients_df[segment_by].dropna().drop_duplicates().tolist()
+    return [{"period": period, "segment": {"column": segment_by, "value": value}} for period in periods for value in values]
+
+@timed("report_batch")
+def generate_report_batch(data, variants, renderer=None, workers=1, progress_callback=None, cancel_event=None,
+                          aggregates=None):
+    """
+    Generate many report variants from one load of the data and write a manifest of the reports.
+
+    The aggregates are updated and the orders are joined with their clients once for the
+    whole batch; every variant then only filters the joined orders and reads its summary
+    from the aggregates. The variants are rendered in parallel, each as a single document.
+
+    Parameters:
+    - data (dict): Validated data from the Excel sheets.
+    - variants (list of dict): Reports to generate, as returned by report_variants.
+    - renderer (str, optional): Name of the PDF renderer backend. Defaults to default_renderer.
+    - workers (int, optional): Number of worker processes rendering the reports. Defaults to 1.
+    - progress_callback (callable, optional): Called with a progress event dict for the batch
+      ({"kind": "report", "status": "started", "total": ...}) and then for every report, with a
+      "rendered" or "failed" status, the "path" and "error".
+    - cancel_event (threading.Event, optional): When set, no further report is started.
+    - aggregates (AggregateStore, optional): See generate_report.
+
+    Returns:
+    - dict: The manifest, also written next to the reports, with its own "path", the
+      "generatedAt" time and one entry per report in "reports" (period, segment, path,
+      number of orders, status and error; "start" and "end" are the first and last days of the
+      period). None if the data is missing.
+    """
+    orders_df = data["Orders"]["clean_data"]
+    invoices_df = data["Invoices"]["clean_data"]
+    clients_df = data["Clients"]["clean_data"]
+
+    if orders_df is None or invoices_df is None or clients_df is None:
+        print("No valid data to generate the reports.")
+        return None
+
+    if aggregates is None:
+        aggregates = AggregateStore()
+    aggregates.update(orders_df, invoices_df)
+
+    # Join the orders with their clients once for all the variants
+    detailed_orders = orders_df.merge(clients_df, on="Client ID", how="left")
+    names = client_names(clients_df)
+
+    entries = []
+    for variant in variants:
+        period, segment = variant["period"], variant["segment"]
+        slug = period["slug"]
+        if segment is not None:
+            slug += "_" + str(segment["value"]).replace(" ", "_").replace(",", "")
+        entries.append({
+            "period": period["label"],
+            "start": f"{period['start']:%Y-%m-%d}" if period["start"] is not None else None,
+            "end": f"{period['end'] - timedelta(days=1):%Y-%m-%d}" if period["end"] is not None else None,
+            "segment": segment,
+            "path": os.path.join(output_reports_path, f"report_{slug}.pdf"),
+            "orders": None,
+            "status": "pending",
+            "error": None
+        })
+
+    def report_jobs():
+        for variant, entry in zip(variants, entries):
+            period, segment = variant["period"], variant["segment"]
+            mask = period_mask(detailed_orders["Order Date"], period["start"], period["end"])
+            client_ids = None
+            if segment is not None:
+                mask &= detailed_orders[segment["column"]] == segment["value"]
+                client_ids = clients_df.loc[clients_df[segment["column"]] == segment["value"], "Client ID"]
+
+            context = report_summary(aggregates, period, names, client_ids)
+            if segment is not None:
+                context["segment_column"], context["segment"] = segment["column"], segment["value"]
+            context["orders"] = report_order_rows(detailed_orders[mask])
+            entry["orders"] = len(context["orders"])
+            yield 'report_template.html', context, entry["path"]
+
+    def report(position, error):
+        entry = entries[position]
+        entry["status"] = "failed" if error is not None else "rendered"
+        entry["error"] = str(error) if error is not None else None
+        if error is not None:
+            print(f"Error generating report {entry['path']}: {error}")
+        if progress_callback is not None:
+            progress_callback({"kind": "report", "status": entry["status"], "path": entry["path"], "error": entry["error"]})
+
+    if progress_callback is not None:
+        progress_callback({"kind": "report", "status": "started", "total": len(entries)})
+
+    render_report_documents(report_jobs(), workers, renderer, report, cancel_event)
+    for entry in entries:
+        if entry["status"] == "pending":
+            entry["status"] = "cancelled"
+
+    manifest = {
+        "path": os.path.join(output_reports_path, f"manifest_{datetime.now():%Y%m%d_%H%M%S}.json"),
+        "generatedAt": datetime.now().isoformat(timespec="seconds"),
+        "reports": entries
+    }
+    with open(manifest["path"], 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+    return manifest
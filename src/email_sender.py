@@ -1,7 +1,35 @@
+import base64
+import collections
+import mmap
+import os
+import queue
+import re
 import smtplib
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.mime.base import MIMEBase
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from email.mime.application import MIMEApplication
+
+try:
+    from invoice_bundler import bundle_invoices, default_bundle_max_bytes, split_by_size, write_merged_pdf
+except ImportError:  # Imported as part of the src package
+    from .invoice_bundler import bundle_invoices, default_bundle_max_bytes, split_by_size, write_merged_pdf
+
+try:
+    from outbox import file_identity, outbox_key
+except ImportError:  # Imported as part of the src package
+    from .outbox import file_identity, outbox_key
+
+try:
+    from metrics import inc, timed
+except ImportError:  # Imported as part of the src package
+    from .metrics import inc, timed
+
+# Ways of consolidating the invoices of a client into a single email
+consolidation_modes = ('email', 'statement')
 
 def load_manager_emails(file_path: str) -> list:
     """
@@ -21,7 +49,157 @@ def load_manager_emails(file_path: str) -> list:
         print(f"Error: {file_path} not found.")
         return []
 
-def send_email(smtp_server, port, sender_email, sender_password, recipient_email, subject, body, attachments=None):
+def encode_attachment(file_path):
+    """
+    Encode a file as a base64 MIME attachment part.
+
+    The file is read through a memory map and encoded in one pass, so no extra raw copy
+    of its content is made; only the encoded text is kept in the part.
+
+    Parameters:
+    - file_path (str): Path of the file to attach.
+
+    Returns:
+    - MIMEBase: The attachment part, ready to be attached to any number of messages.
+    """
+    file_name = os.path.basename(file_path)
+    with open(file_path, "rb") as attachment_file:
+        if os.fstat(attachment_file.fileno()).st_size:
+            with mmap.mmap(attachment_file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                encoded = base64.encodebytes(content)
+        else:
+            encoded = b""  # Empty files cannot be memory-mapped
+
+    part = MIMEBase('application', 'octet-stream', Name=file_name)
+    part.set_payload(encoded.decode('ascii'))
+    part['Content-Transfer-Encoding'] = 'base64'
+    part['Content-Disposition'] = f'attachment; filename="{file_name}"'
+    return part
+
+class AttachmentCache:
+    """
+    Encoded attachment parts shared across messages.
+
+    Each file is encoded once and the same part is attached to every message that carries
+    it, so sending a report to many recipients does not multiply the encoding work or the
+    memory by the number of recipients. Parts are keyed by path, modification time and size,
+    and the least recently used ones are dropped beyond max_bytes of encoded content.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 ** 2):
+        """
+        Parameters:
+        - max_bytes (int, optional): Maximum size of the encoded parts kept. Defaults to 256 MiB.
+        """
+        self.max_bytes = max_bytes
+        self.parts = collections.OrderedDict()
+        self.encoding = {}  # Futures of the parts being encoded, by key
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def part(self, file_path):
+        """
+        Get the attachment part of a file, encoding it on first use.
+
+        Parameters:
+        - file_path (str): Path of the file to attach.
+
+        Returns:
+        - MIMEBase: The shared attachment part.
+        """
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+
+        # Files are encoded outside the lock; concurrent senders of the same file wait for
+        # the one encoding in progress instead of starting their own
+        with self.lock:
+            part = self.parts.get(key)
+            if part is not None:
+                self.parts.move_to_end(key)
+                return part
+            future = self.encoding.get(key)
+            encoder = future is None
+            if encoder:
+                future = self.encoding[key] = Future()
+        if not encoder:
+            return future.result()
+
+        try:
+            part = encode_attachment(file_path)
+        except BaseException as e:
+            with self.lock:
+                del self.encoding[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.encoding[key]
+            self.parts[key] = part
+            self.size += len(part.get_payload())
+            while self.size > self.max_bytes and len(self.parts) > 1:
+                _, evicted = self.parts.popitem(last=False)
+                self.size -= len(evicted.get_payload())
+        future.set_result(part)
+        return part
+
+def build_message(sender_email, recipient_email, subject, body, attachments=None, attachment_cache=None):
+    """
+    Build an email message with optional attachments.
+
+    Parameters:
+    - sender_email (str): The sender's email address.
+    - recipient_email (str): The recipient's email address.
+    - subject (str): The email subject.
+    - body (str): The email body.
+    - attachments (list, optional): List of file paths to attach to the email.
+    - attachment_cache (AttachmentCache, optional): Cache of encoded attachments shared with other
+      messages. Defaults to None (attachments are encoded for this message only).
+
+    Returns:
+    - MIMEMultipart: The email message.
+    """
+    # Set up the email content
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = recipient_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+
+    # Attach files
+    if attachments:
+        for file_path in attachments:
+            msg.attach(attachment_cache.part(file_path) if attachment_cache is not None else encode_attachment(file_path))
+
+    return msg
+
+def open_smtp_connection(smtp_server, port, sender_email, sender_password, use_tls=True, timeout=60):
+    """
+    Open an SMTP connection, upgraded to TLS and authenticated.
+
+    Parameters:
+    - smtp_server (str): The SMTP server address.
+    - port (int): Port number for the SMTP server.
+    - sender_email (str): The sender's email address.
+    - sender_password (str): The sender's email password. No login is attempted if empty.
+    - use_tls (bool, optional): Whether to upgrade the connection with STARTTLS. Defaults to True.
+    - timeout (int, optional): Socket timeout in seconds. Defaults to 60.
+
+    Returns:
+    - smtplib.SMTP: The connected SMTP client.
+    """
+    server = smtplib.SMTP(smtp_server, port, timeout=timeout)
+    try:
+        if use_tls:
+            server.starttls()
+        if sender_password:
+            server.login(sender_email, sender_password)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+@timed("send_email")
+def send_email(smtp_server, port, sender_email, sender_password, recipient_email, subject, body, attachments=None, use_tls=True):
     """
     Send an email with optional attachments.
 
@@ -34,27 +212,13 @@ def send_email(smtp_server, port, sender_email, sender_password, recipient_email
     - subject (str): The email subject.
     - body (str): The email body.
     - attachments (list, optional): List of file paths to attach to the email.
+    - use_tls (bool, optional): Whether to upgrade the connection with STARTTLS. Defaults to True.
     """
     try:
-        # Set up the email content
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = recipient_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
-
-        # Attach files
-        if attachments:
-            for file_path in attachments:
-                with open(file_path, "rb") as attachment_file:
-                    part = MIMEApplication(attachment_file.read(), Name=file_path)
-                    part['Content-Disposition'] = f'attachment; filename="{file_path.split("/")[-1]}"'
-                    msg.attach(part)
+        msg = build_message(sender_email, recipient_email, subject, body, attachments)
 
         # Set up the SMTP server and send the email
-        with smtplib.SMTP(smtp_server, port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
+        with open_smtp_connection(smtp_server, port, sender_email, sender_password, use_tls) as server:
             server.send_message(msg)
 
         print(f"Email sent to {recipient_email}")
@@ -62,27 +226,367 @@ def send_email(smtp_server, port, sender_email, sender_password, recipient_email
     except Exception as e:
         print(f"Failed to send email to {recipient_email}: {e}")
 
-def send_invoices_to_clients(client_invoice_map, smtp_server, port, sender_email, sender_password):
+class RateLimiter:
+    """
+    Space out events so that at most `rate` of them happen per second, across threads.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next event is allowed."""
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+def deliver_emails(emails, smtp_server, port, sender_email, sender_password, connections=4, rate_limit=None,
+                   messages_per_connection=100, use_tls=True, progress_callback=None, cancel_event=None,
+                   attachment_cache=None):
+    """
+    Deliver many emails over a small pool of reused, authenticated SMTP connections.
+
+    Each connection runs in its own thread and sends message after message, so the TLS
+    handshake and login are paid once per connection instead of once per email. Messages
+    are built in the worker threads, so only the messages in flight are held in memory, and
+    attachments are encoded once and shared by every message that carries them.
+
+    Parameters:
+    - emails (iterable): (recipient email, subject, body, attachments) tuples, optionally with
+      a fifth element identifying the email in the results, e.g. the invoice it carries.
+    - smtp_server (str): The SMTP server address.
+    - port (int): Port number for the SMTP server.
+    - sender_email (str): The sender's email address.
+    - sender_password (str): The sender's email password. No login is attempted if empty.
+    - connections (int, optional): Number of concurrent SMTP connections. Defaults to 4.
+    - rate_limit (float, optional): Maximum number of emails sent per second, across all
+      connections. Defaults to None (no limit).
+    - messages_per_connection (int, optional): Number of emails sent before a connection is
+      recycled, as many servers cap the messages per session. Defaults to 100.
+    - use_tls (bool, optional): Whether to upgrade the connections with STARTTLS. Defaults to True.
+    - progress_callback (callable, optional): Called with a progress event dict for the run
+      ({"kind": "email", "status": "started", "total": ...}) and then for every email, with a
+      "sent" or "failed" status, the "recipient", "error" and "id" (the fifth element of the
+      email, if any). Called from the worker threads.
+    - cancel_event (threading.Event, optional): When set, no further email is started.
+    - attachment_cache (AttachmentCache, optional): Cache of encoded attachments. Defaults to a
+      new cache for this delivery.
+
+    Returns:
+    - dict: A dictionary with the following keys:
+        - "sent" (list): Recipients whose email was accepted by the server.
+        - "failed" (dict): Recipients whose email failed, mapped to the error message.
+        - "sent_ids" (list): Identifiers of the sent emails that have one.
+        - "failed_ids" (dict): Identifiers of the failed emails that have one, mapped to the error message.
+    """
+    pending = queue.Queue()
+    for email in emails:
+        pending.put(email)
+
+    results = {"sent": [], "failed": {}, "sent_ids": [], "failed_ids": {}}
+    results_lock = threading.Lock()
+    limiter = RateLimiter(rate_limit) if rate_limit else None
+    if attachment_cache is None:
+        attachment_cache = AttachmentCache()
+
+    def report(status, recipient_email, email_id, error=None):
+        inc("emails_total", status=status)
+        if progress_callback is not None:
+            progress_callback({"kind": "email", "status": status, "recipient": recipient_email, "error": error,
+                               "id": email_id[0] if email_id else None})
+
+    if progress_callback is not None:
+        progress_callback({"kind": "email", "status": "started", "total": pending.qsize()})
+
+    def worker():
+        server = None
+        sent_on_connection = 0
+        try:
+            while cancel_event is None or not cancel_event.is_set():
+                try:
+                    recipient_email, subject, body, attachments, *email_id = pending.get_nowait()
+                except queue.Empty:
+                    return
+
+                try:
+                    msg = build_message(sender_email, recipient_email, subject, body, attachments, attachment_cache)
+                    if limiter:
+                        limiter.wait()
+
+                    # Retry once on a fresh connection if the connection dropped or could not be opened
+                    with timed("send_email"):
+                        for attempt in range(2):
+                            try:
+                                if server is not None and sent_on_connection >= messages_per_connection:
+                                    close_smtp_connection(server)
+                                    server = None
+                                if server is None:
+                                    server = open_smtp_connection(smtp_server, port, sender_email, sender_password, use_tls)
+                                    sent_on_connection = 0
+                                server.send_message(msg)
+                                break
+                            except (smtplib.SMTPServerDisconnected, OSError) as e:
+                                # Other SMTP errors are OSErrors too, but are answers of a live server, e.g. a
+                                # rejected recipient or failed login, and are not retried
+                                if isinstance(e, smtplib.SMTPException) and not isinstance(e, smtplib.SMTPServerDisconnected):
+                                    raise
+                                if server is not None:
+                                    close_smtp_connection(server)
+                                    server = None
+                                if attempt:
+                                    raise
+                    sent_on_connection += 1
+
+                    print(f"Email sent to {recipient_email}")
+                    with results_lock:
+                        results["sent"].append(recipient_email)
+                        results["sent_ids"].extend(email_id)
+                    report("sent", recipient_email, email_id)
+                except Exception as e:
+                    print(f"Failed to send email to {recipient_email}: {e}")
+                    with results_lock:
+                        results["failed"][recipient_email] = str(e)
+                        results["failed_ids"].update(dict.fromkeys(email_id, str(e)))
+                    report("failed", recipient_email, email_id, str(e))
+
+                    # Every further login would be refused too, so stop this connection
+                    if isinstance(e, smtplib.SMTPAuthenticationError):
+                        auth_errors.append(str(e))
+                        return
+        finally:
+            if server is not None:
+                close_smtp_connection(server)
+
+    auth_errors = []
+    with ThreadPoolExecutor(max_workers=max(1, connections)) as executor:
+        for _ in range(max(1, min(connections, pending.qsize()))):
+            executor.submit(worker)
+
+    # Fail the emails left behind by connections that could not log in
+    while auth_errors:
+        try:
+            recipient_email, subject, body, attachments, *email_id = pending.get_nowait()
+        except queue.Empty:
+            break
+        results["failed"][recipient_email] = auth_errors[0]
+        results["failed_ids"].update(dict.fromkeys(email_id, auth_errors[0]))
+        report("failed", recipient_email, email_id, auth_errors[0])
+
+    return results
+
+def deliver_with_outbox(emails, outbox, smtp_server, port, sender_email, sender_password, connections=4, rate_limit=None,
+                        use_tls=True, progress_callback=None, cancel_event=None, max_attempts=4, backoff=2.0,
+                        max_backoff=60.0):
+    """
+    Deliver emails through a durable outbox, so a run can be resumed without duplicate sends.
+
+    The emails are queued in the outbox, the ones sent by a previous run are skipped, and each
+    email is claimed before it is sent and marked sent as soon as the server accepts it, so
+    concurrent runs over the same emails do not send them twice. Failed emails are retried with
+    exponential backoff within the run until they run out of attempts. An interrupted run
+    leaves its unsent emails queued for the next run with the same emails.
+
+    Parameters:
+    - emails (iterable): (key, recipient email, subject, body, attachments) tuples. The key
+      identifies the email across runs, see outbox_key.
+    - outbox (Outbox): The outbox recording the delivery state.
+    - smtp_server, port, sender_email, sender_password, connections, rate_limit, use_tls: See deliver_emails.
+    - progress_callback (callable, optional): Called with a "started" event for the emails left to
+      send, and then once per email when it is sent or has failed its last attempt.
+    - cancel_event (threading.Event, optional): When set, no further email is started. The unsent
+      emails stay queued.
+    - max_attempts (int, optional): Number of attempts per email. Defaults to 4.
+    - backoff (float, optional): Delay before the first retry, in seconds, doubled for every
+      further retry. Defaults to 2.
+    - max_backoff (float, optional): Maximum delay between attempts, in seconds. Defaults to 60.
+
+    Returns:
+    - dict: The delivery results, see deliver_emails, with the keys as "sent_ids" and "failed_ids".
+      Emails sent by a previous run are counted in "sent_ids" and in "resumed" (int).
+    """
+    queued, already_sent = outbox.enqueue(emails)
+    results = {"sent": [], "failed": {}, "sent_ids": list(already_sent), "failed_ids": {}, "resumed": len(already_sent)}
+    results_lock = threading.Lock()
+    attachment_cache = AttachmentCache()
+
+    if progress_callback is not None:
+        progress_callback({"kind": "email", "status": "started", "total": len(queued)})
+
+    def record(event):
+        if event["status"] == "sent":
+            outbox.mark_sent(event["id"])
+            with results_lock:
+                results["sent"].append(event["recipient"])
+                results["sent_ids"].append(event["id"])
+        elif event["status"] == "failed":
+            status = outbox.mark_failed(event["id"], event["error"], max_attempts, backoff, max_backoff)
+            if status == "queued":
+                return  # Retried later in the run, only the final outcome is reported
+            with results_lock:
+                results["failed"][event["recipient"]] = event["error"]
+                results["failed_ids"][event["id"]] = event["error"]
+        else:
+            return
+        if progress_callback is not None:
+            progress_callback(event)
+
+    while cancel_event is None or not cancel_event.is_set():
+        due = outbox.claim(queued)
+        if not due:
+            next_attempt = outbox.next_attempt(queued)
+            if next_attempt is None:
+                break
+            delay = max(0.0, next_attempt - time.time())
+            if cancel_event is not None:
+                cancel_event.wait(delay)
+            else:
+                time.sleep(delay)
+            continue
+
+        batch = [(message["recipient"], message["subject"], message["body"], message["attachments"], message["key"])
+                 for message in due]
+        deliver_emails(batch, smtp_server, port, sender_email, sender_password, connections, rate_limit, use_tls=use_tls,
+                       progress_callback=record, cancel_event=cancel_event, attachment_cache=attachment_cache)
+
+    return results
+
+def close_smtp_connection(server):
+    """
+    Close an SMTP connection, ignoring errors from an already dropped connection.
+
+    Parameters:
+    - server (smtplib.SMTP): The SMTP client to close.
+    """
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+def send_invoices_to_clients(client_invoice_map, smtp_server, port, sender_email, sender_password, connections=4,
+                             rate_limit=None, use_tls=True, progress_callback=None,
+                             cancel_event=None, consolidate=None, outbox=None, max_attempts=4,
+                             max_bytes=default_bundle_max_bytes, invoice_identities=None):
     """
     Send invoices to clients using the client-email to invoice mapping.
 
+    By default each invoice goes out in its own email. With consolidation, each client gets a
+    single email, so the number of emails drops from the number of invoices to the number of
+    clients: "email" attaches all of the client's invoices to it, "statement" merges them into
+    one statement PDF with a bookmark per invoice (requires pypdf). A client whose invoices
+    exceed max_bytes gets one consolidated email per max_bytes of invoices.
+
     Parameters:
-    - client_invoice_map (dict): A dictionary mapping client emails to their respective invoice file paths.
+    - client_invoice_map (dict): A dictionary mapping client emails to their invoice file path, or to
+      a list of paths when a client has several invoices.
     - smtp_server (str): The SMTP server address.
     - port (int): Port number for the SMTP server.
     - sender_email (str): The sender's email address.
     - sender_password (str): The sender's email password.
+    - connections (int, optional): Number of concurrent SMTP connections. Defaults to 4.
+    - rate_limit (float, optional): Maximum number of emails sent per second. Defaults to None (no limit).
+    - use_tls (bool, optional): Whether to upgrade the connections with STARTTLS. Defaults to True.
+    - progress_callback, cancel_event: See deliver_emails.
+    - consolidate (str, optional): "email" or "statement". Defaults to None (one email per invoice).
+    - outbox (Outbox, optional): Outbox recording the delivery, so that sending the same invoices
+      again only sends the emails that were not sent yet, see deliver_with_outbox. Defaults to None.
+    - max_attempts (int, optional): Number of attempts per email with an outbox. Defaults to 4.
+    - max_bytes (int, optional): Maximum size of the invoices in one consolidated email. Defaults to 15 MiB.
+    - invoice_identities (dict, optional): Invoice paths mapped to their (invoice ID, content hash),
+      see InvoiceIndex.identities, which identify the emails in the outbox. Invoices missing from it
+      are identified by their path and content. Defaults to None.
+
+    Returns:
+    - dict: The delivery results, see deliver_emails. The "sent_ids" and "failed_ids" are invoice paths.
+      The invoices of a statement that could not be written are reported as failed.
     """
-    for client_email, invoice_path in client_invoice_map.items():
-        subject = "Your Invoice from [Your Company]"
-        body = "Dear client,\n\nPlease find your invoice attached.\n\nBest regards,\n[Your Company]"
+    if consolidate and consolidate not in consolidation_modes:
+        raise ValueError(f"Unknown consolidation mode '{consolidate}'. Available modes: {', '.join(consolidation_modes)}")
 
-        send_email(smtp_server, port, sender_email, sender_password, client_email, subject, body, [invoice_path])
+    client_invoices = {
+        client_email: [invoice_paths] if isinstance(invoice_paths, str) else list(invoice_paths)
+        for client_email, invoice_paths in client_invoice_map.items()
+    }
 
-def send_reports_to_managers(manager_emails, report_path, smtp_server, port, sender_email, sender_password, invoice_paths):
+    subject = "Your Invoice from [Your Company]"
+    body = "Dear client,\n\nPlease find your invoice attached.\n\nBest regards,\n[Your Company]"
+    consolidated_subject = "Your Invoices from [Your Company]"
+    consolidated_body = "Dear client,\n\nPlease find your {count} invoices attached.\n\nBest regards,\n[Your Company]"
+    statement_subject = "Your Statement from [Your Company]"
+    statement_body = "Dear client,\n\nPlease find attached your statement of {count} invoices.\n\nBest regards,\n[Your Company]"
+
+    with tempfile.TemporaryDirectory(prefix="invoice_statements_") as statement_dir:
+        emails = []
+        statement_errors = {}  # Invoices of the statements that could not be written, by client
+        for client_email, invoice_paths in client_invoices.items():
+            if not consolidate or len(invoice_paths) == 1:
+                emails.extend((client_email, subject, body, [invoice_path], (invoice_path,)) for invoice_path in invoice_paths)
+                continue
+
+            groups = split_by_size(invoice_paths, max_bytes)
+            for index, group in enumerate(groups, start=1):
+                part = f" (part {index} of {len(groups)})" if len(groups) > 1 else ""
+                if consolidate == 'statement':
+                    safe_email = re.sub(r'[^A-Za-z0-9._-]+', '_', client_email)
+                    statement_path = os.path.join(statement_dir, f"statement_{safe_email}_{index}.pdf")
+                    try:
+                        write_merged_pdf(group, statement_path)
+                    except Exception as e:
+                        # Only this client's statement fails; the other clients are still sent
+                        print(f"Failed to write the statement of {client_email}: {e}")
+                        statement_errors.setdefault(client_email, {})[tuple(group)] = str(e)
+                        continue
+                    emails.append((client_email, statement_subject + part, statement_body.format(count=len(group)),
+                                   [statement_path], tuple(group)))
+                else:
+                    emails.append((client_email, consolidated_subject + part, consolidated_body.format(count=len(group)),
+                                   group, tuple(group)))
+
+        if outbox is None:
+            results = deliver_emails(emails, smtp_server, port, sender_email, sender_password, connections, rate_limit,
+                                     use_tls=use_tls, progress_callback=progress_callback, cancel_event=cancel_event)
+        else:
+            # Identify the emails by the invoices they carry, which do not change across runs unlike statements
+            invoice_identities = {os.path.abspath(path): identity for path, identity in (invoice_identities or {}).items()}
+            invoices_by_key, keyed_emails = {}, []
+            for recipient_email, email_subject, email_body, attachments, email_invoices in emails:
+                identities = [invoice_identities.get(os.path.abspath(invoice_path)) or file_identity(invoice_path)
+                              for invoice_path in email_invoices]
+                key = outbox_key(recipient_email, email_subject, identities)
+                invoices_by_key[key] = email_invoices
+                keyed_emails.append((key, recipient_email, email_subject, email_body, attachments))
+            results = deliver_with_outbox(keyed_emails, outbox, smtp_server, port, sender_email, sender_password,
+                                          connections, rate_limit, use_tls=use_tls, progress_callback=progress_callback,
+                                          cancel_event=cancel_event, max_attempts=max_attempts)
+            results["sent_ids"] = [invoices_by_key[key] for key in results["sent_ids"]]
+            results["failed_ids"] = {invoices_by_key[key]: error for key, error in results["failed_ids"].items()}
+
+        for client_email, failed_groups in statement_errors.items():
+            results["failed"][client_email] = next(iter(failed_groups.values()))
+            results["failed_ids"].update(failed_groups)
+
+    # Report the delivery per invoice, whichever email carried it
+    results["sent_ids"] = [invoice_path for invoice_paths in results["sent_ids"] for invoice_path in invoice_paths]
+    results["failed_ids"] = {
+        invoice_path: error for invoice_paths, error in results["failed_ids"].items() for invoice_path in invoice_paths
+    }
+    return results
+
+def send_reports_to_managers(manager_emails, report_path, smtp_server, port, sender_email, sender_password, invoice_paths,
+                             connections=4, rate_limit=None, use_tls=True, progress_callback=None,
+                             cancel_event=None, bundle_format=None, bundle_max_bytes=default_bundle_max_bytes):
     """
     Send reports and invoices to managers.
 
+    With a bundle format, the invoices are packaged once into ZIP archives or merged PDFs of
+    at most bundle_max_bytes, shared by every manager. Each bundle goes out in its own
+    message. The report counts against the size of the first message: it is attached to the
+    first bundle when the first invoice fits alongside it, and sent on its own otherwise.
+
     Parameters:
     - manager_emails (list): List of manager email addresses.
     - report_path (str): Path to the consolidated report file.
@@ -91,10 +595,48 @@ def send_reports_to_managers(manager_emails, report_path, smtp_server, port, sen
     - sender_email (str): The sender's email address.
     - sender_password (str): The sender's email password.
     - invoice_paths (list): List of all invoice file paths.
+    - connections (int, optional): Number of concurrent SMTP connections. Defaults to 4.
+    - rate_limit (float, optional): Maximum number of emails sent per second. Defaults to None (no limit).
+    - use_tls (bool, optional): Whether to upgrade the connections with STARTTLS. Defaults to True.
+    - progress_callback, cancel_event: See deliver_emails.
+    - bundle_format (str, optional): "zip" or "pdf", see bundle_invoices. Defaults to None
+      (every invoice is attached individually).
+    - bundle_max_bytes (int, optional): Maximum size of the invoices in one bundle. Defaults to 15 MiB.
+
+    Returns:
+    - dict: The delivery results, see deliver_emails.
     """
-    for manager_email in manager_emails:
-        subject = "Monthly Reports and Invoices from [Your Company]"
-        body = "Dear Manager,\n\nPlease find the consolidated report and all invoices attached.\n\nBest regards,\n[Your Company]"
+    subject = "Monthly Reports and Invoices from [Your Company]"
+    body = "Dear Manager,\n\nPlease find the consolidated report and all invoices attached.\n\nBest regards,\n[Your Company]"
+
+    if not bundle_format or not invoice_paths:
         attachments = [report_path] + invoice_paths
+        emails = [(manager_email, subject, body, attachments) for manager_email in manager_emails]
+
+        return deliver_emails(emails, smtp_server, port, sender_email, sender_password, connections, rate_limit, use_tls=use_tls,
+                              progress_callback=progress_callback, cancel_event=cancel_event)
+
+    with tempfile.TemporaryDirectory(prefix="invoice_bundles_") as bundle_dir:
+        report_size = os.path.getsize(report_path)
+        shared = report_size + os.path.getsize(invoice_paths[0]) <= bundle_max_bytes
+        bundle_paths = bundle_invoices(invoice_paths, bundle_dir, bundle_format, bundle_max_bytes,
+                                       reserved_bytes=report_size if shared else 0)
+
+        parts = [[bundle_path] for bundle_path in bundle_paths]
+        if shared:
+            parts[0].insert(0, report_path)
+        else:
+            parts.insert(0, [report_path])
+
+        messages = []
+        for index, attachments in enumerate(parts, start=1):
+            part_subject = f"{subject} (part {index} of {len(parts)})" if len(parts) > 1 else subject
+            messages.append((part_subject, attachments))
+        emails = [
+            (manager_email, part_subject, body, attachments)
+            for manager_email in manager_emails
+            for part_subject, attachments in messages
+        ]
 
-        send_email(smtp_server, port, sender_email, sender_password, manager_email, subject, body, attachments)
+        return deliver_emails(emails, smtp_server, port, sender_email, sender_password, connections, rate_limit, use_tls=use_tls,
+                              progress_callback=progress_callback, cancel_event=cancel_event)
@@ -0,0 +1,105 @@
+import os
+import zipfile
+
+# Supported bundle formats
+bundle_formats = ('zip', 'pdf')
+
+# Default maximum size of a bundle: base64 grows attachments by a third, so 15 MiB bundles
+# keep each message under the 25 MB limit of most SMTP servers
+default_bundle_max_bytes = 15 * 1024 ** 2
+
+def bundle_invoices(invoice_paths, output_dir, bundle_format='zip', max_bytes=default_bundle_max_bytes, name='invoices',
+                    reserved_bytes=0):
+    """
+    Package invoice files into as few archives (ZIP) or merged PDFs as the size limit allows.
+
+    Invoices are streamed into the bundles one file at a time, in order; a new bundle is
+    started when the next invoice would push the current one over max_bytes. An invoice
+    larger than max_bytes gets a bundle of its own.
+
+    Parameters:
+    - invoice_paths (list of str): Invoice files to package.
+    - output_dir (str): Directory where the bundles are written.
+    - bundle_format (str, optional): "zip" for compressed archives or "pdf" for merged PDFs
+      with one bookmark per invoice (requires pypdf). Defaults to "zip".
+    - max_bytes (int, optional): Maximum size of the invoices put in one bundle. Defaults to 15 MiB.
+    - name (str, optional): Base name of the bundle files. Defaults to "invoices".
+    - reserved_bytes (int, optional): Size kept free in the first bundle's budget, e.g. for a
+      file sent in the same message. Defaults to 0.
+
+    Returns:
+    - list: Paths of the bundles, in order.
+    """
+    if bundle_format not in bundle_formats:
+        raise ValueError(f"Unknown bundle format '{bundle_format}'. Available formats: {', '.join(bundle_formats)}")
+
+    groups = split_by_size(invoice_paths, max_bytes, reserved_bytes)
+    os.makedirs(output_dir, exist_ok=True)
+
+    bundle_paths = []
+    for index, group in enumerate(groups, start=1):
+        suffix = f"_part{index}" if len(groups) > 1 else ""
+        bundle_path = os.path.join(output_dir, f"{name}{suffix}.{bundle_format}")
+        if bundle_format == 'zip':
+            write_zip(group, bundle_path)
+        else:
+            write_merged_pdf(group, bundle_path)
+        bundle_paths.append(bundle_path)
+    return bundle_paths
+
+def split_by_size(file_paths, max_bytes, reserved_bytes=0):
+    """
+    Split files into consecutive groups whose total size stays within max_bytes.
+
+    Parameters:
+    - file_paths (list of str): Files to split.
+    - max_bytes (int): Maximum total size of a group.
+    - reserved_bytes (int, optional): Size taken off the budget of the first group only. Defaults to 0.
+
+    Returns:
+    - list: Lists of file paths.
+    """
+    groups = []
+    group, group_size = [], reserved_bytes
+    for file_path in file_paths:
+        size = os.path.getsize(file_path)
+        if group and group_size + size > max_bytes:
+            groups.append(group)
+            group, group_size = [], 0
+        group.append(file_path)
+        group_size += size
+    if group:
+        groups.append(group)
+    return groups
+
+def write_zip(file_paths, bundle_path):
+    """
+    Write files into a compressed ZIP archive, streaming them from disk.
+
+    Parameters:
+    - file_paths (list of str): Files to archive, stored under their base names.
+    - bundle_path (str): Path of the archive.
+    """
+    with zipfile.ZipFile(bundle_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for file_path in file_paths:
+            archive.write(file_path, arcname=os.path.basename(file_path))
+
+def write_merged_pdf(file_paths, bundle_path):
+    """
+    Merge PDF files into one PDF, with a bookmark per file as its index.
+
+    Parameters:
+    - file_paths (list of str): PDF files to merge, in order.
+    - bundle_path (str): Path of the merged PDF.
+    """
+    try:
+        from pypdf import PdfWriter
+    except ImportError as e:
+        raise ImportError("Bundling invoices as a merged PDF requires the pypdf package (pip install pypdf).") from e
+
+    writer = PdfWriter()
+    for file_path in file_paths:
+        writer.append(file_path, outline_item=os.path.splitext(os.path.basename(file_path))[0])
+    with open(bundle_path, 'wb') as f:
+        writer.write(f)
+    writer.close()
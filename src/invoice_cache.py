@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+class InvoiceCache:
+    """
+    Content-addressed cache of generated invoice PDFs.
+
+    Each PDF is stored under the hash of everything that determines its content
+    (invoice context, template sources and renderer), so an unchanged invoice can be
+    copied back from the cache instead of being converted again. Entries are hard links
+    to the output files when possible, so output files must be replaced, never rewritten
+    in place (see render_invoice_to_pdf). The cache is bounded
+    by size and evicts the least recently used entries first.
+
+    The cache is shared by concurrent runs, so the counters of a run are kept in a stats
+    dict passed by the caller rather than on the cache.
+    """
+
+    def __init__(self, cache_dir, max_bytes=1024 ** 3):
+        """
+        Parameters:
+        - cache_dir (str): Directory where cached PDFs are stored.
+        - max_bytes (int, optional): Maximum total size of the cache. Defaults to 1 GiB.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.evict_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, context, fingerprint):
+        """
+        Compute the cache key of an invoice.
+
+        Parameters:
+        - context (dict): Invoice context used to render the template.
+        - fingerprint (str): Fingerprint of the templates and renderer, see template_fingerprint.
+
+        Returns:
+        - str: Hex digest identifying the invoice content.
+        """
+        return context_hash(context, fingerprint)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def fetch(self, key, output_path, stats=None):
+        """
+        Restore a cached invoice to the output path.
+
+        Parameters:
+        - key (str): Cache key of the invoice.
+        - output_path (str): Path where the PDF file should be available.
+        - stats (dict, optional): Counters of the run, see new_cache_stats. Its "hits" or "misses" is incremented.
+
+        Returns:
+        - bool: True on a cache hit, False if the invoice has to be generated.
+        """
+        entry_path = self._entry_path(key)
+        if not os.path.exists(entry_path):
+            if stats is not None:
+                stats["misses"] += 1
+            return False
+
+        # Reuse the existing file if it is already the cached one
+        if not (os.path.exists(output_path) and os.path.samefile(entry_path, output_path)):
+            _link_or_copy(entry_path, output_path)
+
+        os.utime(entry_path)  # Mark as recently used
+        if stats is not None:
+            stats["hits"] += 1
+        return True
+
+    def store(self, key, output_path):
+        """
+        Add a freshly generated invoice to the cache.
+
+        Parameters:
+        - key (str): Cache key of the invoice.
+        - output_path (str): Path of the generated PDF file.
+        """
+        entry_path = self._entry_path(key)
+        if os.path.exists(entry_path):
+            os.remove(entry_path)
+        _link_or_copy(output_path, entry_path)
+
+    def evict(self, max_bytes=None, stats=None):
+        """
+        Remove the least recently used entries until the cache fits in its size limit.
+
+        Parameters:
+        - max_bytes (int, optional): Size limit for this eviction. Defaults to the max_bytes of the cache.
+        - stats (dict, optional): Counters of the run, see new_cache_stats. Its "evictions" is incremented.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self.evict_lock:
+            entries = []
+            total_size = 0
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+            for mtime, size, path in sorted(entries):
+                if total_size <= max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total_size -= size
+                if stats is not None:
+                    stats["evictions"] += 1
+
+def new_cache_stats():
+    """
+    Create the counters of a run over the cache.
+
+    Returns:
+    - dict: The "hits", "misses" and "evictions" of the run, all zero.
+    """
+    return {"hits": 0, "misses": 0, "evictions": 0}
+
+def context_hash(context, fingerprint=""):
+    """
+    Hash an invoice context, which determines the content of the invoice.
+
+    Parameters:
+    - context (dict): Invoice context used to render the template.
+    - fingerprint (str, optional): Fingerprint of the templates and renderer. Defaults to "".
+
+    Returns:
+    - str: Hex digest of the context.
+    """
+    payload = json.dumps(context, sort_keys=True, default=str)
+    return hashlib.sha256(f"{fingerprint}\n{payload}".encode("utf-8")).hexdigest()
+
+def template_fingerprint(env, template_names, renderer=None):
+    """
+    Fingerprint the template sources and renderer that shape a document.
+
+    Parameters:
+    - env (Environment): Jinja2 environment used to load the templates.
+    - template_names (list): Names of the templates involved, including parent templates.
+    - renderer (str, optional): Name of the renderer backend.
+
+    Returns:
+    - str: Hex digest changing whenever one of the templates or the renderer changes.
+    """
+    digest = hashlib.sha256(str(renderer).encode("utf-8"))
+    for name in template_names:
+        source, _, _ = env.loader.get_source(env, name)
+        digest.update(name.encode("utf-8"))
+        digest.update(source.encode("utf-8"))
+    return digest.hexdigest()
+
+def _link_or_copy(source_path, target_path):
+    """Hard-link a file when possible, falling back to a copy."""
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        shutil.copyfile(source_path, target_path)
@@ -0,0 +1,137 @@
+import contextlib
+import os
+import sqlite3
+import time
+
+# Get the root directory
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Path to the index of generated invoices
+invoice_index_path = os.path.join(root_dir, 'data', 'output', 'invoice_index.sqlite')
+
+class InvoiceIndex:
+    """
+    Persistent index of the generated invoices and of their delivery status.
+
+    Every generated invoice is recorded with its client email, file path and content hash,
+    so sending is a query on the index instead of a scan of the invoices folder, and a client
+    can have any number of invoices. The hash is taken from the invoice context, as the PDF
+    bytes differ between renders: an invoice regenerated with the same content keeps its
+    status, so it is not sent twice, while a changed invoice is pending again.
+    """
+
+    def __init__(self, db_path):
+        """
+        Parameters:
+        - db_path (str): Path of the SQLite database, created if needed.
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS invoices (
+                    invoice_id TEXT PRIMARY KEY,
+                    client_email TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',  -- pending, sent or failed
+                    error TEXT,
+                    generated_at REAL NOT NULL,
+                    sent_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS invoices_status ON invoices (status, client_email)")
+            conn.execute("CREATE INDEX IF NOT EXISTS invoices_path ON invoices (path)")
+
+    @contextlib.contextmanager
+    def connect(self):
+        """Open a connection for one transaction, committed on success and always closed."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record(self, invoices):
+        """
+        Record generated invoices, replacing previous records of the same invoice IDs.
+
+        Parameters:
+        - invoices (iterable): (invoice ID, client email, path, content hash) tuples of the generated invoices.
+        """
+        now = time.time()
+        rows = [(str(invoice_id), client_email, os.path.abspath(path), content_hash, now)
+                for invoice_id, client_email, path, content_hash in invoices]
+        with self.connect() as conn:
+            conn.executemany("""
+                INSERT INTO invoices (invoice_id, client_email, path, hash, generated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (invoice_id) DO UPDATE SET
+                    status = CASE WHEN invoices.hash = excluded.hash AND invoices.client_email = excluded.client_email
+                                  THEN invoices.status ELSE 'pending' END,
+                    sent_at = CASE WHEN invoices.hash = excluded.hash AND invoices.client_email = excluded.client_email
+                                   THEN invoices.sent_at END,
+                    error = NULL,
+                    client_email = excluded.client_email,
+                    path = excluded.path,
+                    hash = excluded.hash,
+                    generated_at = excluded.generated_at
+            """, rows)
+
+    def unsent(self):
+        """
+        List the invoices that still have to be sent (pending, or failed on a previous send).
+
+        Returns:
+        - list: One dict per invoice with the "invoice_id", "client_email", "path", "hash",
+          "status", "error", "generated_at" and "sent_at", in generation order.
+        """
+        with self.connect() as conn:
+            rows = conn.execute("SELECT * FROM invoices WHERE status != 'sent' ORDER BY generated_at, rowid").fetchall()
+        return [dict(row) for row in rows]
+
+    def client_invoice_map(self):
+        """
+        Map every client with unsent invoices to the paths of these invoices.
+
+        Returns:
+        - dict: A dictionary mapping client emails to lists of invoice file paths.
+        """
+        client_invoice_map = {}
+        for invoice in self.unsent():
+            client_invoice_map.setdefault(invoice["client_email"], []).append(invoice["path"])
+        return client_invoice_map
+
+    def identities(self):
+        """
+        Map the paths of the unsent invoices to their invoice ID and content hash.
+
+        Returns:
+        - dict: A dictionary mapping invoice file paths to (invoice ID, content hash) tuples.
+        """
+        return {invoice["path"]: (invoice["invoice_id"], invoice["hash"]) for invoice in self.unsent()}
+
+    def mark_sent(self, paths):
+        """
+        Mark invoices as sent.
+
+        Parameters:
+        - paths (iterable): Paths of the sent invoices.
+        """
+        now = time.time()
+        with self.connect() as conn:
+            conn.executemany("UPDATE invoices SET status = 'sent', error = NULL, sent_at = ? WHERE path = ?",
+                             [(now, os.path.abspath(path)) for path in paths])
+
+    def mark_failed(self, errors):
+        """
+        Mark invoices as failed.
+
+        Parameters:
+        - errors (dict): Paths of the invoices that could not be sent, mapped to the error message.
+        """
+        with self.connect() as conn:
+            conn.executemany("UPDATE invoices SET status = 'failed', error = ? WHERE path = ?",
+                             [(error, os.path.abspath(path)) for path, error in errors.items()])
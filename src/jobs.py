@@ -0,0 +1,233 @@
+import collections
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+class Job:
+    """
+    A background task with its status, progress counters, event log and cancellation flag.
+    """
+
+    def __init__(self, kind, max_events=1000):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"  # queued, running, succeeded, failed or cancelled
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+
+        # Recent events, for the progress streams; waiters are woken on every new event
+        self.events = collections.deque(maxlen=max_events)
+        self.next_event_id = 0
+        self.new_event = threading.Condition(self.lock)
+        self.stage_started = {}  # Monotonic start time of every kind of progress
+
+    def record(self, event):
+        """
+        Record a progress event reported by the pipeline.
+
+        Events are dictionaries with a "kind" (e.g. "invoice" or "email") and a "status".
+        A "started" event adds its "total" to the "<kind>_total" counter, any other status
+        increments the "<kind>_<status>" counter (e.g. "invoice_rendered", "email_sent") and
+        the "<kind>_done" counter. The event is then published to the progress streams along with the number of items
+        done, the throughput in items per second and the estimated time left in seconds.
+
+        Parameters:
+        - event (dict): The progress event.
+        """
+        with self.lock:
+            kind = event["kind"]
+            now = time.monotonic()
+            self.stage_started.setdefault(kind, now)
+
+            if event["status"] == "started":
+                counter, amount = f"{kind}_total", event.get("total", 0)
+            else:
+                counter, amount = f"{kind}_{event['status']}", 1
+                self.progress[f"{kind}_done"] = self.progress.get(f"{kind}_done", 0) + 1
+            self.progress[counter] = self.progress.get(counter, 0) + amount
+
+            done = self.progress.get(f"{kind}_done", 0)
+            total = self.progress.get(f"{kind}_total", 0)
+            elapsed = now - self.stage_started[kind]
+            rate = done / elapsed if elapsed > 0 else None
+            eta = (total - done) / rate if rate and total >= done else None
+            self._publish("progress", {**event, "done": done, "total": total, "rate": rate, "eta": eta})
+
+    def set_status(self, status, result=None, error=None):
+        """
+        Change the status of the job and publish it to the progress streams.
+
+        Parameters:
+        - status (str): The new status.
+        - result (dict, optional): The task payload, once finished.
+        - error (str, optional): The error message of a failed task.
+        """
+        with self.lock:
+            self.status = status
+            if status == "running":
+                self.started_at = time.time()
+            elif status != "queued":
+                self.result = result
+                self.error = error
+                self.finished_at = time.time()
+            self._publish("status", {"status": status, "result": result, "error": error, "progress": dict(self.progress)})
+
+    def iter_events(self, after_id=-1, heartbeat=15):
+        """
+        Iterate over the events of the job as they are published, until it is finished.
+
+        Parameters:
+        - after_id (int, optional): Only yield the events published after this event ID. Defaults to -1 (all events).
+        - heartbeat (float, optional): Seconds after which None is yielded if nothing was published,
+          so that the stream can keep its connection alive. Defaults to 15.
+
+        Yields:
+        - tuple: (event ID, event type, event data), or None as a heartbeat.
+        """
+        while True:
+            with self.lock:
+                pending = [event for event in self.events if event[0] > after_id]
+                if not pending:
+                    if self.finished_at is not None:
+                        return
+                    self.new_event.wait(heartbeat)
+                    pending = [event for event in self.events if event[0] > after_id]
+
+            if not pending:
+                yield None
+            for event in pending:
+                after_id = event[0]
+                yield event
+
+    def _publish(self, event_type, data):
+        """Append an event to the log and wake the streams. Must be called with the lock held."""
+        self.events.append((self.next_event_id, event_type, data))
+        self.next_event_id += 1
+        self.new_event.notify_all()
+
+    def to_dict(self):
+        """
+        Describe the job for the status endpoints.
+
+        Returns:
+        - dict: The job ID, kind, status, progress counters, result and timestamps.
+        """
+        with self.lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "progress": dict(self.progress),
+                "result": self.result,
+                "error": self.error,
+                "createdAt": self.created_at,
+                "startedAt": self.started_at,
+                "finishedAt": self.finished_at
+            }
+
+class JobManager:
+    """
+    Run long tasks on a bounded pool of background threads.
+
+    Tasks are called as task(*args, progress_callback=job.record, cancel_event=job.cancel_event)
+    and must return a (payload, status code) tuple, like the request handlers of the app.
+    """
+
+    def __init__(self, max_workers=2, max_finished_jobs=100):
+        """
+        Parameters:
+        - max_workers (int, optional): Number of jobs running at the same time. Defaults to 2.
+        - max_finished_jobs (int, optional): Number of finished jobs kept for status queries. Defaults to 100.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, kind, task, *args):
+        """
+        Queue a task as a new job.
+
+        Parameters:
+        - kind (str): Name of the task, e.g. "generate-invoices".
+        - task (callable): The task to run.
+        - *args: Positional arguments passed to the task.
+
+        Returns:
+        - Job: The queued job.
+        """
+        job = Job(kind)
+        with self.lock:
+            self.jobs[job.id] = job
+            self._prune()
+        self.executor.submit(self._run, job, task, args)
+        return job
+
+    def get(self, job_id):
+        """
+        Get a job by ID.
+
+        Parameters:
+        - job_id (str): The job ID.
+
+        Returns:
+        - Job: The job, or None if it is unknown.
+        """
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        """
+        List the known jobs, most recent first.
+
+        Returns:
+        - list: The jobs.
+        """
+        with self.lock:
+            return sorted(self.jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id):
+        """
+        Request the cancellation of a job.
+
+        A queued job will not start; a running job stops at the next document or email.
+
+        Parameters:
+        - job_id (str): The job ID.
+
+        Returns:
+        - Job: The job, or None if it is unknown.
+        """
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel_event.set()
+        return job
+
+    def _run(self, job, task, args):
+        if job.cancel_event.is_set():
+            job.set_status("cancelled")
+            return
+
+        job.set_status("running")
+        try:
+            payload, status_code = task(*args, progress_callback=job.record, cancel_event=job.cancel_event)
+            if job.cancel_event.is_set():
+                job.set_status("cancelled", payload)
+            else:
+                job.set_status("succeeded" if status_code < 400 else "failed", payload)
+        except Exception as e:
+            job.set_status("failed", error=str(e))
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished_jobs."""
+        finished = [job for job in self.jobs.values() if job.finished_at is not None]
+        finished.sort(key=lambda job: job.finished_at)
+        for job in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job.id]
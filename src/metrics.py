@@ -0,0 +1,306 @@
+import functools
+import json
+import math
+import os
+import re
+import threading
+import time
+import uuid
+
+# Get the root directory
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Path to the per-run metrics summaries
+metrics_output_path = os.path.join(root_dir, 'data', 'output', 'metrics')
+
+# Instrumentation can be switched off with METRICS_ENABLED=0; the timers then do nothing
+enabled = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+# Number of summaries kept per run name; older ones are removed as new ones are written
+summary_retention = int(os.environ.get("METRICS_SUMMARY_RETENTION", "100"))
+
+# Upper bounds, in seconds, of the latency histogram buckets
+default_buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, math.inf)
+
+class MetricsRegistry:
+    """
+    Thread-safe store of counters and latency histograms, identified by name and labels.
+    """
+
+    def __init__(self, buckets=default_buckets):
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        """
+        Increment a counter.
+
+        Parameters:
+        - name (str): Name of the counter, e.g. "invoices_total".
+        - amount (float, optional): Amount to add. Defaults to 1.
+        - **labels: Labels of the counter, e.g. status="rendered".
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """
+        Record a value, e.g. a duration in seconds, in a histogram.
+
+        Parameters:
+        - name (str): Name of the histogram.
+        - value (float): The observed value.
+        - **labels: Labels of the histogram, e.g. stage="fetch".
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0, "max": 0.0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][index] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+            histogram["max"] = max(histogram["max"], value)
+
+    def snapshot(self):
+        """
+        Copy the current values, e.g. to ship them from a worker process or to diff them later.
+
+        Returns:
+        - dict: The "counters" and "histograms", keyed by (name, labels).
+        """
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {key: dict(value, buckets=list(value["buckets"])) for key, value in self.histograms.items()}
+            }
+
+    def merge(self, snapshot):
+        """
+        Add the values of a snapshot taken in another registry, e.g. in a worker process.
+
+        Parameters:
+        - snapshot (dict): Snapshot returned by snapshot().
+        """
+        with self.lock:
+            for key, value in snapshot["counters"].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, value in snapshot["histograms"].items():
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    self.histograms[key] = dict(value, buckets=list(value["buckets"]))
+                    continue
+                histogram["buckets"] = [a + b for a, b in zip(histogram["buckets"], value["buckets"])]
+                histogram["sum"] += value["sum"]
+                histogram["count"] += value["count"]
+                histogram["max"] = max(histogram["max"], value["max"])
+
+    def reset(self):
+        """Drop every counter and histogram."""
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render_prometheus(self):
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        Returns:
+        - str: The metrics, one sample per line.
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        for name in sorted({key[0] for key in snapshot["counters"]}):
+            lines.append(f"# TYPE {name} counter")
+            for (sample_name, labels), value in sorted(snapshot["counters"].items()):
+                if sample_name == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for name in sorted({key[0] for key in snapshot["histograms"]}):
+            lines.append(f"# TYPE {name} histogram")
+            for (sample_name, labels), histogram in sorted(snapshot["histograms"].items()):
+                if sample_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+        return "\n".join(lines) + "\n" if lines else ""
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels) + "}"
+
+def _escape_label(value):
+    # Backslashes, double quotes and newlines must be escaped in label values
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_key(key):
+    name, labels = key
+    return name + _format_labels(labels)
+
+# Registry of the current process
+registry = MetricsRegistry()
+
+def inc(name, amount=1, **labels):
+    """
+    Increment a counter of the process registry, if instrumentation is enabled.
+
+    Parameters:
+    - name (str): Name of the counter.
+    - amount (float, optional): Amount to add. Defaults to 1.
+    - **labels: Labels of the counter.
+    """
+    if enabled:
+        registry.inc(name, amount, **labels)
+
+class timed:
+    """
+    Time a pipeline stage into the "pipeline_stage_duration_seconds" histogram.
+
+    Usable as a context manager (with timed("fetch"): ...) or as a decorator (@timed("fetch")).
+    """
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter() if enabled else None
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.start is not None:
+            registry.observe("pipeline_stage_duration_seconds", time.perf_counter() - self.start, stage=self.stage)
+
+    def __call__(self, func):
+        stage = self.stage
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with timed(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+def run_summary(before, after=None):
+    """
+    Summarize the metrics recorded between two snapshots, e.g. over one run.
+
+    Parameters:
+    - before (dict): Snapshot taken at the start of the run.
+    - after (dict, optional): Snapshot taken at the end of the run. Defaults to now.
+
+    Returns:
+    - dict: The "counters" and the "stages" (count, total, mean and max seconds) of the run.
+      The max is exact when the run set the highest value so far; otherwise the histograms
+      only tell the upper bound of the highest bucket the run recorded into.
+    """
+    if after is None:
+        after = registry.snapshot()
+
+    counters = {}
+    for key, value in after["counters"].items():
+        delta = value - before["counters"].get(key, 0)
+        if delta:
+            counters[_format_key(key)] = delta
+
+    stages = {}
+    for key, histogram in after["histograms"].items():
+        previous = before["histograms"].get(key, {"buckets": [0] * len(histogram["buckets"]), "sum": 0.0, "count": 0, "max": 0.0})
+        count = histogram["count"] - previous["count"]
+        if count:
+            total = histogram["sum"] - previous["sum"]
+            stages[_format_key(key)] = {"count": count, "total": total, "mean": total / count,
+                                        "max": _run_max(histogram, previous)}
+
+    return {"counters": counters, "stages": stages}
+
+def _run_max(histogram, previous):
+    if histogram["max"] > previous["max"]:
+        return histogram["max"]
+    for bound, after_count, before_count in reversed(list(zip(registry.buckets, histogram["buckets"], previous["buckets"]))):
+        if after_count > before_count:
+            return min(bound, histogram["max"])
+    return histogram["max"]
+
+def write_run_summary(path, name, before, retention=None):
+    """
+    Write the summary of a run as JSON, removing the oldest summaries of the same name.
+
+    Parameters:
+    - path (str): Directory where the summary is written.
+    - name (str): Name of the run, e.g. "generate-invoices".
+    - before (dict): Snapshot taken at the start of the run.
+    - retention (int, optional): Number of summaries of the run name kept. Defaults to summary_retention.
+
+    Returns:
+    - str: The path of the summary file.
+    """
+    os.makedirs(path, exist_ok=True)
+    finished_at = time.time()
+    summary = dict(run_summary(before), run=name, finishedAt=finished_at)
+    # Microseconds order the runs of the same second; the random suffix keeps concurrent runs apart
+    stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(finished_at)) + f"_{int(finished_at % 1 * 1e6):06d}"
+    summary_path = os.path.join(path, f"{name}_{stamp}_{uuid.uuid4().hex[:8]}.json")
+    with open(summary_path, "w") as f:
+        json.dump(summary, f, indent=2)
+
+    # File names start with the time of the run, so they sort oldest first
+    pattern = re.compile(rf"{re.escape(name)}_\d{{8}}_\d{{6}}_\d{{6}}_[0-9a-f]{{8}}\.json")
+    summaries = sorted(file_name for file_name in os.listdir(path) if pattern.fullmatch(file_name))
+    retention = summary_retention if retention is None else retention
+    for file_name in summaries[:max(0, len(summaries) - max(1, retention))]:
+        try:
+            os.remove(os.path.join(path, file_name))
+        except FileNotFoundError:
+            pass  # Removed by a concurrent run
+    return summary_path
+
+def summarized(name, path=None):
+    """
+    Decorate a run so that the metrics it records are written as a per-run summary.
+
+    Runs that overlap in time (e.g. concurrent jobs) share the process registry, so
+    their summaries include each other's metrics.
+
+    Parameters:
+    - name (str): Name of the run, used in the summary file name.
+    - path (str, optional): Directory where the summaries are written. Defaults to metrics_output_path.
+
+    Returns:
+    - callable: The decorator.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            before = registry.snapshot()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                try:
+                    write_run_summary(path or metrics_output_path, name, before)
+                except OSError as e:
+                    print(f"Could not write the metrics summary of '{name}': {e}")
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,233 @@
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# Get the root directory
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Path to the outbox of the email runs
+outbox_path = os.path.join(root_dir, 'data', 'output', 'outbox.sqlite')
+
+def file_identity(file_path):
+    """
+    Identify a file by its path and content, for files that are not in the invoice index.
+
+    Parameters:
+    - file_path (str): Path to the file.
+
+    Returns:
+    - list: The absolute path and the SHA-256 digest of the content, None when the file cannot be read.
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    except OSError:
+        return [os.path.abspath(file_path), None]
+    return [os.path.abspath(file_path), digest.hexdigest()]
+
+def outbox_key(recipient_email, subject, invoices=()):
+    """
+    Identify a message across runs, from its recipient, its subject and the invoices it carries.
+
+    The invoices are identified by their invoice ID and content hash from the invoice index
+    (or by file_identity), not by file metadata: regenerating an unchanged invoice or reusing it
+    from the cache finds the same message, while an invoice whose content changed makes a new one.
+
+    Parameters:
+    - recipient_email (str): The recipient's email address.
+    - subject (str): Subject of the email.
+    - invoices (iterable, optional): Identities of the invoices the message is made from,
+      e.g. (invoice ID, content hash) pairs.
+
+    Returns:
+    - str: The message key.
+    """
+    identity = [recipient_email, subject, [list(invoice) for invoice in invoices]]
+    return hashlib.sha256(json.dumps(identity).encode()).hexdigest()
+
+class Outbox:
+    """
+    Durable record of the messages of the email runs and of their delivery state.
+
+    Messages are queued before they are sent and marked sent as soon as the server accepts
+    them, so a run that is interrupted or fails partway is resumed by queuing the same
+    messages again: the ones already sent are skipped. Failed messages are retried with
+    exponential backoff until they run out of attempts.
+
+    A message is claimed before it is sent, atomically moving it to "sending" for a lease, so
+    concurrent runs over the same messages never send one twice. The lease of a message left
+    in "sending" by a run that died expires, and the message can then be claimed again.
+    """
+
+    def __init__(self, db_path):
+        """
+        Parameters:
+        - db_path (str): Path of the SQLite database, created if needed.
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    key TEXT PRIMARY KEY,
+                    recipient TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    attachments TEXT NOT NULL,  -- JSON list of file paths
+                    status TEXT NOT NULL DEFAULT 'queued',  -- queued, sending, sent or failed
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    queued_at REAL NOT NULL,
+                    next_attempt_at REAL NOT NULL,  -- End of the lease while sending
+                    sent_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_status ON messages (status, next_attempt_at)")
+
+    @contextlib.contextmanager
+    def connect(self):
+        """Open a connection for one transaction, committed on success and always closed."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, messages):
+        """
+        Queue messages for sending, unless they were already sent.
+
+        Messages queued or failed in a previous run are queued again with fresh attempts and
+        their current content, e.g. attachments rebuilt at a new path. Messages being sent by
+        another run are left to it.
+
+        Parameters:
+        - messages (iterable): (key, recipient email, subject, body, attachments) tuples.
+
+        Returns:
+        - tuple: The keys of the queued messages and the keys of the messages already sent, in order.
+        """
+        now = time.time()
+        rows = [(key, recipient_email, subject, body, json.dumps(list(attachments or [])), now, now)
+                for key, recipient_email, subject, body, attachments in messages]
+        with self.connect() as conn:
+            conn.executemany("""
+                INSERT INTO messages (key, recipient, subject, body, attachments, queued_at, next_attempt_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    recipient = excluded.recipient,
+                    subject = excluded.subject,
+                    body = excluded.body,
+                    attachments = excluded.attachments,
+                    status = 'queued',
+                    attempts = 0,
+                    error = NULL,
+                    queued_at = excluded.queued_at,
+                    next_attempt_at = excluded.next_attempt_at
+                WHERE messages.status NOT IN ('sent', 'sending')
+            """, rows)
+            sent = {row["key"] for row in self._select(conn, "key", [row[0] for row in rows], "status = 'sent'")}
+
+        queued = [row[0] for row in rows if row[0] not in sent]
+        return queued, [row[0] for row in rows if row[0] in sent]
+
+    def claim(self, keys, now=None, lease_seconds=600):
+        """
+        Claim the messages among keys that are due for sending, moving them to "sending".
+
+        A message is due when it is queued and its next attempt is due, or when the lease of a
+        previous claim expired. The claim is a single UPDATE, so a message is only ever claimed
+        by one run at a time.
+
+        Parameters:
+        - keys (list): Keys of the messages of the run.
+        - now (float, optional): Current time. Defaults to time.time().
+        - lease_seconds (float, optional): Time after which a claimed message that was neither
+          marked sent nor failed can be claimed again. Defaults to 600.
+
+        Returns:
+        - list: One dict per message with the "key", "recipient", "subject", "body", "attachments"
+          (list of file paths) and "attempts", in queuing order.
+        """
+        now = time.time() if now is None else now
+        rows = []
+        with self.connect() as conn:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows.extend(conn.execute(
+                    f"UPDATE messages SET status = 'sending', next_attempt_at = ? "
+                    f"WHERE key IN ({', '.join('?' * len(batch))}) AND status IN ('queued', 'sending') AND next_attempt_at <= ? "
+                    "RETURNING key, recipient, subject, body, attachments, attempts, queued_at, rowid",
+                    (now + lease_seconds, *batch, now)
+                ).fetchall())
+        rows.sort(key=lambda row: (row["queued_at"], row["rowid"]))
+        return [{"key": row["key"], "recipient": row["recipient"], "subject": row["subject"], "body": row["body"],
+                 "attachments": json.loads(row["attachments"]), "attempts": row["attempts"]} for row in rows]
+
+    def next_attempt(self, keys):
+        """
+        Get the time of the next attempt among the queued messages of keys.
+
+        Parameters:
+        - keys (list): Keys of the messages of the run.
+
+        Returns:
+        - float: The time of the next attempt, or None if no message is queued.
+        """
+        with self.connect() as conn:
+            rows = self._select(conn, "next_attempt_at", keys, "status = 'queued'")
+        return min((row["next_attempt_at"] for row in rows), default=None)
+
+    def mark_sent(self, key):
+        """
+        Mark a message as sent.
+
+        Parameters:
+        - key (str): Key of the message.
+        """
+        with self.connect() as conn:
+            conn.execute("UPDATE messages SET status = 'sent', error = NULL, attempts = attempts + 1, sent_at = ? WHERE key = ?",
+                         (time.time(), key))
+
+    def mark_failed(self, key, error, max_attempts=1, backoff=1.0, max_backoff=300.0):
+        """
+        Record a failed attempt of a claimed message, scheduling a retry if it has attempts left.
+
+        The n-th retry waits backoff * 2 ** (n - 1) seconds, capped at max_backoff.
+
+        Parameters:
+        - key (str): Key of the message.
+        - error (str): The error message.
+        - max_attempts (int, optional): Number of attempts before the message is failed. Defaults to 1.
+        - backoff (float, optional): Delay before the first retry, in seconds. Defaults to 1.
+        - max_backoff (float, optional): Maximum delay between attempts, in seconds. Defaults to 300.
+
+        Returns:
+        - str: The new status of the message, "queued" for a retry or "failed".
+        """
+        with self.connect() as conn:
+            row = conn.execute("SELECT attempts FROM messages WHERE key = ?", (key,)).fetchone()
+            attempts = (row["attempts"] if row else 0) + 1
+            status = "queued" if attempts < max_attempts else "failed"
+            next_attempt_at = time.time() + min(max_backoff, backoff * 2 ** (attempts - 1))
+            conn.execute("UPDATE messages SET status = ?, attempts = ?, error = ?, next_attempt_at = ? WHERE key = ?",
+                         (status, attempts, error, next_attempt_at, key))
+        return status
+
+    def _select(self, conn, columns, keys, condition, params=()):
+        # Query the messages of keys in batches, within the SQLite variable limit
+        rows = []
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows.extend(conn.execute(
+                f"SELECT {columns} FROM messages WHERE key IN ({', '.join('?' * len(batch))}) AND {condition} "
+                "ORDER BY queued_at, rowid", (*batch, *params)
+            ).fetchall())
+        return rows
@@ -1,56 +1,375 @@
-import subprocess
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+import schedule
 
-def create_scheduled_task(script_path, task_name="SendEmailsTask", time="09:00"):
+# Get the root directory
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Path to the persisted scheduled tasks
+schedules_path = os.path.join(root_dir, 'data', 'output', 'schedules.json')
+
+# The scheduler can be switched off with SCHEDULER_ENABLED=0, e.g. when another process runs it
+enabled = os.environ.get("SCHEDULER_ENABLED", "1") != "0"
+
+# Settings that are never persisted with the scheduled tasks, mapped to the environment
+# variable they are read from when a pipeline runs
+secret_settings = {
+    "emailPassword": "EMAIL_PASSWORD",
+}
+
+# Shortcuts for common schedules
+cron_aliases = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+class CronSchedule:
     """
-    Create a scheduled task to run the Python script using Windows Task Scheduler.
+    A cron-like schedule: "minute hour day-of-month month day-of-week".
 
-    Parameters:
-    - script_path (str): The full path to the Python script.
-    - task_name (str): The name of the scheduled task.
-    - time (str): The time in HH:MM format when the task should run daily.
+    Fields accept "*", values, ranges ("1-5"), lists ("1,15") and steps ("*/15", "8-18/2").
+    Days of the week run from 0 (Sunday) to 6, 7 being Sunday too. As in cron, a day matches
+    either of the day-of-month and day-of-week fields when both are restricted. The aliases
+    "@hourly", "@daily", "@weekly", "@monthly" and a plain "HH:MM" (every day at that time)
+    are accepted too.
     """
-    try:
-        # Define the command to create a scheduled task
-        command = [
-            "schtasks", "/create", "/tn", task_name, "/tr", f'python "{script_path}"', "/sc", "daily", "/st", time, "/rl", "HIGHEST"
-        ]
 
-        # Run the command
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    def __init__(self, expression):
+        """
+        Parameters:
+        - expression (str): The schedule.
 
-        if result.returncode == 0:
-            print(f"Scheduled task '{task_name}' created successfully to run daily at {time}.")
-        else:
-            print(f"Failed to create scheduled task: {result.stderr}")
+        Raises:
+        - ValueError: If the expression is not a valid schedule.
+        """
+        if not isinstance(expression, str):
+            raise ValueError(f"Invalid schedule {expression!r}: expected a string")
+        self.expression = expression
+        expression = cron_aliases.get(expression.strip(), expression.strip())
+        if ":" in expression and " " not in expression:
+            hour, minute = expression.split(":")
+            expression = f"{int(minute)} {int(hour)} * * *"
+
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Invalid schedule '{self.expression}': expected 5 fields (minute hour day month weekday)")
+        self.minutes = _parse_field(fields[0], 0, 59)
+        self.hours = _parse_field(fields[1], 0, 23)
+        self.days = _parse_field(fields[2], 1, 31)
+        self.months = _parse_field(fields[3], 1, 12)
+        self.weekdays = {day % 7 for day in _parse_field(fields[4], 0, 7)}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _matches_day(self, moment):
+        day_matches = moment.day in self.days
+        weekday_matches = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_matches and weekday_matches
+        return day_matches or weekday_matches
+
+    def next_after(self, moment):
+        """
+        Get the first time of the schedule strictly after a moment.
+
+        Parameters:
+        - moment (datetime): The moment to start from.
 
-    except Exception as e:
-        print(f"An error occurred: {e}")
+        Returns:
+        - datetime: The next time of the schedule.
 
+        Raises:
+        - ValueError: If the schedule has no time in the next five years, e.g. February 30th.
+        """
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=5 * 366)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._matches_day(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Schedule '{self.expression}' never runs")
 
-def delete_scheduled_task(task_name="SendEmailsTask"):
+def _parse_field(field, low, high):
+    values = set()
+    for part in field.split(","):
+        value_range, _, step = part.partition("/")
+        if value_range == "*":
+            start, end = low, high
+        elif "-" in value_range:
+            start, end = (int(value) for value in value_range.split("-", 1))
+        else:
+            start = end = int(value_range)
+        step = int(step) if step else 1
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Invalid schedule field '{field}': values must be within {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+class PipelineScheduler:
     """
-    Delete the scheduled task from Windows Task Scheduler.
+    In-process scheduler of the fetch, generate and send pipelines.
+
+    A scheduled task runs a pipeline, i.e. a sequence of tasks of the app (e.g. "generate-invoices"
+    then "send-invoices") with the given settings, as a background job on a cron-like schedule.
+    The tasks are persisted, along with the time of the last run, so that runs missed while the
+    app was down are caught up once on the next start. A run is skipped when the previous run
+    of the same task is still going, so runs never overlap.
 
-    Parameters:
-    - task_name (str): The name of the scheduled task to delete.
+    Secrets such as the email password are not stored with the tasks; they are read from the
+    environment when a pipeline runs, see secret_settings. The scheduler must only be started
+    in one process: every started scheduler runs the due tasks.
     """
-    try:
-        # Define the command to delete the scheduled task
-        command = ["schtasks", "/delete", "/tn", task_name, "/f"]
 
-        # Run the command
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    def __init__(self, job_manager, tasks, state_path=schedules_path, poll_seconds=30, grace_seconds=300):
+        """
+        Parameters:
+        - job_manager (JobManager): Runs the pipelines as background jobs.
+        - tasks (dict): The tasks that pipelines are made of, by name. Each one takes the settings
+          along with progress_callback and cancel_event, and returns a (payload, status code) tuple.
+        - state_path (str, optional): File where the scheduled tasks are persisted. Defaults to
+          schedules_path. None keeps them in memory only.
+        - poll_seconds (int, optional): Interval between two checks for due tasks. Defaults to 30.
+        - grace_seconds (int, optional): Delay after which a run is considered missed, and only
+          run if its task catches up. Defaults to 300.
+        """
+        self.job_manager = job_manager
+        self.tasks = tasks
+        self.state_path = state_path
+        self.poll_seconds = poll_seconds
+        self.grace_seconds = grace_seconds
+        self.scheduled_tasks = {}
+        self.jobs = {}  # Last job of every scheduled task
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        if state_path and os.path.exists(state_path):
+            self.load()
+
+    def create_scheduled_task(self, task_name, pipeline, when, settings=None, catch_up=True):
+        """
+        Create or replace a scheduled task.
+
+        Parameters:
+        - task_name (str): The name of the scheduled task.
+        - pipeline (list): Names of the tasks to run in order, e.g. ["generate-invoices", "send-invoices"].
+        - when (str): The cron-like schedule, see CronSchedule, e.g. "30 22 * * *" or "22:30".
+        - settings (dict, optional): Settings passed to every task of the pipeline. Defaults to None.
+          Secret settings are dropped, see secret_settings.
+        - catch_up (bool, optional): Whether a run missed while the app was down is run on the next
+          start. Defaults to True.
+
+        Returns:
+        - dict: The scheduled task, see list_scheduled_tasks.
+
+        Raises:
+        - ValueError: If the pipeline or the schedule is not valid, or the schedule never runs.
+        """
+        unknown = [name for name in pipeline if name not in self.tasks]
+        if not pipeline or unknown:
+            raise ValueError(f"Unknown pipeline tasks {unknown}. Available tasks: {', '.join(self.tasks)}")
+        CronSchedule(when).next_after(datetime.now())
+
+        with self.lock:
+            self.scheduled_tasks[task_name] = {
+                "pipeline": list(pipeline),
+                "schedule": when,
+                "settings": {key: value for key, value in (settings or {}).items() if key not in secret_settings},
+                "catchUp": catch_up,
+                "lastRun": datetime.now().isoformat(timespec="seconds"),
+            }
+            self.save()
+        print(f"Scheduled task '{task_name}' created to run {' then '.join(pipeline)} on '{when}'.")
+        return self._describe(task_name)
 
-        if result.returncode == 0:
+    def delete_scheduled_task(self, task_name):
+        """
+        Delete a scheduled task. A run in progress is not interrupted.
+
+        Parameters:
+        - task_name (str): The name of the scheduled task.
+
+        Returns:
+        - bool: Whether the task existed.
+        """
+        with self.lock:
+            existed = self.scheduled_tasks.pop(task_name, None) is not None
+            self.jobs.pop(task_name, None)
+            if existed:
+                self.save()
+        if existed:
             print(f"Scheduled task '{task_name}' deleted successfully.")
-        else:
-            print(f"Failed to delete scheduled task: {result.stderr}")
+        return existed
+
+    def list_scheduled_tasks(self):
+        """
+        List the scheduled tasks.
+
+        Returns:
+        - list: One dict per task with its "name", "pipeline", "schedule", "catchUp", "lastRun",
+          "nextRun" and "lastJobId". The settings are not included.
+        """
+        with self.lock:
+            names = sorted(self.scheduled_tasks)
+        return [self._describe(name) for name in names]
+
+    def _describe(self, task_name):
+        with self.lock:
+            task = self.scheduled_tasks[task_name]
+            job = self.jobs.get(task_name)
+        try:
+            next_run = CronSchedule(task["schedule"]).next_after(datetime.fromisoformat(task["lastRun"]))
+        except ValueError:
+            next_run = None
+        return {
+            "name": task_name,
+            "pipeline": task["pipeline"],
+            "schedule": task["schedule"],
+            "catchUp": task["catchUp"],
+            "lastRun": task["lastRun"],
+            "nextRun": next_run.isoformat(timespec="seconds") if next_run else None,
+            "lastJobId": job.id if job is not None else None,
+        }
+
+    def run_pending(self, now=None):
+        """
+        Start the scheduled tasks that are due.
+
+        A due task whose previous run is still going is skipped. A run more than grace_seconds
+        late, e.g. after downtime, is only started if the task catches up; several missed runs
+        are caught up with a single run. A task that cannot be checked or started, e.g. with a
+        corrupted schedule, is skipped without holding up the others.
+
+        Parameters:
+        - now (datetime, optional): Current time. Defaults to datetime.now().
+
+        Returns:
+        - list: The jobs started.
+        """
+        now = now or datetime.now()
+        started, changed = [], False
+        with self.lock:
+            for task_name, task in self.scheduled_tasks.items():
+                try:
+                    due = CronSchedule(task["schedule"]).next_after(datetime.fromisoformat(task["lastRun"]))
+                    if due > now:
+                        continue
+
+                    # Consume every occurrence up to now, so missed runs are not replayed one by one
+                    task["lastRun"] = now.isoformat(timespec="seconds")
+                    changed = True
+                    previous_job = self.jobs.get(task_name)
+                    if previous_job is not None and previous_job.finished_at is None:
+                        print(f"Skipping scheduled task '{task_name}': the previous run is still going.")
+                    elif (now - due).total_seconds() > self.grace_seconds and not task["catchUp"]:
+                        print(f"Skipping missed run of scheduled task '{task_name}' due at {due:%Y-%m-%d %H:%M}.")
+                    else:
+                        job = self.job_manager.submit(f"scheduled:{task_name}", self.run_pipeline, task["pipeline"],
+                                                      task["settings"])
+                        self.jobs[task_name] = job
+                        started.append(job)
+                except Exception as e:
+                    print(f"Error running scheduled task '{task_name}': {e}")
+            if changed:
+                self.save()
+        return started
+
+    def run_pipeline(self, pipeline, settings, progress_callback=None, cancel_event=None):
+        """
+        Run the tasks of a pipeline in order, stopping at the first one that fails.
+
+        Parameters:
+        - pipeline (list): Names of the tasks to run.
+        - settings (dict): Settings passed to every task, along with the secret settings found
+          in the environment.
+        - progress_callback (callable, optional): Receives the progress events of the tasks.
+        - cancel_event (threading.Event, optional): Stops the pipeline when set.
+
+        Returns:
+        - tuple: The payloads of the tasks run, by name, and the status code of the last one.
+        """
+        secrets = {key: os.environ[variable] for key, variable in secret_settings.items() if variable in os.environ}
+        settings = {**settings, **secrets}
+
+        payloads, status_code = {}, 200
+        for task_name in pipeline:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            payload, status_code = self.tasks[task_name](settings, progress_callback=progress_callback,
+                                                         cancel_event=cancel_event)
+            payloads[task_name] = payload
+            if status_code >= 400:
+                break
+        return {"pipeline": payloads}, status_code
+
+    def start(self):
+        """
+        Check for due tasks in a background thread until stop is called, starting with the runs
+        missed while the app was down.
+        """
+        if self.thread is not None:
+            return
+        clock = schedule.Scheduler()
+        clock.every(self.poll_seconds).seconds.do(self._run_pending_safely)
+        self.stop_event.clear()
+
+        def loop():
+            self._run_pending_safely()
+            while not self.stop_event.wait(max(0, clock.idle_seconds or 0)):
+                clock.run_pending()
+
+        self.thread = threading.Thread(target=loop, name="scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the background thread. Runs in progress are not interrupted."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
 
-    except Exception as e:
-        print(f"An error occurred: {e}")
+    def save(self):
+        """
+        Persist the scheduled tasks. Must be called with the lock held.
+        """
+        if not self.state_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            temp_path = f"{self.state_path}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self.scheduled_tasks, f, indent=2)
+            os.replace(temp_path, self.state_path)
+        except OSError as e:
+            print(f"Could not persist scheduled tasks: {e}")
 
+    def load(self):
+        """
+        Load the persisted scheduled tasks, starting with none if they cannot be read.
+        """
+        try:
+            with open(self.state_path) as f:
+                self.scheduled_tasks = json.load(f)
+            # Drop the secrets persisted by earlier versions
+            for task in self.scheduled_tasks.values():
+                for key in secret_settings:
+                    task["settings"].pop(key, None)
+        except (OSError, ValueError) as e:
+            print(f"Could not load scheduled tasks: {e}")
 
-if __name__ == "__main__":
-    # Example usage
-    script_path = "D:\\Portfolio\\Automated Invoice and Report Generation System\\main.py"  # Replace with your script path
-    create_scheduled_task(script_path, time="22:30")
+    def _run_pending_safely(self):
+        try:
+            self.run_pending()
+        except Exception as e:
+            print(f"Error running scheduled tasks: {e}")
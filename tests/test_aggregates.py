@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from src.aggregates import AggregateStore, resolve_period
+
+class TestAggregates(unittest.TestCase):
+
+    def setUp(self):
+        # Sample validated orders and invoices for testing
+        self.orders_df = pd.DataFrame({
+            "Order ID": [1001, 1002, 1003],
+            "Client ID": [101, 102, 101],
+            "Order Date": pd.to_datetime(["2024-08-01", "2024-08-02", "2024-09-03"]),
+            "Total Amount ($)": [700, 250, 300]
+        })
+        self.invoices_df = pd.DataFrame({
+            "Invoice ID": [1, 2, 3],
+            "Order ID": [1001, 1002, 1003],
+            "Invoice Date": pd.to_datetime(["2024-08-01", "2024-08-02", "2024-09-03"]),
+            "Amount Due ($)": [700, 250, 300],
+            "Paid Status": ["Unpaid", "Paid", "Unpaid"]
+        })
+
+    def test_resolve_period(self):
+        """Test that months, quarters and custom ranges resolve to their labels and bounds."""
+        month = resolve_period("2024-08")
+        self.assertEqual((month["label"], month["slug"]), ("August 2024", "August_2024"))
+        self.assertEqual((month["start"], month["end"]), (pd.Timestamp("2024-08-01"), pd.Timestamp("2024-09-01")))
+
+        self.assertEqual(resolve_period("2024-Q3")["label"], "Q3 2024")
+        self.assertEqual(resolve_period(start="2024-08-01", end="2024-08-15")["end"], pd.Timestamp("2024-08-16"))
+        self.assertEqual(resolve_period()["start"], None)
+
+    def test_summary_of_period(self):
+        """Test that a period is summarized from the daily aggregates."""
+        store = AggregateStore()
+        store.update(self.orders_df, self.invoices_df)
+        period = resolve_period("2024-08")
+
+        summary = store.summary(period["start"], period["end"])
+        self.assertEqual(summary["total_sales"], 950)
+        self.assertEqual(summary["order_count"], 2)
+        self.assertEqual(summary["outstanding_invoices"], 700)
+        self.assertEqual(summary["top_clients"], [(101, 700), (102, 250)])
+
+    def test_update_only_applies_new_and_changed_rows(self):
+        """Test that repeated updates only apply new or changed orders and invoices."""
+        store = AggregateStore()
+        self.assertEqual(store.update(self.orders_df, self.invoices_df), 6)
+        self.assertEqual(store.update(self.orders_df, self.invoices_df), 0)
+
+        orders_df = pd.concat([self.orders_df, pd.DataFrame({
+            "Order ID": [1004], "Client ID": [102], "Order Date": pd.to_datetime(["2024-08-20"]), "Total Amount ($)": [50]
+        })], ignore_index=True)
+        orders_df.loc[0, "Total Amount ($)"] = 100
+        invoices_df = self.invoices_df.copy()
+        invoices_df.loc[0, "Paid Status"] = "Paid"
+
+        self.assertEqual(store.update(orders_df, invoices_df), 3)
+        summary = store.summary(*[resolve_period("2024-08")[bound] for bound in ("start", "end")])
+        self.assertEqual(summary["total_sales"], 400)
+        self.assertEqual(summary["outstanding_invoices"], 0)
+
+    def test_update_removes_dropped_rows(self):
+        """Test that orders and invoices missing from an update are taken out of the aggregates."""
+        store = AggregateStore()
+        store.update(self.orders_df, self.invoices_df)
+
+        self.assertEqual(store.update(self.orders_df.iloc[:1], self.invoices_df.iloc[:1]), 4)
+        summary = store.summary()
+        self.assertEqual(summary["total_sales"], 700)
+        self.assertEqual(summary["order_count"], 1)
+        self.assertEqual(summary["outstanding_invoices"], 700)
+        self.assertEqual(summary["top_clients"], [(101, 700)])
+        self.assertEqual(store.update(self.orders_df.iloc[:1], self.invoices_df.iloc[:1]), 0)
+
+    def test_store_persists_across_instances(self):
+        """Test that a persisted store is reloaded with its aggregates."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "aggregates.pkl")
+            AggregateStore(path).update(self.orders_df, self.invoices_df)
+
+            store = AggregateStore(path)
+            self.assertEqual(store.summary()["total_sales"], 1250)
+            self.assertEqual(store.update(self.orders_df, self.invoices_df), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+
+# The app imports its modules as top-level modules, as when it is run from src
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import app
+import document_generator
+from delta import DeltaTracker
+from invoice_index import InvoiceIndex
+
+class TestGenerateInvoicesDelta(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.file_path = os.path.join(self.tmp_dir.name, "workbook.xlsx")
+        open(self.file_path, "wb").close()
+
+        self.sheets = {
+            "Clients": pd.DataFrame({
+                "Client ID": [101],
+                "Client Name": ["XYZ Construction Co"],
+                "Contact Person": ["John Doe"],
+                "Email": ["john@xyzcon.com"],
+                "Address": ["1234 Elm St"]
+            }),
+            "Products": pd.DataFrame({
+                "Product ID": ["P001"],
+                "Product Name": ["Asphalt"],
+                "Unit Price ($)": [100],
+                "Stock Quantity": [500],
+                "Description": ["Asphalt for paving"]
+            }),
+            "Orders": pd.DataFrame({
+                "Order ID": [1001, 1002, 1003],
+                "Client ID": [101, 101, 101],
+                "Order Date": ["2024-08-01", "not a date", "2024-08-03"],  # 1002 is rejected by the validation
+                "Product ID": ["P001", "P001", "P999"],  # 1003 refers to an unknown product
+                "Quantity": [2, 1, 3],
+                "Total Amount ($)": [200, 100, 300],
+                "Delivery Date": ["2024-08-10", "2024-08-11", "2024-08-12"],
+                "Status": ["Delivered", "Pending", "Pending"]
+            }),
+        }
+        self.html_to_pdf = mock.Mock()
+        tracker = DeltaTracker()
+        for patcher in (
+            mock.patch.object(app, "fetch_data_from_excel", lambda *args, **kwargs: dict(self.sheets)),
+            mock.patch.object(app, "get_delta_tracker", lambda file_path: tracker),
+            mock.patch.object(app, "invoice_index", InvoiceIndex(os.path.join(self.tmp_dir.name, "invoice_index.sqlite"))),
+            mock.patch.object(document_generator, "output_invoices_path", self.tmp_dir.name),
+            mock.patch.object(document_generator, "html_to_pdf", self.html_to_pdf),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def generate(self):
+        return app.run_generate_invoices({"filePath": self.file_path, "deltaOnly": True, "invoiceCache": False})
+
+    def test_rejected_orders_are_not_selected_again(self):
+        """Test that an unchanged workbook with rejected rows is a successful no-op on the next runs."""
+        payload, status = self.generate()
+        self.assertEqual(status, 200)
+        self.assertEqual(payload["delta"]["selectedOrders"], 3)
+        self.assertEqual(self.html_to_pdf.call_count, 1)
+
+        payload, status = self.generate()
+        self.assertEqual(status, 200)
+        self.assertEqual(payload["delta"]["selectedOrders"], 0)
+        self.assertEqual(self.html_to_pdf.call_count, 1)
+
+        # A new order that is rejected on its own does not fail the run either
+        orders = self.sheets["Orders"]
+        self.sheets["Orders"] = pd.concat([orders, orders.iloc[[1]].assign(**{"Order ID": 1004})], ignore_index=True)
+        payload, status = self.generate()
+        self.assertEqual(status, 200)
+        self.assertEqual(payload["delta"]["selectedOrders"], 1)
+
+        # Fixing a rejected row selects it again
+        self.sheets["Orders"].loc[1, "Order Date"] = "2024-08-02"
+        payload, status = self.generate()
+        self.assertEqual(status, 200)
+        self.assertEqual(payload["delta"]["selectedOrders"], 1)
+        self.assertEqual(self.html_to_pdf.call_count, 2)
+
+    def test_failed_orders_are_selected_again(self):
+        """Test that an order that failed to render is retried by the next run."""
+        self.sheets["Orders"] = self.sheets["Orders"].iloc[[0]]
+        self.html_to_pdf.side_effect = OSError("wkhtmltopdf crashed")
+        payload, status = self.generate()
+        self.assertEqual(status, 400)
+        self.assertEqual(list(payload["failedOrders"]), ["1001"])
+
+        self.html_to_pdf.side_effect = None
+        payload, status = self.generate()
+        self.assertEqual(status, 200)
+        self.assertEqual(payload["delta"]["selectedOrders"], 1)
+        self.assertEqual(payload["message"], "Invoices generated successfully.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,10 @@
+import os
+import tempfile
 import unittest
+from unittest import mock
 import pandas as pd
-from src.data_fetcher import fetch_data_from_excel
+from src import data_fetcher
+from src.data_fetcher import clear_ingestion_cache, fetch_data_from_excel, preview_excel, stream_data_from_excel
 
 class TestDataFetcher(unittest.TestCase):
 
@@ -34,5 +38,49 @@ class TestDataFetcher(unittest.TestCase):
         data = fetch_data_from_excel(self.sample_file_path, ["NonExistentSheet"])
         self.assertEqual(len(data), 0)  # No sheets should be returned
 
+    def test_fetch_data_reuses_parsed_workbook(self):
+        """Test that an unchanged workbook is only parsed once, and a modified one again."""
+        clear_ingestion_cache()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "workbook.xlsx")
+            pd.DataFrame({"Client ID": [101, 102]}).to_excel(file_path, sheet_name="Clients", index=False)
+
+            with mock.patch.object(data_fetcher.pd, "ExcelFile", wraps=pd.ExcelFile) as excel_file:
+                first = fetch_data_from_excel(file_path)
+                second = fetch_data_from_excel(file_path)
+                self.assertEqual(excel_file.call_count, 1)
+                self.assertEqual(second["Clients"]["Client ID"].tolist(), [101, 102])
+                self.assertIsNot(first["Clients"], second["Clients"])
+
+                pd.DataFrame({"Client ID": [103]}).to_excel(file_path, sheet_name="Clients", index=False)
+                third = fetch_data_from_excel(file_path)
+                self.assertEqual(third["Clients"]["Client ID"].tolist(), [103])
+
+    def test_stream_data_from_excel_in_chunks(self):
+        """Test that a sheet is streamed in bounded chunks of rows."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "workbook.xlsx")
+            pd.DataFrame({"Order ID": range(1, 6), "Quantity": [2] * 5}).to_excel(file_path, sheet_name="Orders", index=False)
+
+            chunks = list(stream_data_from_excel(file_path, ["Orders"], chunk_size=2))
+
+        self.assertEqual([len(chunk) for sheet, chunk in chunks], [2, 2, 1])
+        self.assertEqual(chunks[0][1].columns.tolist(), ["Order ID", "Quantity"])
+        self.assertEqual(chunks[-1][1]["Order ID"].tolist(), [5])
+
+    def test_preview_excel(self):
+        """Test that the preview holds the first rows and the sheet row counts."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "workbook.xlsx")
+            with pd.ExcelWriter(file_path) as writer:
+                pd.DataFrame({"Order ID": range(1, 21), "Status": [None] * 20}).to_excel(writer, sheet_name="Orders", index=False)
+                pd.DataFrame({"Client ID": [101, 102]}).to_excel(writer, sheet_name="Clients", index=False)
+
+            preview = preview_excel(file_path, nrows=3)
+
+        self.assertEqual(preview["columns"], ["Order ID", "Status"])
+        self.assertEqual(preview["rows"], [[1, None], [2, None], [3, None]])
+        self.assertEqual(preview["sheets"], [{"name": "Orders", "rows": 20}, {"name": "Clients", "rows": 2}])
+
 if __name__ == "__main__":
     unittest.main()
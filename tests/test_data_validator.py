@@ -57,5 +57,36 @@ class TestDataValidator(unittest.TestCase):
         warnings = check_missing_values(df_with_missing, ["Client Name"])
         self.assertIn("Missing values found in Client Name.", warnings)
 
+    def test_validate_data_excludes_invalid_rows(self):
+        """Test that invalid rows are excluded with their reasons while valid rows continue."""
+        orders_df = pd.DataFrame({
+            "Order ID": [1001, 1002, 1003],
+            "Client ID": [101, 102, 101],
+            "Order Date": ["2024-08-01", "invalid-date", "2024-08-03"],
+            "Product ID": ["P001", "P002", "P001"],
+            "Quantity": [2, 1, 3],
+            "Total Amount ($)": [200, 250, 300],
+            "Delivery Date": ["2024-08-10", "2024-08-11", "2024-08-12"],
+            "Status": ["Delivered", "Pending", "Pending"]
+        })
+
+        results = validate_data({"Orders": orders_df, "Products": self.products_df})
+
+        orders = results["Orders"]
+        self.assertEqual(orders["errors"], [])
+        self.assertEqual(orders["clean_data"]["Order ID"].tolist(), [1001, 1003])
+        self.assertEqual(orders["invalid_mask"].tolist(), [False, True, False])
+        self.assertEqual(orders["invalid_rows"]["reasons"].tolist(), ["Invalid date format in Order Date."])
+
+        products = results["Products"]
+        self.assertEqual(products["clean_data"]["Product ID"].tolist(), ["P001"])
+        self.assertEqual(products["invalid_rows"]["reasons"].tolist(), ["Unit Price ($) should be numeric."])
+
+    def test_validate_data_rejects_sheet_with_missing_fields(self):
+        """Test that a sheet missing required fields has no clean data."""
+        results = validate_data({"Clients": self.clients_df.drop(columns=["Address"])})
+        self.assertIsNone(results["Clients"]["clean_data"])
+        self.assertIn("Missing required fields: Address", results["Clients"]["errors"])
+
 if __name__ == "__main__":
     unittest.main()
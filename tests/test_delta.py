@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from src.delta import DeltaTracker, reference_fingerprint
+
+class TestDeltaTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "delta.pkl")
+        self.orders = pd.DataFrame({
+            "Order ID": [1001, 1002, 1003],
+            "Client ID": ["C001", "C002", "C001"],
+            "Order Date": pd.to_datetime(["2024-08-01", "2024-08-15", "2024-08-30"]),
+            "Total Amount ($)": [100.0, 250.0, 75.0]
+        })
+        self.clients = pd.DataFrame({"Client ID": ["C001", "C002"], "Email": ["john@xyzcon.com", "jane@abcbuilders.com"]})
+        self.reference = reference_fingerprint(self.clients)
+
+        tracker = DeltaTracker(self.path)
+        selected, fingerprints = tracker.select(self.orders, self.reference)
+        tracker.commit(selected, fingerprints, self.reference)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_selects_only_new_and_changed_orders(self):
+        """Test that a later run, after a restart, only selects the new and modified rows."""
+        orders = pd.concat([self.orders, pd.DataFrame({
+            "Order ID": [1004], "Client ID": ["C002"], "Order Date": pd.to_datetime(["2024-09-02"]), "Total Amount ($)": [40.0]
+        })], ignore_index=True)
+        orders.loc[1, "Total Amount ($)"] = 260.0
+
+        tracker = DeltaTracker(self.path)
+        self.assertEqual(tracker.high_water_mark, {"orderId": "1003", "orderDate": "2024-08-30T00:00:00"})
+        selected, fingerprints = tracker.select(orders, self.reference)
+        self.assertEqual(selected["Order ID"].tolist(), [1002, 1004])
+
+        tracker.commit(selected, fingerprints, self.reference, exclude=[1004])
+        self.assertEqual(tracker.select(orders, self.reference)[0]["Order ID"].tolist(), [1004])
+
+    def test_changed_references_select_every_order(self):
+        """Test that a change of the clients selects every order again."""
+        tracker = DeltaTracker(self.path)
+        self.assertTrue(tracker.select(self.orders, self.reference)[0].empty)
+
+        clients = self.clients.assign(Email=["john@xyzcon.com", "accounts@abcbuilders.com"])
+        selected, fingerprints = tracker.select(self.orders, reference_fingerprint(clients))
+        self.assertEqual(len(selected), 3)
+
+    def test_lookback_skips_settled_orders(self):
+        """Test that orders older than the lookback window before the high-water mark are not compared."""
+        orders = self.orders.assign(**{"Total Amount ($)": [110.0, 260.0, 80.0]})
+        selected, fingerprints = DeltaTracker(self.path).select(orders, self.reference, lookback_days=20)
+        self.assertEqual(selected["Order ID"].tolist(), [1002, 1003])
+
+if __name__ == '__main__':
+    unittest.main()
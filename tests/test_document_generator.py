@@ -0,0 +1,268 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from src import document_generator
+from src.aggregates import resolve_period
+from src.document_generator import (build_invoice_contexts, generate_invoice, generate_invoice_batches, generate_report, generate_report_batch, get_renderer,
+                                    render_report_chunks, report_variants, warm_up_templates)
+from src.invoice_cache import InvoiceCache, new_cache_stats
+
+class TestDocumentGenerator(unittest.TestCase):
+
+    def setUp(self):
+        # Compile the templates into a temporary bytecode cache instead of the repository's
+        bytecode_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(bytecode_dir.cleanup)
+        env = document_generator.env.overlay(bytecode_cache=document_generator.FileSystemBytecodeCache(bytecode_dir.name))
+        patcher = mock.patch.object(document_generator, "env", env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Sample validated data for testing
+        clients_df = pd.DataFrame({
+            "Client ID": [101, 102],
+            "Client Name": ["XYZ Construction Co", "ABC Builders"],
+            "Contact Person": ["John Doe", "Jane Smith"],
+            "Email": ["john@xyzcon.com", "jane@abcbuilders.com"],
+            "Address": ["1234 Elm St", "5678 Oak Ave"]
+        })
+
+        products_df = pd.DataFrame({
+            "Product ID": ["P001", "P002"],
+            "Product Name": ["Asphalt", "Concrete"],
+            "Unit Price ($)": [100, 250],
+            "Stock Quantity": [500, 300],
+            "Description": ["Asphalt for paving", "Concrete for construction"]
+        })
+
+        orders_df = pd.DataFrame({
+            "Order ID": [1001, 1002, 1003],
+            "Client ID": [101, 102, 101],
+            "Order Date": pd.to_datetime(["2024-08-01", "2024-08-02", "2024-08-03"]),
+            "Product ID": ["P001, P002", "P002", "P999"],
+            "Quantity": [2, 1, 3],
+            "Total Amount ($)": [700, 250, 300],
+            "Delivery Date": ["2024-08-10", "2024-08-11", "2024-08-12"],
+            "Status": ["Delivered", "Pending", "Pending"]
+        })
+
+        self.data = {
+            "Clients": {"errors": [], "warnings": [], "clean_data": clients_df},
+            "Products": {"errors": [], "warnings": [], "clean_data": products_df},
+            "Orders": {"errors": [], "warnings": [], "clean_data": orders_df},
+        }
+
+    def test_generate_invoice_maps_clients_to_invoices(self):
+        """Test that every valid order is rendered and mapped to its client email."""
+        with mock.patch.object(document_generator, "html_to_pdf") as html_to_pdf:
+            client_invoice_map = generate_invoice(self.data)
+
+        self.assertEqual(html_to_pdf.call_count, 2)
+        self.assertIn("john@xyzcon.com", client_invoice_map)
+        self.assertEqual(len(client_invoice_map["jane@abcbuilders.com"]), 1)
+        self.assertTrue(client_invoice_map["jane@abcbuilders.com"][0].endswith("invoice_ABC_Builders_1002.pdf"))
+
+    def test_generate_invoice_reports_errors_per_order(self):
+        """Test that a failing order is reported without blocking the others."""
+        errors, invoiced, rejected = {}, set(), set()
+        with mock.patch.object(document_generator, "html_to_pdf"):
+            generate_invoice(self.data, errors=errors, invoiced=invoiced, rejected=rejected)
+
+        self.assertEqual(list(errors), [1003])  # Unknown product P999
+        self.assertEqual(invoiced, {1001, 1002})
+        self.assertEqual(rejected, {1003})
+
+    def test_generate_invoice_skips_cached_invoices(self):
+        """Test that a rerun over unchanged data reuses the cached PDFs."""
+        def write_pdf(html_content, output_path, renderer=None):
+            with open(output_path, "w") as f:
+                f.write(html_content)
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                mock.patch.object(document_generator, "output_invoices_path", tmp_dir), \
+                mock.patch.object(document_generator, "html_to_pdf", side_effect=write_pdf) as html_to_pdf:
+            cache = InvoiceCache(os.path.join(tmp_dir, "cache"))
+            first_stats, second_stats = new_cache_stats(), new_cache_stats()
+            first_run = generate_invoice(self.data, cache=cache, cache_stats=first_stats)
+            self.assertEqual(first_stats["misses"], 2)
+
+            second_run = generate_invoice(self.data, cache=cache, cache_stats=second_stats)
+            self.assertEqual(second_stats["hits"], 2)
+            self.assertEqual(second_stats["misses"], 0)
+            self.assertEqual(first_stats["hits"], 0)  # Each run keeps its own counters
+
+        self.assertEqual(html_to_pdf.call_count, 2)  # Only the first run converted
+        self.assertEqual(first_run, second_run)
+
+    def test_uncached_run_does_not_rewrite_cache_entries(self):
+        """Test that rendering without the cache never changes the invoice a later cache hit serves."""
+        def write_pdf(html_content, output_path, renderer=None):
+            with open(output_path, "w") as f:
+                f.write(html_content)
+
+        orders_df = self.data["Orders"]["clean_data"]
+        changed = dict(self.data, Orders=dict(self.data["Orders"], clean_data=orders_df.assign(**{"Total Amount ($)": [7000, 250, 300]})))
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                mock.patch.object(document_generator, "output_invoices_path", tmp_dir), \
+                mock.patch.object(document_generator, "html_to_pdf", side_effect=write_pdf):
+            cache = InvoiceCache(os.path.join(tmp_dir, "cache"))
+            generate_invoice(self.data, cache=cache)
+            generate_invoice(changed)  # Cache disabled for this run
+            stats = new_cache_stats()
+            client_invoice_map = generate_invoice(self.data, cache=cache, cache_stats=stats)
+
+            self.assertEqual(stats["hits"], 2)
+            with open(client_invoice_map["john@xyzcon.com"][0]) as f:
+                content = f.read()
+
+        self.assertIn("700", content)
+        self.assertNotIn("7000", content)
+
+    def test_generate_invoice_batches_evicts_once(self):
+        """Test that a streamed run adds up the batches and evicts the cache once at the end."""
+        orders_df = self.data["Orders"]["clean_data"]
+        batches = [{"clean_data": orders_df.iloc[:2], "invalid_rows": orders_df.iloc[0:0]},
+                   {"clean_data": orders_df.iloc[2:], "invalid_rows": orders_df.iloc[:1]}]
+        data = {"Clients": self.data["Clients"], "Products": self.data["Products"]}
+
+        def write_pdf(html_content, output_path, renderer=None):
+            with open(output_path, "w") as f:
+                f.write(html_content)
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                mock.patch.object(document_generator, "output_invoices_path", tmp_dir), \
+                mock.patch.object(document_generator, "html_to_pdf", side_effect=write_pdf):
+            cache = InvoiceCache(os.path.join(tmp_dir, "cache"))
+            errors, invalid_rows = {}, {"Clients": 0}
+            with mock.patch.object(cache, "evict") as evict:
+                client_invoice_map = generate_invoice_batches(data, batches, errors=errors, cache=cache,
+                                                              invalid_rows=invalid_rows)
+
+        self.assertEqual(evict.call_count, 1)
+        self.assertEqual(invalid_rows, {"Clients": 0, "Orders": 1})
+        self.assertEqual(list(errors), [1003])
+        self.assertEqual(sum(len(paths) for paths in client_invoice_map.values()), 2)
+
+    def test_build_invoice_contexts(self):
+        """Test that invoice contexts are built per order with priced order lines."""
+        errors = {}
+        jobs = build_invoice_contexts(
+            self.data["Orders"]["clean_data"],
+            self.data["Clients"]["clean_data"],
+            self.data["Products"]["clean_data"],
+            errors
+        )
+        self.assertEqual([job[0] for job in jobs], [1001, 1002])
+        self.assertEqual(errors, {1003: "Product ID P999 not found"})
+
+        order_id, client_email, context, output_path = jobs[0]
+        self.assertEqual(client_email, "john@xyzcon.com")
+        self.assertEqual(context["client_name"], "XYZ Construction Co")
+        self.assertEqual([item["total_price"] for item in context["order_items"]], [200, 500])
+
+    def test_get_renderer_reuses_instances(self):
+        """Test that renderer backends are created once and reused across documents."""
+        class DummyRenderer:
+            def render(self, html_content, output_path):
+                pass
+
+        with mock.patch.dict(document_generator.renderers, {"dummy": DummyRenderer}), \
+                mock.patch.dict(document_generator._renderer_instances):
+            self.assertIs(get_renderer("dummy"), get_renderer("dummy"))
+
+    def test_get_renderer_unknown_backend(self):
+        """Test that an unknown renderer name is rejected."""
+        with self.assertRaises(ValueError):
+            get_renderer("nonexistent")
+
+    def test_warm_up_templates_fills_bytecode_cache(self):
+        """Test that warming up compiles every template into the bytecode cache."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            env = document_generator.env.overlay(bytecode_cache=document_generator.FileSystemBytecodeCache(tmp_dir), cache_size=0)
+            with mock.patch.object(document_generator, "env", env):
+                loaded = warm_up_templates()
+            self.assertIn("invoice_template.html", loaded)
+            self.assertEqual(len(os.listdir(tmp_dir)), len(loaded))
+
+    def test_render_report_chunks(self):
+        """Test that a chunked report renders the summary once and every order in one of the chunks."""
+        class HtmlRenderer:
+            def render(self, html_content, output_path):
+                with open(output_path, "w") as f:
+                    f.write(html_content)
+
+        merged = {}
+        def merge_pdfs(part_paths, output_path):
+            for part_path in part_paths:
+                with open(part_path) as f:
+                    merged[os.path.basename(part_path)] = f.read()
+
+        orders_df = self.data["Orders"]["clean_data"]
+        clients_df = self.data["Clients"]["clean_data"]
+        with mock.patch.dict(document_generator.renderers, {"html": HtmlRenderer}), \
+                mock.patch.dict(document_generator._renderer_instances), \
+                mock.patch.object(document_generator, "merge_pdfs", merge_pdfs):
+            render_report_chunks({"report_period": "August 2024", "top_clients": []}, orders_df, clients_df,
+                                 "report.pdf", chunk_size=2, renderer="html")
+
+        parts = [merged[name] for name in sorted(merged)]
+        self.assertEqual(len(parts), 2)
+        self.assertIn("Summary", parts[0])
+        self.assertNotIn("Summary", parts[1])
+        self.assertIn("<td>1003</td>", parts[1])
+
+    def test_generate_report_for_period(self):
+        """Test that a report only lists and sums the orders of its period."""
+        invoices_df = pd.DataFrame({
+            "Invoice ID": [1, 2, 3],
+            "Order ID": [1001, 1002, 1003],
+            "Invoice Date": pd.to_datetime(["2024-08-01", "2024-08-02", "2024-09-03"]),
+            "Amount Due ($)": [700, 250, 300],
+            "Paid Status": ["Unpaid", "Paid", "Unpaid"]
+        })
+        data = dict(self.data, Invoices={"errors": [], "warnings": [], "clean_data": invoices_df})
+        self.data["Orders"]["clean_data"].loc[2, "Order Date"] = pd.Timestamp("2024-09-03")
+
+        with mock.patch.object(document_generator, "html_to_pdf") as html_to_pdf:
+            output_path = generate_report(data, period=resolve_period("2024-08"))
+
+        html_content = html_to_pdf.call_args[0][0]
+        self.assertTrue(output_path.endswith("report_August_2024.pdf"))
+        self.assertIn("August 2024", html_content)
+        self.assertIn("$950.0", html_content)
+        self.assertNotIn("<td>1003</td>", html_content)
+
+    def test_generate_report_batch_writes_manifest(self):
+        """Test that a batch renders one report per period and segment and lists them in a manifest."""
+        invoices_df = pd.DataFrame({
+            "Invoice ID": [1, 2, 3],
+            "Order ID": [1001, 1002, 1003],
+            "Invoice Date": pd.to_datetime(["2024-08-01", "2024-08-02", "2024-09-03"]),
+            "Amount Due ($)": [700, 250, 300],
+            "Paid Status": ["Unpaid", "Paid", "Unpaid"]
+        })
+        data = dict(self.data, Invoices={"errors": [], "warnings": [], "clean_data": invoices_df})
+        data["Clients"]["clean_data"]["Region"] = ["North", "South"]
+        data["Orders"]["clean_data"].loc[2, "Order Date"] = pd.Timestamp("2024-09-03")
+
+        variants = report_variants(data, [resolve_period("2024-08"), resolve_period("2024-09")], segment_by="Region")
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                mock.patch.object(document_generator, "output_reports_path", tmp_dir), \
+                mock.patch.object(document_generator, "html_to_pdf") as html_to_pdf:
+            manifest = generate_report_batch(data, variants)
+            self.assertTrue(os.path.exists(manifest["path"]))
+
+        reports = {(entry["period"], entry["segment"]["value"]): entry for entry in manifest["reports"]}
+        self.assertEqual(len(reports), 4)
+        self.assertEqual(html_to_pdf.call_count, 4)
+        self.assertEqual(reports[("August 2024", "North")]["orders"], 1)
+        self.assertEqual(reports[("September 2024", "North")]["orders"], 1)
+        self.assertEqual(reports[("September 2024", "South")]["orders"], 0)
+        self.assertTrue(reports[("August 2024", "South")]["path"].endswith("report_August_2024_South.pdf"))
+        self.assertEqual({entry["status"] for entry in manifest["reports"]}, {"rendered"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,297 @@
+import os
+import smtplib
+import socket
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from email import message_from_bytes
+from unittest import mock
+from src import email_sender
+from src.email_sender import (AttachmentCache, build_message, deliver_emails, deliver_with_outbox, send_invoices_to_clients,
+                              send_reports_to_managers)
+from src.outbox import Outbox
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+class RecordingHandler:
+    """Local SMTP stand-in that records every message and the session it came from."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("reject"):
+            return "550 Mailbox unavailable"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((id(session), envelope.rcpt_tos[0], envelope.content))
+        return "250 Message accepted for delivery"
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@unittest.skipIf(Controller is None, "aiosmtpd is not installed")
+class TestEmailSender(unittest.TestCase):
+
+    def setUp(self):
+        # Start a local SMTP server for testing
+        self.handler = RecordingHandler()
+        self.port = free_port()
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+
+    def tearDown(self):
+        self.controller.stop()
+
+    def test_deliver_emails_reuses_connections(self):
+        """Test that many emails are sent over a bounded number of connections."""
+        emails = [(f"client{i}@example.com", "Invoice", "Body", None) for i in range(10)]
+        results = deliver_emails(emails, "127.0.0.1", self.port, "sender@example.com", None, connections=2, use_tls=False)
+
+        self.assertEqual(sorted(results["sent"]), sorted(email[0] for email in emails))
+        self.assertEqual(results["failed"], {})
+        self.assertEqual(len(self.handler.messages), 10)
+        self.assertLessEqual(len({session for session, recipient, content in self.handler.messages}), 2)
+
+    def test_deliver_emails_reports_failures_per_recipient(self):
+        """Test that a rejected recipient does not stop the other deliveries."""
+        emails = [("reject@example.com", "Invoice", "Body", None), ("client@example.com", "Invoice", "Body", None)]
+        results = deliver_emails(emails, "127.0.0.1", self.port, "sender@example.com", None, connections=1, use_tls=False)
+
+        self.assertEqual(results["sent"], ["client@example.com"])
+        self.assertIn("reject@example.com", results["failed"])
+
+    def test_deliver_emails_retries_connection_errors(self):
+        """Test that an email is retried on a fresh connection when the connection fails."""
+        server = email_sender.open_smtp_connection("127.0.0.1", self.port, "sender@example.com", None, False)
+        with mock.patch.object(email_sender, "open_smtp_connection",
+                               side_effect=[ConnectionResetError("reset"), server]) as opened:
+            results = deliver_emails([("client@example.com", "Invoice", "Body", None)], "127.0.0.1", self.port,
+                                     "sender@example.com", None, connections=1, use_tls=False)
+
+        self.assertEqual(results["sent"], ["client@example.com"])
+        self.assertEqual(opened.call_count, 2)
+
+    def test_deliver_with_outbox_resumes_unsent_emails(self):
+        """Test that a rerun only sends the emails that were not sent, after retrying the failed ones."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            outbox = Outbox(os.path.join(tmp_dir, "outbox.sqlite"))
+            emails = [("a", "client@example.com", "Invoice", "Body", []), ("b", "reject@example.com", "Invoice", "Body", [])]
+
+            results = deliver_with_outbox(emails, outbox, "127.0.0.1", self.port, "sender@example.com", None,
+                                          connections=1, use_tls=False, max_attempts=2, backoff=0)
+            self.assertEqual(results["sent_ids"], ["a"])
+            self.assertEqual(list(results["failed_ids"]), ["b"])
+            self.assertEqual(len(self.handler.messages), 1)
+
+            results = deliver_with_outbox(emails, outbox, "127.0.0.1", self.port, "sender@example.com", None,
+                                          connections=1, use_tls=False, max_attempts=1)
+            self.assertEqual(results["resumed"], 1)
+            self.assertEqual(results["sent_ids"], ["a"])
+            self.assertEqual(len(self.handler.messages), 1)
+
+    def test_send_invoices_to_clients_attaches_invoices(self):
+        """Test that each client receives its invoice as an attachment."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            invoice_path = os.path.join(tmp_dir, "invoice_XYZ_1001.pdf")
+            with open(invoice_path, "wb") as f:
+                f.write(b"%PDF-1.4 test")
+
+            send_invoices_to_clients({"john@xyzcon.com": invoice_path}, "127.0.0.1", self.port,
+                                     "sender@example.com", None, use_tls=False)
+
+        session, recipient, content = self.handler.messages[0]
+        self.assertEqual(recipient, "john@xyzcon.com")
+        self.assertIn(b'filename="invoice_XYZ_1001.pdf"', content)
+
+    def test_send_invoices_to_clients_reports_each_invoice(self):
+        """Test that every invoice of a client is sent and reported by path."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            invoice_paths = []
+            for order_id in (1001, 1003):
+                invoice_paths.append(os.path.join(tmp_dir, f"invoice_XYZ_{order_id}.pdf"))
+                with open(invoice_paths[-1], "wb") as f:
+                    f.write(b"%PDF-1.4 test")
+
+            results = send_invoices_to_clients({"john@xyzcon.com": invoice_paths, "reject@example.com": [invoice_paths[0]]},
+                                               "127.0.0.1", self.port, "sender@example.com", None, connections=1, use_tls=False)
+
+        self.assertEqual(results["sent_ids"], invoice_paths)
+        self.assertEqual(list(results["failed_ids"]), [invoice_paths[0]])
+        self.assertEqual(len(self.handler.messages), 2)
+
+    def test_send_invoices_to_clients_consolidates_per_client(self):
+        """Test that a client's invoices are sent together in a single email."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            invoice_paths = []
+            for order_id in (1001, 1003):
+                invoice_paths.append(os.path.join(tmp_dir, f"invoice_XYZ_{order_id}.pdf"))
+                with open(invoice_paths[-1], "wb") as f:
+                    f.write(b"%PDF-1.4 test")
+
+            results = send_invoices_to_clients({"john@xyzcon.com": invoice_paths}, "127.0.0.1", self.port,
+                                               "sender@example.com", None, use_tls=False, consolidate="email")
+
+        self.assertEqual(results["sent_ids"], invoice_paths)
+        self.assertEqual(len(self.handler.messages), 1)
+        session, recipient, content = self.handler.messages[0]
+        self.assertIn(b'filename="invoice_XYZ_1001.pdf"', content)
+        self.assertIn(b'filename="invoice_XYZ_1003.pdf"', content)
+
+    def test_send_invoices_to_clients_splits_consolidated_emails(self):
+        """Test that a client's consolidated invoices are split across emails by size."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            invoice_paths = []
+            for order_id in (1001, 1002, 1003):
+                invoice_paths.append(os.path.join(tmp_dir, f"invoice_XYZ_{order_id}.pdf"))
+                with open(invoice_paths[-1], "wb") as f:
+                    f.write(b"%PDF-1.4 " + os.urandom(391))
+
+            results = send_invoices_to_clients({"john@xyzcon.com": invoice_paths}, "127.0.0.1", self.port,
+                                               "sender@example.com", None, use_tls=False, consolidate="email",
+                                               max_bytes=800)
+
+        self.assertEqual(sorted(results["sent_ids"]), invoice_paths)
+        self.assertEqual(len(self.handler.messages), 2)
+
+    def test_send_invoices_to_clients_reports_failed_statements(self):
+        """Test that a statement that cannot be written only fails its own client."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            invoice_paths = []
+            for order_id in (1001, 1002, 1003, 1004):
+                invoice_paths.append(os.path.join(tmp_dir, f"invoice_{order_id}.pdf"))
+                with open(invoice_paths[-1], "wb") as f:
+                    f.write(b"%PDF-1.4 test")
+
+            def write_statement(file_paths, bundle_path):
+                if file_paths[0] == invoice_paths[0]:
+                    raise ValueError("Corrupt invoice")
+                with open(bundle_path, "wb") as f:
+                    f.write(b"%PDF-1.4 statement")
+
+            with mock.patch.object(email_sender, "write_merged_pdf", side_effect=write_statement):
+                results = send_invoices_to_clients({"john@xyzcon.com": invoice_paths[:2], "jane@abcbuilders.com": invoice_paths[2:]},
+                                                   "127.0.0.1", self.port, "sender@example.com", None, use_tls=False,
+                                                   consolidate="statement")
+
+        self.assertEqual(results["sent_ids"], invoice_paths[2:])
+        self.assertEqual(results["failed_ids"], dict.fromkeys(invoice_paths[:2], "Corrupt invoice"))
+        self.assertIn("john@xyzcon.com", results["failed"])
+        self.assertEqual(len(self.handler.messages), 1)
+
+    def test_send_reports_encodes_attachments_once(self):
+        """Test that an attachment sent to many managers is encoded only once."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report_path = os.path.join(tmp_dir, "report_August_2024.pdf")
+            with open(report_path, "wb") as f:
+                f.write(b"%PDF-1.4 report")
+
+            with mock.patch.object(email_sender, "encode_attachment", wraps=email_sender.encode_attachment) as encode:
+                results = send_reports_to_managers([f"manager{i}@example.com" for i in range(5)], report_path, "127.0.0.1",
+                                                   self.port, "sender@example.com", None, [], connections=2, use_tls=False)
+
+        self.assertEqual(len(results["sent"]), 5)
+        self.assertEqual(encode.call_count, 1)
+
+    def test_send_reports_bundles_invoices(self):
+        """Test that invoices are bundled once into size-limited archives, one message per archive."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report_path = os.path.join(tmp_dir, "report_August_2024.pdf")
+            invoice_paths = [os.path.join(tmp_dir, f"invoice_XYZ_{order_id}.pdf") for order_id in (1001, 1002)]
+            for path in [report_path] + invoice_paths:
+                with open(path, "wb") as f:
+                    f.write(b"%PDF-1.4 " + os.urandom(500))
+
+            send_reports_to_managers(["a@example.com", "b@example.com"], report_path, "127.0.0.1", self.port,
+                                     "sender@example.com", None, invoice_paths, use_tls=False,
+                                     bundle_format="zip", bundle_max_bytes=1100)
+
+            messages = [content for session, recipient, content in self.handler.messages if recipient == "a@example.com"]
+            self.assertEqual(len(messages), 2)
+            first = next(content for content in messages if b"part 1 of 2" in content)
+            self.assertIn(b'filename="report_August_2024.pdf"', first)
+            self.assertIn(b'filename="invoices_part1.zip"', first)
+            self.assertEqual(len(self.handler.messages), 4)
+
+            # A report that leaves no room for an invoice is sent in a message of its own
+            self.handler.messages.clear()
+            send_reports_to_managers(["a@example.com"], report_path, "127.0.0.1", self.port, "sender@example.com", None,
+                                     invoice_paths, use_tls=False, bundle_format="zip", bundle_max_bytes=600)
+
+        first = next(content for session, recipient, content in self.handler.messages if b"part 1 of 3" in content)
+        self.assertIn(b'filename="report_August_2024.pdf"', first)
+        self.assertNotIn(b'.zip"', first)
+        self.assertEqual(len(self.handler.messages), 3)
+
+class TestDelivery(unittest.TestCase):
+
+    def test_deliver_emails_stops_on_failed_login(self):
+        """Test that a refused login stops the connection and fails the remaining emails without retrying."""
+        emails = [(f"client{i}@example.com", "Invoice", "Body", None, i) for i in range(3)]
+        refused = smtplib.SMTPAuthenticationError(535, b"Authentication failed")
+        with mock.patch.object(email_sender, "open_smtp_connection", side_effect=refused) as opened:
+            results = deliver_emails(emails, "127.0.0.1", 25, "sender@example.com", "wrong", connections=1, use_tls=False)
+
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual(results["sent"], [])
+        self.assertEqual(sorted(results["failed_ids"]), [0, 1, 2])
+
+class TestAttachments(unittest.TestCase):
+
+    def test_attachment_cache_shares_parts(self):
+        """Test that cached attachment parts are shared and decode to the file content."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            invoice_path = os.path.join(tmp_dir, "invoice_XYZ_1001.pdf")
+            content = os.urandom(5000)
+            with open(invoice_path, "wb") as f:
+                f.write(content)
+
+            cache = AttachmentCache()
+            self.assertIs(cache.part(invoice_path), cache.part(invoice_path))
+
+            msg = build_message("sender@example.com", "john@xyzcon.com", "Invoice", "Body", [invoice_path], cache)
+            parsed = message_from_bytes(msg.as_bytes())
+
+        attachment = parsed.get_payload()[1]
+        self.assertEqual(attachment.get_filename(), "invoice_XYZ_1001.pdf")
+        self.assertEqual(attachment.get_payload(decode=True), content)
+
+    def test_attachment_cache_encodes_concurrent_requests_once(self):
+        """Test that concurrent requests for a file share one encoding done outside the cache lock."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = [os.path.join(tmp_dir, f"invoice_{order_id}.pdf") for order_id in (1001, 1002)]
+            for path in paths:
+                with open(path, "wb") as f:
+                    f.write(b"%PDF-1.4 test")
+
+            cache = AttachmentCache()
+            started, release = threading.Event(), threading.Event()
+            encode = email_sender.encode_attachment
+
+            def slow_encode(file_path):
+                if file_path == paths[0]:
+                    started.set()
+                    release.wait(5)
+                return encode(file_path)
+
+            with mock.patch.object(email_sender, "encode_attachment", side_effect=slow_encode) as encoded, \
+                    ThreadPoolExecutor(max_workers=2) as executor:
+                futures = [executor.submit(cache.part, paths[0]) for _ in range(2)]
+                started.wait(5)
+                cache.part(paths[1])  # Not blocked by the encoding in progress
+                release.set()
+                parts = [future.result() for future in futures]
+
+        self.assertIs(parts[0], parts[1])
+        self.assertEqual(encoded.call_count, 2)
+
+if __name__ == "__main__":
+    unittest.main()
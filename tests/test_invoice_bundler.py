@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+import zipfile
+from src.invoice_bundler import bundle_invoices, split_by_size
+
+class TestInvoiceBundler(unittest.TestCase):
+
+    def setUp(self):
+        # Sample invoice files of 400 bytes each
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.invoice_paths = []
+        for order_id in (1001, 1002, 1003):
+            invoice_path = os.path.join(self.tmp_dir.name, f"invoice_XYZ_{order_id}.pdf")
+            with open(invoice_path, "wb") as f:
+                f.write(b"%PDF-1.4 " + os.urandom(391))
+            self.invoice_paths.append(invoice_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_split_by_size(self):
+        """Test that files are grouped in order without exceeding the size limit."""
+        self.assertEqual(split_by_size(self.invoice_paths, 800), [self.invoice_paths[:2], self.invoice_paths[2:]])
+        self.assertEqual(split_by_size(self.invoice_paths, 100), [[path] for path in self.invoice_paths])
+        self.assertEqual(split_by_size(self.invoice_paths, 800, reserved_bytes=300),
+                         [self.invoice_paths[:1], self.invoice_paths[1:]])
+
+    def test_bundle_invoices_as_zip_parts(self):
+        """Test that invoices are streamed into numbered ZIP archives."""
+        output_dir = os.path.join(self.tmp_dir.name, "bundles")
+        bundle_paths = bundle_invoices(self.invoice_paths, output_dir, "zip", max_bytes=800)
+
+        self.assertEqual([os.path.basename(path) for path in bundle_paths], ["invoices_part1.zip", "invoices_part2.zip"])
+        with zipfile.ZipFile(bundle_paths[0]) as archive:
+            self.assertEqual(archive.namelist(), ["invoice_XYZ_1001.pdf", "invoice_XYZ_1002.pdf"])
+
+    def test_unknown_bundle_format(self):
+        """Test that an unknown bundle format is rejected."""
+        with self.assertRaises(ValueError):
+            bundle_invoices(self.invoice_paths, self.tmp_dir.name, "rar")
+
+if __name__ == "__main__":
+    unittest.main()
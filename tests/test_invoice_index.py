@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+from src.invoice_index import InvoiceIndex
+
+class TestInvoiceIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index = InvoiceIndex(os.path.join(self.tmp_dir.name, "invoice_index.sqlite"))
+        self.paths = {order_id: os.path.join(self.tmp_dir.name, f"invoice_{order_id}.pdf") for order_id in (1001, 1002, 1003)}
+        self.index.record([
+            (1001, "john@example.com", self.paths[1001], "a"),
+            (1002, "jane@example.com", self.paths[1002], "b"),
+            (1003, "john@example.com", self.paths[1003], "c"),
+        ])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_client_invoice_map_lists_every_invoice(self):
+        """Test that a client with several invoices is mapped to all of them."""
+        self.assertEqual(self.index.client_invoice_map(), {
+            "john@example.com": [self.paths[1001], self.paths[1003]],
+            "jane@example.com": [self.paths[1002]],
+        })
+        self.assertEqual(self.index.identities()[self.paths[1003]], ("1003", "c"))
+
+    def test_sent_invoices_are_not_pending(self):
+        """Test that sent invoices leave the map and failed ones stay in it with their error."""
+        self.index.mark_sent([self.paths[1001]])
+        self.index.mark_failed({self.paths[1002]: "Mailbox unavailable"})
+
+        self.assertEqual(self.index.client_invoice_map(), {
+            "jane@example.com": [self.paths[1002]],
+            "john@example.com": [self.paths[1003]],
+        })
+        failed = [invoice for invoice in self.index.unsent() if invoice["status"] == "failed"]
+        self.assertEqual([(invoice["invoice_id"], invoice["error"]) for invoice in failed], [("1002", "Mailbox unavailable")])
+
+    def test_regenerated_invoice_keeps_status_unless_changed(self):
+        """Test that an unchanged invoice stays sent and a changed one is pending again."""
+        self.index.mark_sent([self.paths[1001], self.paths[1002]])
+        self.index.record([
+            (1001, "john@example.com", self.paths[1001], "a"),
+            (1002, "jane@example.com", self.paths[1002], "b2"),
+        ])
+
+        statuses = {invoice["invoice_id"]: invoice["status"] for invoice in self.index.unsent()}
+        self.assertEqual(statuses, {"1002": "pending", "1003": "pending"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import threading
+import unittest
+from src.jobs import JobManager
+
+class TestJobManager(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = JobManager(max_workers=1)
+
+    def tearDown(self):
+        self.manager.executor.shutdown(wait=True)
+
+    def test_job_records_progress_and_result(self):
+        """Test that a job runs in the background and counts its progress events."""
+        def task(total, progress_callback=None, cancel_event=None):
+            progress_callback({"kind": "invoice", "status": "started", "total": total})
+            for _ in range(total):
+                progress_callback({"kind": "invoice", "status": "rendered"})
+            return {"status": "success"}, 200
+
+        job = self.manager.submit("generate-invoices", task, 3)
+        self.manager.executor.shutdown(wait=True)
+
+        status = job.to_dict()
+        self.assertEqual(status["status"], "succeeded")
+        self.assertEqual(status["progress"], {"invoice_total": 3, "invoice_rendered": 3, "invoice_done": 3})
+        self.assertEqual(status["result"], {"status": "success"})
+
+    def test_iter_events_streams_progress_until_finished(self):
+        """Test that the event stream carries progress with throughput and ends with the final status."""
+        def task(progress_callback=None, cancel_event=None):
+            progress_callback({"kind": "email", "status": "started", "total": 2})
+            progress_callback({"kind": "email", "status": "sent", "recipient": "a@example.com"})
+            progress_callback({"kind": "email", "status": "sent", "recipient": "b@example.com"})
+            return {"status": "success"}, 200
+
+        job = self.manager.submit("send-invoices", task)
+        events = [event for event in job.iter_events(heartbeat=1) if event is not None]
+
+        self.assertEqual([event_type for event_id, event_type, data in events],
+                         ["status", "progress", "progress", "progress", "status"])
+        last_progress = events[3][2]
+        self.assertEqual((last_progress["done"], last_progress["total"]), (2, 2))
+        self.assertIn(last_progress["eta"], (0, None))  # None if the clock did not advance
+        self.assertEqual(events[-1][2]["status"], "succeeded")
+
+        # Resuming after an event ID only replays the later events
+        self.assertEqual(len(list(job.iter_events(after_id=events[2][0]))), 2)
+
+    def test_cancel_running_job(self):
+        """Test that a running job sees the cancellation request."""
+        started = threading.Event()
+
+        def task(progress_callback=None, cancel_event=None):
+            started.set()
+            cancel_event.wait(5)
+            return {"status": "success"}, 200
+
+        job = self.manager.submit("send-invoices", task)
+        started.wait(5)
+        self.manager.cancel(job.id)
+        self.manager.executor.shutdown(wait=True)
+
+        self.assertEqual(job.to_dict()["status"], "cancelled")
+
+    def test_failed_status_code_marks_job_failed(self):
+        """Test that an error payload marks the job as failed."""
+        job = self.manager.submit("generate-reports", lambda progress_callback=None, cancel_event=None: ({"error": "boom"}, 500))
+        self.manager.executor.shutdown(wait=True)
+
+        self.assertEqual(job.to_dict()["status"], "failed")
+        self.assertIsNone(self.manager.get("unknown"))
+
+if __name__ == "__main__":
+    unittest.main()
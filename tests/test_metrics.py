@@ -0,0 +1,94 @@
+import os
+import json
+import tempfile
+import unittest
+from src import metrics
+from src.metrics import MetricsRegistry, run_summary, summarized, timed
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        metrics.registry.reset()
+
+    def test_render_prometheus(self):
+        """Test that counters and histograms are rendered in the Prometheus text format."""
+        registry = MetricsRegistry(buckets=(0.1, 1, float("inf")))
+        registry.inc("invoices_total", status="rendered")
+        registry.inc("invoices_total", status="rendered")
+        registry.observe("pipeline_stage_duration_seconds", 0.5, stage="fetch")
+
+        text = registry.render_prometheus()
+        self.assertIn('invoices_total{status="rendered"} 2', text)
+        self.assertIn('pipeline_stage_duration_seconds_bucket{stage="fetch",le="0.1"} 0', text)
+        self.assertIn('pipeline_stage_duration_seconds_bucket{stage="fetch",le="1"} 1', text)
+        self.assertIn('pipeline_stage_duration_seconds_bucket{stage="fetch",le="+Inf"} 1', text)
+        self.assertIn('pipeline_stage_duration_seconds_count{stage="fetch"} 1', text)
+
+    def test_timed_records_stage_and_summary(self):
+        """Test that timed stages show up in the summary of the run."""
+        @timed("render_html")
+        def render():
+            return "html"
+
+        before = metrics.registry.snapshot()
+        render()
+        with timed("render_html"):
+            pass
+
+        summary = run_summary(before)
+        self.assertEqual(summary["stages"]['pipeline_stage_duration_seconds{stage="render_html"}']["count"], 2)
+
+    def test_run_summary_max_is_per_run(self):
+        """Test that the max of a run does not include slower earlier runs."""
+        metrics.registry.observe("pipeline_stage_duration_seconds", 20, stage="fetch")
+        before = metrics.registry.snapshot()
+        metrics.registry.observe("pipeline_stage_duration_seconds", 0.003, stage="fetch")
+
+        summary = run_summary(before)
+        self.assertEqual(summary["stages"]['pipeline_stage_duration_seconds{stage="fetch"}']["max"], 0.005)
+
+    def test_render_prometheus_escapes_labels(self):
+        """Test that quotes, backslashes and newlines in label values are escaped."""
+        registry = MetricsRegistry()
+        registry.inc("emails_total", error='bad "host"\\\nretry')
+        self.assertIn('emails_total{error="bad \\"host\\"\\\\\\nretry"} 1', registry.render_prometheus())
+
+    def test_disabled_records_nothing(self):
+        """Test that nothing is recorded while instrumentation is disabled."""
+        metrics.enabled = False
+        try:
+            with timed("fetch"):
+                metrics.inc("invoices_total")
+        finally:
+            metrics.enabled = True
+        self.assertEqual(metrics.registry.snapshot(), {"counters": {}, "histograms": {}})
+
+    def test_summarized_writes_run_summary(self):
+        """Test that a summarized run writes its metrics as JSON."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            @summarized("send-invoices", tmp_dir)
+            def run():
+                metrics.inc("emails_total", status="sent")
+
+            run()
+            with open(os.path.join(tmp_dir, os.listdir(tmp_dir)[0])) as f:
+                summary = json.load(f)
+
+        self.assertEqual(summary["run"], "send-invoices")
+        self.assertEqual(summary["counters"], {'emails_total{status="sent"}': 1})
+
+    def test_write_run_summary_keeps_latest(self):
+        """Test that only the latest summaries of a run name are kept."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            before = metrics.registry.snapshot()
+            for _ in range(4):
+                latest = metrics.write_run_summary(tmp_dir, "fetch-data", before, retention=2)
+            metrics.write_run_summary(tmp_dir, "send-invoices", before, retention=2)
+
+            names = os.listdir(tmp_dir)
+            self.assertEqual(len([name for name in names if name.startswith("fetch-data_")]), 2)
+            self.assertIn(os.path.basename(latest), names)
+            self.assertEqual(len(names), 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import time
+import unittest
+from src.outbox import Outbox, file_identity, outbox_key
+
+class TestOutbox(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.outbox = Outbox(os.path.join(self.tmp_dir.name, "outbox.sqlite"))
+        self.messages = [
+            ("a", "john@xyzcon.com", "Your Invoice", "Body", ["invoice_XYZ_1001.pdf"]),
+            ("b", "jane@abcbuilders.com", "Your Invoice", "Body", ["invoice_ABC_1002.pdf"]),
+        ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_enqueue_skips_sent_messages(self):
+        """Test that queuing the messages of an interrupted run again only queues the unsent ones."""
+        self.assertEqual(self.outbox.enqueue(self.messages), (["a", "b"], []))
+        self.outbox.mark_sent("a")
+
+        self.assertEqual(self.outbox.enqueue(self.messages), (["b"], ["a"]))
+        claimed = self.outbox.claim(["a", "b"])
+        self.assertEqual([message["key"] for message in claimed], ["b"])
+        self.assertEqual(claimed[0]["attachments"], ["invoice_ABC_1002.pdf"])
+
+    def test_claimed_messages_are_sent_once(self):
+        """Test that a claimed message is not claimed again or requeued until its lease expires."""
+        self.outbox.enqueue(self.messages)
+        self.assertEqual([message["key"] for message in self.outbox.claim(["a"])], ["a"])
+
+        # A concurrent run queuing the same messages neither resets nor claims the message in flight
+        self.outbox.enqueue(self.messages)
+        self.assertEqual([message["key"] for message in self.outbox.claim(["a", "b"])], ["b"])
+        self.assertEqual(self.outbox.claim(["a"], now=time.time() + 60), [])
+        self.assertEqual([message["key"] for message in self.outbox.claim(["a"], now=time.time() + 3600)], ["a"])
+
+    def test_failed_messages_back_off_exponentially(self):
+        """Test that retries are delayed further after each failure until the attempts run out."""
+        self.outbox.enqueue(self.messages)
+        self.outbox.claim(["a"])
+
+        self.assertEqual(self.outbox.mark_failed("a", "Timeout", max_attempts=3, backoff=10), "queued")
+        first_retry = self.outbox.next_attempt(["a"])
+        self.assertEqual(self.outbox.claim(["a"]), [])
+        self.assertEqual(self.outbox.mark_failed("a", "Timeout", max_attempts=3, backoff=10), "queued")
+        self.assertAlmostEqual(self.outbox.next_attempt(["a"]) - first_retry, 10, delta=1)
+        self.assertEqual([message["key"] for message in self.outbox.claim(["a"], now=time.time() + 30)], ["a"])
+
+        self.assertEqual(self.outbox.mark_failed("a", "Timeout", max_attempts=3, backoff=10), "failed")
+        self.assertIsNone(self.outbox.next_attempt(["a"]))
+
+    def test_outbox_key_follows_invoices(self):
+        """Test that messages are keyed on the invoice content, not on the file metadata."""
+        key = outbox_key("john@xyzcon.com", "Your Invoice", [("1001", "abc")])
+        self.assertEqual(outbox_key("john@xyzcon.com", "Your Invoice", [("1001", "abc")]), key)
+        self.assertNotEqual(outbox_key("john@xyzcon.com", "Your Invoice", [("1001", "def")]), key)
+
+        file_path = os.path.join(self.tmp_dir.name, "invoice_XYZ_1001.pdf")
+        with open(file_path, "wb") as f:
+            f.write(b"%PDF-1.4 test")
+        key = outbox_key("john@xyzcon.com", "Your Invoice", [file_identity(file_path)])
+        os.utime(file_path, (time.time() + 60, time.time() + 60))
+        self.assertEqual(outbox_key("john@xyzcon.com", "Your Invoice", [file_identity(file_path)]), key)
+
+        with open(file_path, "wb") as f:
+            f.write(b"%PDF-1.4 regenerated")
+        self.assertNotEqual(outbox_key("john@xyzcon.com", "Your Invoice", [file_identity(file_path)]), key)
+
+if __name__ == '__main__':
+    unittest.main()
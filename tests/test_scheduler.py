@@ -0,0 +1,103 @@
+import os
+import threading
+import unittest
+from datetime import datetime
+from unittest import mock
+from src.jobs import JobManager
+from src.scheduler import CronSchedule, PipelineScheduler
+
+class TestCronSchedule(unittest.TestCase):
+
+    def test_next_after(self):
+        """Test the next times of common schedules."""
+        moment = datetime(2024, 8, 30, 22, 45)  # A Friday
+        self.assertEqual(CronSchedule("30 22 * * *").next_after(moment), datetime(2024, 8, 31, 22, 30))
+        self.assertEqual(CronSchedule("22:50").next_after(moment), datetime(2024, 8, 30, 22, 50))
+        self.assertEqual(CronSchedule("*/20 * * * *").next_after(moment), datetime(2024, 8, 30, 23, 0))
+        self.assertEqual(CronSchedule("0 9 * * 1-5").next_after(moment), datetime(2024, 9, 2, 9, 0))
+        self.assertEqual(CronSchedule("@monthly").next_after(moment), datetime(2024, 9, 1, 0, 0))
+
+    def test_invalid_schedules(self):
+        """Test that malformed schedules are rejected."""
+        for expression in ("61 * * * *", "* * *", "0 0 30 2 *", 5, None):
+            with self.assertRaises(ValueError):
+                CronSchedule(expression).next_after(datetime(2024, 1, 1))
+
+class TestPipelineScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.release = threading.Event()
+
+        def fetch(settings, progress_callback=None, cancel_event=None):
+            self.calls.append(("fetch-data", settings["filePath"]))
+            return {"status": "success"}, 200
+
+        def send(settings, progress_callback=None, cancel_event=None):
+            self.calls.append(("send-invoices", settings["filePath"]))
+            self.release.wait(5)
+            return {"status": "success"}, 200
+
+        self.job_manager = JobManager(max_workers=2)
+        self.scheduler = PipelineScheduler(self.job_manager, {"fetch-data": fetch, "send-invoices": send}, state_path=None)
+        self.scheduler.create_scheduled_task("nightly", ["fetch-data", "send-invoices"], "0 22 * * *",
+                                             {"filePath": "orders.xlsx"})
+        self.scheduler.scheduled_tasks["nightly"]["lastRun"] = "2024-08-30T21:00:00"
+
+    def tearDown(self):
+        self.release.set()
+        self.job_manager.executor.shutdown(wait=True)
+
+    def test_runs_due_pipeline_once_without_overlap(self):
+        """Test that a due pipeline runs its tasks in order and is skipped while still running."""
+        jobs = self.scheduler.run_pending(now=datetime(2024, 8, 30, 22, 0, 10))
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(self.scheduler.run_pending(now=datetime(2024, 8, 31, 22, 0, 10)), [])
+
+        self.release.set()
+        self.job_manager.executor.shutdown(wait=True)
+        self.assertEqual(self.calls, [("fetch-data", "orders.xlsx"), ("send-invoices", "orders.xlsx")])
+        self.assertEqual(jobs[0].status, "succeeded")
+
+    def test_catches_up_missed_runs_once(self):
+        """Test that runs missed during downtime are caught up with a single run, or skipped."""
+        self.release.set()
+        self.assertEqual(len(self.scheduler.run_pending(now=datetime(2024, 9, 3, 8, 0))), 1)
+        self.assertEqual(self.scheduler.run_pending(now=datetime(2024, 9, 3, 8, 1)), [])
+
+        self.job_manager.executor.shutdown(wait=True)
+        self.scheduler.scheduled_tasks["nightly"]["catchUp"] = False
+        self.assertEqual(self.scheduler.run_pending(now=datetime(2024, 9, 5, 8, 0)), [])
+        self.assertEqual(self.scheduler.list_scheduled_tasks()[0]["nextRun"], "2024-09-05T22:00:00")
+
+    def test_rejects_schedules_that_never_run(self):
+        """Test that a schedule without any time is rejected when the task is created."""
+        with self.assertRaises(ValueError):
+            self.scheduler.create_scheduled_task("never", ["fetch-data"], "0 0 30 2 *")
+        self.assertNotIn("never", self.scheduler.scheduled_tasks)
+
+    def test_broken_task_does_not_block_others(self):
+        """Test that a task with a corrupted schedule is skipped while the others still run."""
+        self.release.set()
+        self.scheduler.scheduled_tasks["broken"] = dict(self.scheduler.scheduled_tasks["nightly"], schedule="99 * * * *")
+        self.assertEqual(len(self.scheduler.run_pending(now=datetime(2024, 8, 30, 22, 0, 10))), 1)
+
+    def test_secrets_are_read_from_environment(self):
+        """Test that the email password is not stored with the task and is read from the environment at run time."""
+        received = []
+
+        def send(settings, progress_callback=None, cancel_event=None):
+            received.append(settings)
+            return {"status": "success"}, 200
+
+        self.scheduler.tasks["send-invoices"] = send
+        self.scheduler.create_scheduled_task("mail", ["send-invoices"], "@daily", {"filePath": "orders.xlsx",
+                                                                                  "emailPassword": "secret"})
+        self.assertNotIn("emailPassword", self.scheduler.scheduled_tasks["mail"]["settings"])
+
+        with mock.patch.dict(os.environ, {"EMAIL_PASSWORD": "from-env"}):
+            self.scheduler.run_pipeline(["send-invoices"], self.scheduler.scheduled_tasks["mail"]["settings"])
+        self.assertEqual(received[0]["emailPassword"], "from-env")
+
+if __name__ == '__main__':
+    unittest.main()